@@ -2,15 +2,25 @@
 from flask import Flask
 from flask_cors import CORS
 import os
+from .startup import boot_phase, warm_up, print_startup_report
 
 def create_app():
     app = Flask(__name__)
     app.config.from_pyfile('config.py')
 
     # Initialize Flask-CORS with explicit resources for broader coverage
-    CORS(app, resources={r"/*": {"origins": "*"}}) # CHANGED LINE
+    CORS(app, resources={r"/*": {"origins": "*"}}, expose_headers=['ETag']) # ETag: conditional /search requests
 
-    from . import main_routes
+    with boot_phase('import routes + services'):
+        from . import main_routes
     app.register_blueprint(main_routes.bp)
+    # `kill -USR2 <pid>` arms the slow-request profiler on this worker
+    main_routes.metrics.install_profiler_signal()
 
-    return app
\ No newline at end of file
+    # Load NLTK corpora (and optionally the model) once at startup rather than
+    # inside the first user's request
+    if app.config['WARMUP_ON_START']:
+        warm_up(load_model=app.config['PRELOAD_MODEL'])
+    print_startup_report()
+
+    return app
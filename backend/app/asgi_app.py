@@ -0,0 +1,507 @@
+# smartdoc-insight/backend/app/asgi_app.py
+"""
+ASGI (FastAPI) variant of the routes in main_routes.py, for serving with uvicorn.
+Blocking work is awaited on bounded CPU and I/O thread pools, so handlers never block the event loop.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import os
+
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from .config import (
+    ASGI_CPU_WORKERS, ASGI_IO_WORKERS, DEFINITIONS_BATCH_MAX_WORDS, MAX_CONTENT_LENGTH,
+    MAX_UPLOAD_BYTES, PRELOAD_MODEL, PROFILE_ENDPOINT, SERVER_TIMING_HEADER, WARMUP_ON_START,
+)
+from .startup import boot_phase, warm_up, print_startup_report
+
+with boot_phase('import routes + services'):
+    from .services.document_parser import spool_upload, DocumentLimitError
+    from .services.nlp_service import preprocess_text, get_definitions, get_definitions_batch
+    from .services.document_store import register_document, get_document, search_document_terms
+    from .services.parse_executor import ParseTimeoutError
+    from .services.pdf_generator import generate_highlighted_pdf, get_highlighted_pdf, iter_pdf_chunks
+    from .services.session_manager import save_session, load_session
+    from .services.highlighter import get_highlights
+    from .services import metrics
+    from .main_routes import (
+        parse_search_terms, parse_highlight_range, parse_pdf_highlights, parse_pdf_filename, parse_preprocess_texts,
+        preprocess_batch, attachment_disposition,
+        build_search_response, parse_passage_count, parse_spooled_upload, iter_spooled_upload, get_cached_upload_text,
+        cache_upload_text,
+        index_uploaded_document, parse_corpus_search, CORPUS_DISABLED_MESSAGE,
+    )
+    from .services.corpus_index import get_corpus_index
+    from .services.search_cache import etag_matches, search_etag
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+_cpu_executor = ThreadPoolExecutor(max_workers=ASGI_CPU_WORKERS, thread_name_prefix='asgi-cpu')
+_io_executor = ThreadPoolExecutor(max_workers=ASGI_IO_WORKERS, thread_name_prefix='asgi-io')
+
+def _tracked(fn, *args, **kwargs):
+    with metrics.track_thread():
+        return fn(*args, **kwargs)
+
+def _in_request_context(fn, *args, **kwargs):
+    """Wraps a call so it runs in a pool thread with the request's context (stage timings, profiler)."""
+    return functools.partial(contextvars.copy_context().run, _tracked, fn, *args, **kwargs)
+
+async def _run_cpu(fn, *args, **kwargs):
+    """Awaits a CPU-bound call on the bounded CPU pool."""
+    return await asyncio.get_running_loop().run_in_executor(_cpu_executor, _in_request_context(fn, *args, **kwargs))
+
+async def _run_io(fn, *args, **kwargs):
+    """Awaits a blocking I/O call (e.g. Firestore) on the bounded I/O pool."""
+    return await asyncio.get_running_loop().run_in_executor(_io_executor, _in_request_context(fn, *args, **kwargs))
+
+def _error(message: str, status_code: int) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status_code)
+
+async def _json_body(request: Request) -> dict:
+    try:
+        data = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be valid JSON")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Request body must be a JSON object")
+    return data
+
+def _check_content_length(request: Request):
+    """Rejects oversized uploads before the multipart body is read (Flask's MAX_CONTENT_LENGTH)."""
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > MAX_CONTENT_LENGTH:
+        raise HTTPException(status_code=413, detail=f"File is too large: the limit is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.")
+
+async def _upload_file(request: Request):
+    """Returns the form and its 'file' part, or raises the same 400s as the Flask routes."""
+    _check_content_length(request)
+    form = await request.form()
+    file = form.get('file')
+    if file is None or isinstance(file, str):
+        await form.close()
+        raise HTTPException(status_code=400, detail="No file part in the request")
+    if not file.filename:
+        await form.close()
+        raise HTTPException(status_code=400, detail="No selected file")
+    return form, file
+
+def _resolve_document(data: dict):
+    """
+    Finds the document a request refers to, like main_routes._resolve_document().
+
+    Raises:
+        HTTPException: 404 for an unknown documentId without content, 400 for neither.
+    """
+    document_id = data.get('documentId')
+    document_content = data.get('documentContent')
+    if document_id:
+        record = get_document(document_id)
+        if record is not None:
+            return record
+        if not document_content:
+            raise HTTPException(status_code=404, detail=f"Unknown or expired documentId '{document_id}'. Please upload the document again.")
+    if not document_content:
+        raise HTTPException(status_code=400, detail="Missing 'documentId' or 'documentContent' in request")
+    return register_document(document_content)
+
+@router.get('/status')
+async def status():
+    """
+    A simple status endpoint to check if the backend is running.
+    """
+    return {"status": "Backend is running!"}
+
+@router.get('/metrics')
+async def metrics_endpoint():
+    """Prometheus metrics of this worker process (see main_routes.metrics_endpoint)."""
+    return Response(metrics.render_prometheus(), media_type='text/plain; version=0.0.4')
+
+@router.api_route('/metrics/profile', methods=['GET', 'POST'])
+async def profile_endpoint(request: Request):
+    """
+    Shows (GET) or changes (POST {"enabled": bool, "thresholdMs": number}) the state
+    of the slow-request sampling profiler. Only available with PROFILE_ENDPOINT set.
+    """
+    if not PROFILE_ENDPOINT:
+        return _error("The profiler endpoint is disabled (set PROFILE_ENDPOINT=1).", 404)
+    if request.method == 'POST':
+        data = await _json_body(request) if await request.body() else {}
+        if data.get('enabled', True):
+            metrics.profiler.arm(float(data.get('thresholdMs', metrics.PROFILE_THRESHOLD_MS)))
+        else:
+            metrics.profiler.disarm()
+    return metrics.profiler.state()
+
+@router.post('/upload')
+async def upload_document(request: Request):
+    """
+    Handles document uploads, parses them, and returns the extracted text together
+    with a documentId. Expects a file under the 'file' key in the form data.
+    """
+    form, file = await _upload_file(request)
+    spooled_path = None
+    try:
+        hasher = hashlib.sha256()
+        spooled_path = await _run_io(spool_upload, file.file, MAX_UPLOAD_BYTES, hasher=hasher)
+        # Waiting on the parse pool blocks a thread, so it runs on the CPU pool
+        document_text = await _run_cpu(parse_spooled_upload, spooled_path, file.filename, hasher.hexdigest())
+        record = await _run_cpu(register_document, document_text, file.filename)
+        await _run_cpu(index_uploaded_document, record)
+        return {
+            "message": "File uploaded and parsed successfully",
+            "content": document_text,
+            "documentId": record.document_id
+        }
+    except DocumentLimitError as e:
+        return _error(str(e), 413)
+    except ValueError as e:
+        return _error(str(e), 400)
+    except ParseTimeoutError as e:
+        return _error(str(e), 422)
+    except Exception as e:
+        return _error(f"Failed to process file: {str(e)}", 500)
+    finally:
+        await form.close()
+        if spooled_path:
+            os.remove(spooled_path)
+
+@router.post('/upload/stream')
+async def upload_document_stream(request: Request):
+    """
+    Streaming variant of /upload, responding with the same NDJSON lines as the
+    Flask route. Each page is awaited on the CPU pool while the loop stays free.
+    """
+    form, file = await _upload_file(request)
+    filename = file.filename
+    hasher = hashlib.sha256()
+    try:
+        spooled_path = await _run_io(spool_upload, file.file, MAX_UPLOAD_BYTES, hasher=hasher)
+    except DocumentLimitError as e:
+        return _error(str(e), 413)
+    finally:
+        await form.close()
+    content_hash = hasher.hexdigest()
+    cached_text = await _run_io(get_cached_upload_text, filename, content_hash)
+    if cached_text is not None:
+        os.remove(spooled_path)
+        record = await _run_cpu(register_document, cached_text, filename)
+        await _run_cpu(index_uploaded_document, record)
+        body = (json.dumps({"type": "page", "page": 1, "text": cached_text}) + '\n'
+                + json.dumps({"type": "done", "pages": 1, "documentId": record.document_id, "cached": True}) + '\n')
+        return Response(body, media_type='application/x-ndjson', headers={"Cache-Control": "no-cache"})
+    try:
+        chunks = iter_spooled_upload(spooled_path, filename)
+    except ValueError as e:
+        os.remove(spooled_path)
+        return _error(str(e), 400)
+
+    async def generate():
+        pages = []
+        done = object()
+        try:
+            page_number = 0
+            while (text := await _run_cpu(next, chunks, done)) is not done:
+                page_number += 1
+                pages.append(text)
+                yield json.dumps({"type": "page", "page": page_number, "text": text}) + '\n'
+            document_text = ''.join(pages)
+            await _run_io(cache_upload_text, filename, content_hash, document_text)
+            record = await _run_cpu(register_document, document_text, filename)
+            await _run_cpu(index_uploaded_document, record)
+            yield json.dumps({"type": "done", "pages": len(pages), "documentId": record.document_id}) + '\n'
+        except (ValueError, ParseTimeoutError) as e:
+            yield json.dumps({"type": "error", "error": str(e)}) + '\n'
+        except Exception as e:
+            yield json.dumps({"type": "error", "error": f"Failed to process file: {str(e)}"}) + '\n'
+        finally:
+            try:
+                chunks.close()
+            except ValueError:
+                pass  # Still running on the CPU pool (client gone); it is closed when collected
+            os.remove(spooled_path)
+
+    return StreamingResponse(
+        generate(),
+        media_type='application/x-ndjson',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _search(data: dict, search_terms: list[str], if_none_match: str | None) -> Response:
+    record = _resolve_document(data)
+    etag = search_etag(record.document_id, data)
+    headers = {"ETag": f'"{etag}"'}
+    if etag_matches(if_none_match, etag):
+        metrics.increment("smartdoc_search_not_modified_total")
+        return Response(status_code=304, headers=headers)
+    results = search_document_terms(record, search_terms)
+    response = build_search_response(data, record, search_terms, results)
+    with metrics.stage('serialize'):
+        return JSONResponse(response, headers=headers)
+
+@router.post('/search')
+async def search_document(request: Request):
+    """
+    Semantic search for one 'searchTerm' or a list of 'searchTerms' over a document
+    given as 'documentId' or 'documentContent'. See main_routes.search_document()
+    for the request and response format, and for the ETag / If-None-Match handling.
+    """
+    data = await _json_body(request)
+    search_terms, message = parse_search_terms(data)
+    if not message:
+        _, _, message = parse_highlight_range(data)
+    if not message and data.get('includePassages'):
+        _, message = parse_passage_count(data)
+    if message:
+        return _error(message, 400)
+    return await _run_cpu(_search, data, search_terms, request.headers.get('if-none-match'))
+
+def _highlight(data: dict, search_terms: list[str], semantic_matches: list[str], range_start, range_end) -> JSONResponse:
+    record = _resolve_document(data)
+    highlights = get_highlights(record.document_id, record.text, search_terms, semantic_matches, range_start, range_end)
+    with metrics.stage('serialize'):
+        return JSONResponse({"documentId": record.document_id, **highlights})
+
+@router.post('/highlight')
+async def highlight_document(request: Request):
+    """
+    Highlight spans of search terms and semantic matches, optionally within a
+    character range. See main_routes.highlight_document() for the format.
+    """
+    data = await _json_body(request)
+    search_terms, message = parse_search_terms(data)
+    semantic_matches = data.get('semanticMatches', [])
+    if not message and (not isinstance(semantic_matches, list) or not all(isinstance(word, str) for word in semantic_matches)):
+        message = "'semanticMatches' must be a list of strings"
+    if not message:
+        range_start, range_end, message = parse_highlight_range(data)
+    if message:
+        return _error(message, 400)
+    return await _run_cpu(_highlight, data, search_terms, semantic_matches, range_start, range_end)
+
+@router.post('/definitions')
+async def get_word_definition(request: Request):
+    """
+    Fetches the definition for a single word using NLTK's WordNet.
+    """
+    data = await _json_body(request)
+    word = data.get('word')
+    if not word:
+        return _error("Missing 'word' in request body", 400)
+    definition = await _run_cpu(get_definitions, word)
+    return {"word": word, "definition": definition}
+
+@router.post('/definitions/batch')
+async def get_word_definitions_batch(request: Request):
+    """
+    Fetches definitions for a list of words in one request.
+    Expects {"words": [...]} and returns {"definitions": {word: definition}}.
+    """
+    data = await _json_body(request)
+    words = data.get('words')
+    if not isinstance(words, list) or not words or not all(isinstance(word, str) and word for word in words):
+        return _error("'words' must be a non-empty list of strings", 400)
+    if len(words) > DEFINITIONS_BATCH_MAX_WORDS:
+        return _error(f"Too many words: at most {DEFINITIONS_BATCH_MAX_WORDS} per request", 400)
+    return {"definitions": await _run_cpu(get_definitions_batch, words)}
+
+@router.post('/preprocess')
+async def preprocess(request: Request):
+    """
+    Runs the NLTK preprocessing service on 'text', on an uploaded 'documentId', or on
+    a list of 'texts' (answered under 'processed_texts').
+    """
+    data = await _json_body(request)
+    if 'texts' in data:
+        texts, message = parse_preprocess_texts(data)
+        if message:
+            return _error(message, 400)
+        return {"processed_texts": await _run_cpu(preprocess_batch, texts)}
+    if data.get('documentId'):
+        record = get_document(data['documentId'])
+        if record is None:
+            return _error(f"Unknown or expired documentId '{data['documentId']}'", 404)
+        text = record.text
+    elif 'text' in data:
+        text = data['text']
+    else:
+        return _error("Missing 'text', 'texts' or 'documentId' in request body", 400)
+    return {"processed_text": await _run_cpu(preprocess_text, text)}
+
+@router.post('/corpus/documents')
+async def add_corpus_document(request: Request):
+    """Adds a 'documentId' or 'documentContent' to the corpus index (see main_routes.add_corpus_document)."""
+    index = get_corpus_index()
+    if index is None:
+        return _error(CORPUS_DISABLED_MESSAGE, 404)
+    data = await _json_body(request)
+    record = await _run_cpu(_resolve_document, data)
+    added = await _run_cpu(index.add, record.document_id, record.text, record.filename or data.get('filename'))
+    return {"message": "Document indexed" if added else "Document already indexed",
+            "documentId": record.document_id, "added": added}
+
+@router.delete('/corpus/documents/{document_id}')
+async def delete_corpus_document(document_id: str):
+    """Removes a document from the corpus index."""
+    index = get_corpus_index()
+    if index is None:
+        return _error(CORPUS_DISABLED_MESSAGE, 404)
+    if not await _run_io(index.delete, document_id):
+        return _error(f"Document '{document_id}' is not in the corpus index", 404)
+    return {"message": "Document removed from the corpus index", "documentId": document_id}
+
+def _search_corpus(index, options: dict) -> JSONResponse:
+    response = index.search(**options)
+    with metrics.stage('serialize'):
+        return JSONResponse(response)
+
+@router.post('/corpus/search')
+async def search_corpus(request: Request):
+    """
+    Searches every indexed document for a 'query' in 'bm25', 'exact' or 'phrase'
+    mode. See main_routes.search_corpus() for the request and response format.
+    """
+    index = get_corpus_index()
+    if index is None:
+        return _error(CORPUS_DISABLED_MESSAGE, 404)
+    options, message = parse_corpus_search(await _json_body(request))
+    if message:
+        return _error(message, 400)
+    return await _run_cpu(_search_corpus, index, options)
+
+@router.post('/download_pdf')
+async def download_pdf(request: Request):
+    """
+    Returns a document with its highlights as a PDF file, rendered from the text
+    and cached (see main_routes.download_pdf). Rendered 'highlightedHtml' without a
+    document is still converted with xhtml2pdf.
+    """
+    data = await _json_body(request)
+    filename = parse_pdf_filename(data)
+    disposition = {"Content-Disposition": attachment_disposition(filename)}
+
+    if data.get('highlightedHtml') and not (data.get('documentId') or data.get('documentContent')):
+        try:
+            pdf_bytes = await _run_cpu(generate_highlighted_pdf, data['highlightedHtml'], filename)
+        except Exception as e:
+            print(f"Error generating PDF: {e}")
+            return _error(f"Failed to generate PDF: {str(e)}", 500)
+        return Response(pdf_bytes, media_type='application/pdf', headers=disposition)
+
+    spans, kinds, message = parse_pdf_highlights(data)
+    if message:
+        return _error(message, 400)
+    record = await _run_cpu(_resolve_document, data)
+
+    try:
+        pdf_bytes = await _run_cpu(get_highlighted_pdf, record.document_id, record.text, spans, kinds)
+    except ValueError as e:
+        return _error(str(e), 400)
+    except Exception as e:
+        print(f"Error generating PDF: {e}")
+        return _error(f"Failed to generate PDF: {str(e)}", 500)
+    return StreamingResponse(
+        iter_pdf_chunks(pdf_bytes),
+        media_type='application/pdf',
+        headers={**disposition, "Content-Length": str(len(pdf_bytes))}
+    )
+
+@router.post('/session/save')
+async def save_session_route(request: Request):
+    """
+    Saves the current session state and returns a unique ID and shareable link.
+    """
+    data = await _json_body(request)
+    search_term = data.get('searchTerm')
+    highlighted_html = data.get('highlightedHtml')
+    if not all([search_term, highlighted_html]):
+        return _error("Missing session data (searchTerm, documentId or documentContent, highlightedHtml)", 400)
+    record = await _run_cpu(_resolve_document, data)
+
+    try:
+        session_id = await _run_io(save_session, search_term, record.text, highlighted_html)
+        shareable_link = f"http://localhost:5173/session/{session_id}"
+        return {"message": "Session saved successfully", "sessionId": session_id, "shareableLink": shareable_link}
+    except Exception as e:
+        logger.exception("Error in save_session_route: %s", e)
+        return _error(f"Failed to save session: {str(e)}", 500)
+
+@router.get('/session/{session_id}')
+async def load_session_route(session_id: str):
+    """
+    Loads a session state given its ID.
+    """
+    try:
+        session_data = await _run_io(load_session, session_id)
+    except Exception as e:
+        logger.exception("Error in load_session_route: %s", e)
+        return _error(f"Failed to load session: {str(e)}", 500)
+    if session_data:
+        return session_data
+    return _error("Session not found", 404)
+
+async def _http_error(request: Request, exc: StarletteHTTPException) -> JSONResponse:
+    """Returns errors as {"error": ...} like the Flask routes, not FastAPI's {"detail": ...}."""
+    return _error(exc.detail, exc.status_code)
+
+async def _time_request(request: Request, call_next):
+    """Times each request for /metrics and, with SERVER_TIMING_HEADER, a Server-Timing header."""
+    timings = metrics.begin_request(request.url.path)
+
+    def finish(status: int):
+        # Label by route template, not path, so session IDs don't create new series
+        route = request.scope.get('route')
+        timings.endpoint = getattr(route, 'path', 'unmatched')
+        metrics.end_request(timings, status)
+
+    try:
+        response = await call_next(request)
+    except BaseException:
+        finish(500)
+        raise
+    if SERVER_TIMING_HEADER:
+        response.headers['Server-Timing'] = timings.server_timing()
+
+    # The body of a streamed response (and the work behind it) is produced after
+    # call_next() returns; finish timing once all of it has been sent
+    body = response.body_iterator
+
+    async def timed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            finish(response.status_code)
+
+    response.body_iterator = timed_body()
+    return response
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    yield
+    _cpu_executor.shutdown(wait=False, cancel_futures=True)
+    _io_executor.shutdown(wait=False, cancel_futures=True)
+
+def create_asgi_app() -> FastAPI:
+    """Creates the ASGI application; the counterpart of app.create_app()."""
+    app = FastAPI(title="SmartDoc Insight", lifespan=_lifespan)
+    app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"], expose_headers=["ETag"])
+    app.add_exception_handler(StarletteHTTPException, _http_error)
+    app.middleware('http')(_time_request)
+    app.include_router(router)
+    metrics.install_profiler_signal()
+
+    if WARMUP_ON_START:
+        warm_up(load_model=PRELOAD_MODEL)
+    print_startup_report()
+    return app
@@ -1,5 +1,6 @@
 # smartdoc-insight/backend/app/config.py
 import os
+import tempfile
 
 # A secret key is crucial for Flask security (e.g., session management).
 # Load from environment variable for production, use a placeholder for development.
@@ -8,4 +9,210 @@ SECRET_KEY = os.environ.get('SECRET_KEY', 'a_very_long_random_string_for_develop
 # Placeholder for OpenAI API key, will be loaded from .env
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 
+# Number of texts sent to the Sentence-BERT model per forward pass when a document
+# vocabulary is encoded for /search.
+ENCODE_BATCH_SIZE = int(os.environ.get('ENCODE_BATCH_SIZE', '256'))
+
+# Sentence-BERT model used for semantic search. Also scopes the embedding cache.
+SENTENCE_BERT_MODEL = os.environ.get('SENTENCE_BERT_MODEL', 'all-MiniLM-L6-v2')
+
+# Word-embedding cache: an in-memory LRU tier bounded in bytes, plus an optional
+# on-disk tier shared by all worker processes on the host, enabled by setting
+# EMBEDDING_CACHE_DIR. The disk tier holds at most EMBEDDING_CACHE_DISK_MAX_ROWS
+# vectors of 4 bytes per dimension (1.5 KB for the default 384-dim model, so the
+# default 100000 rows take ~150 MB): it is written in generations of half that
+# size, and words not looked up during the last generation are dropped.
+EMBEDDING_CACHE_MEMORY_BYTES = int(os.environ.get('EMBEDDING_CACHE_MEMORY_BYTES', str(64 * 1024 * 1024)))
+EMBEDDING_CACHE_DIR = os.environ.get('EMBEDDING_CACHE_DIR', '')
+EMBEDDING_CACHE_DISK_MAX_ROWS = int(os.environ.get('EMBEDDING_CACHE_DISK_MAX_ROWS', '100000'))
+
+# Server-side document registry: /upload returns a documentId and later requests
+# refer to it instead of resending the text. Entries are evicted by count, by total
+# estimated memory (text + vocabulary + embedding matrix) and after an idle TTL.
+DOCUMENT_STORE_MAX_DOCUMENTS = int(os.environ.get('DOCUMENT_STORE_MAX_DOCUMENTS', '256'))
+DOCUMENT_STORE_MAX_BYTES = int(os.environ.get('DOCUMENT_STORE_MAX_BYTES', str(512 * 1024 * 1024)))
+DOCUMENT_STORE_TTL_SECONDS = float(os.environ.get('DOCUMENT_STORE_TTL_SECONDS', '3600'))
+
+# Vector index over document vocabularies: 'exact' (brute force), 'ivf' (approximate
+# inverted-file index) or 'auto' (IVF only for vocabularies of at least
+# VECTOR_INDEX_IVF_MIN_VECTORS words). NPROBE trades IVF recall for speed.
+VECTOR_INDEX_BACKEND = os.environ.get('VECTOR_INDEX_BACKEND', 'auto')
+VECTOR_INDEX_IVF_MIN_VECTORS = int(os.environ.get('VECTOR_INDEX_IVF_MIN_VECTORS', '50000'))
+VECTOR_INDEX_IVF_NPROBE = int(os.environ.get('VECTOR_INDEX_IVF_NPROBE', '8'))
+
+# WordNet definitions: number of memoized lookups, and the maximum number of words
+# accepted by one /definitions/batch request.
+DEFINITION_CACHE_SIZE = int(os.environ.get('DEFINITION_CACHE_SIZE', '50000'))
+DEFINITIONS_BATCH_MAX_WORDS = int(os.environ.get('DEFINITIONS_BATCH_MAX_WORDS', '2000'))
+
+# Preprocessing. Lemmas are memoized per word, up to LEMMA_CACHE_SIZE words (the
+# memo is cleared when full). /preprocess accepts up to PREPROCESS_MAX_TEXTS texts
+# per request; batches of at least PREPROCESS_PARALLEL_MIN_TEXTS texts are spread
+# over PREPROCESS_WORKERS processes (0 keeps them in the calling thread).
+LEMMA_CACHE_SIZE = int(os.environ.get('LEMMA_CACHE_SIZE', '200000'))
+PREPROCESS_MAX_TEXTS = int(os.environ.get('PREPROCESS_MAX_TEXTS', '1000'))
+PREPROCESS_WORKERS = int(os.environ.get('PREPROCESS_WORKERS', '0'))
+PREPROCESS_PARALLEL_MIN_TEXTS = int(os.environ.get('PREPROCESS_PARALLEL_MIN_TEXTS', '64'))
+
+# Upload limits, so one huge file cannot starve a worker. Uploads are spooled to a
+# temporary file in UPLOAD_SPOOL_DIR (the system temp directory by default) rather
+# than buffered in memory. MAX_CONTENT_LENGTH is enforced by Flask on the whole
+# request body and leaves room for the multipart envelope.
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', str(50 * 1024 * 1024)))
+MAX_CONTENT_LENGTH = MAX_UPLOAD_BYTES + 1024 * 1024
+MAX_DOCUMENT_PAGES = int(os.environ.get('MAX_DOCUMENT_PAGES', '2000'))
+UPLOAD_SPOOL_DIR = os.environ.get('UPLOAD_SPOOL_DIR') or None
+
+# Process-pool document parsing for /upload and /upload/stream. Large PDFs are
+# split into ranges of PARSE_PAGES_PER_TASK pages parsed in parallel. Each document
+# gets a wall-clock timeout. Set PARSE_POOL_WORKERS to 0 to parse in the request
+# thread instead.
+# PARSE_MEMORY_LIMIT_BYTES caps each parser process's address space (RLIMIT_AS) and
+# is off (0) by default. RLIMIT_AS counts every mapping, not resident memory: an idle
+# worker maps ~140 MB once pdfminer and numpy are imported, and BLAS thread buffers
+# grow that with the core count. Measure VmPeak in /proc/<worker pid>/status while
+# parsing your largest documents and leave headroom before setting it.
+PARSE_POOL_WORKERS = int(os.environ.get('PARSE_POOL_WORKERS', str(os.cpu_count() or 1)))
+PARSE_TIMEOUT_SECONDS = float(os.environ.get('PARSE_TIMEOUT_SECONDS', '120'))
+PARSE_MEMORY_LIMIT_BYTES = int(os.environ.get('PARSE_MEMORY_LIMIT_BYTES', '0')) or None
+PARSE_PAGES_PER_TASK = int(os.environ.get('PARSE_PAGES_PER_TASK', '20'))
+
+# Startup. Heavy dependencies load on first use unless warmed up at boot:
+# WARMUP_ON_START checks NLTK data and loads WordNet when the app is created;
+# PRELOAD_MODEL also loads the Sentence-BERT model. With `gunicorn --preload` the
+# warm-up runs once in the master and forked workers share the loaded objects
+# copy-on-write. NLTK_AUTO_DOWNLOAD allows missing NLTK data to be downloaded
+# during warm-up (never at import time).
+def _env_flag(name: str, default: bool) -> bool:
+    return os.environ.get(name, '1' if default else '0').lower() in ('1', 'true', 'yes', 'on')
+
+WARMUP_ON_START = _env_flag('WARMUP_ON_START', True)
+PRELOAD_MODEL = _env_flag('PRELOAD_MODEL', False)
+NLTK_AUTO_DOWNLOAD = _env_flag('NLTK_AUTO_DOWNLOAD', True)
+
+# Storage of vocabulary embedding matrices kept with each document: 'float32'
+# (exact, the default), or opt-in 'float16' (half the memory) or 'int8' with
+# per-vector scales (a quarter). The compact forms make every similarity score
+# approximate, so matches near a threshold can appear, disappear or change rank; run
+# benchmarks/report_quantization.py on your documents before switching. Scoring runs
+# directly on the compact form: int8 scores as fast as float32, float16 several
+# times slower (numpy converts half floats in software). When EMBEDDING_MMAP_DIR is
+# set, the matrices are moved to memory-mapped files there once built, so they are
+# held in the OS page cache rather than on the worker's heap.
+EMBEDDING_STORAGE_DTYPE = os.environ.get('EMBEDDING_STORAGE_DTYPE', 'float32')
+EMBEDDING_MMAP_DIR = os.environ.get('EMBEDDING_MMAP_DIR', '')
+
+# Multi-term search. /search accepts up to SEARCH_MAX_TERMS terms per request.
+# Phrases of 2..SEARCH_PHRASE_MAX_WORDS words are also compared with the document's
+# phrases of the same length, of which the SEARCH_PHRASE_MAX_NGRAMS most frequent
+# are embedded (once per document and phrase length).
+SEARCH_MAX_TERMS = int(os.environ.get('SEARCH_MAX_TERMS', '50'))
+SEARCH_PHRASE_MAX_WORDS = int(os.environ.get('SEARCH_PHRASE_MAX_WORDS', '4'))
+SEARCH_PHRASE_MAX_NGRAMS = int(os.environ.get('SEARCH_PHRASE_MAX_NGRAMS', '20000'))
+
+# Passage search (/search with includePassages). Documents are split into passages
+# of whole sentences up to PASSAGE_MAX_CHARS characters, each starting with the last
+# PASSAGE_OVERLAP_SENTENCES sentences of the previous one; longer sentences are cut
+# into windows of words. The first PASSAGE_MAX_PASSAGES passages are embedded once
+# per document, in the background right after upload when PASSAGE_INDEX_ON_UPLOAD is
+# set, and kept in the parse cache. A request asks for up to PASSAGE_SEARCH_MAX_COUNT.
+PASSAGE_MAX_CHARS = int(os.environ.get('PASSAGE_MAX_CHARS', '600'))
+PASSAGE_OVERLAP_SENTENCES = int(os.environ.get('PASSAGE_OVERLAP_SENTENCES', '1'))
+PASSAGE_MAX_PASSAGES = int(os.environ.get('PASSAGE_MAX_PASSAGES', '50000'))
+PASSAGE_INDEX_ON_UPLOAD = _env_flag('PASSAGE_INDEX_ON_UPLOAD', True)
+PASSAGE_SEARCH_MAX_COUNT = int(os.environ.get('PASSAGE_SEARCH_MAX_COUNT', '50'))
+
+# /search result cache. The semantic matches and suggestions of a term are cached by
+# document content hash, normalized term, thresholds, suggestion count and model
+# settings: up to SEARCH_CACHE_ITEMS terms per worker and, with SEARCH_CACHE_SHARED,
+# in the parse cache file shared by all workers. /search responses carry an ETag, and
+# a request sending it back in If-None-Match gets 304 Not Modified.
+SEARCH_CACHE_ITEMS = int(os.environ.get('SEARCH_CACHE_ITEMS', '10000'))
+SEARCH_CACHE_SHARED = _env_flag('SEARCH_CACHE_SHARED', True)
+
+# Highlight spans computed by /highlight (and /search with includeHighlights) are
+# cached per document and term set, so paging through a long document scans it once.
+HIGHLIGHT_CACHE_BYTES = int(os.environ.get('HIGHLIGHT_CACHE_BYTES', str(32 * 1024 * 1024)))
+
+# PDF export. PDFs rendered from a document and its highlight spans are cached by
+# content hash (document, highlights, style version) up to PDF_CACHE_BYTES, so
+# exporting the same view twice renders once. Responses are streamed in chunks of
+# PDF_STREAM_CHUNK_BYTES.
+PDF_CACHE_BYTES = int(os.environ.get('PDF_CACHE_BYTES', str(64 * 1024 * 1024)))
+PDF_STREAM_CHUNK_BYTES = int(os.environ.get('PDF_STREAM_CHUNK_BYTES', str(64 * 1024)))
+# The built-in Helvetica only covers Latin-1; documents with other characters are
+# rendered with this TrueType font instead (embedded, subset). If the file does not
+# exist such characters are left blank.
+PDF_UNICODE_FONT_PATH = os.environ.get('PDF_UNICODE_FONT_PATH', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
+# Shared sessions (/session/save, /session/<id>). SESSION_STORE_BACKEND is
+# 'firestore', 'sqlite' (a local file at SESSION_SQLITE_PATH, no credentials needed)
+# or 'auto' (Firestore if its service account key file exists, else SQLite). The
+# document text and highlighted HTML are zlib-compressed (SESSION_COMPRESSION_LEVEL)
+# and stored once per content hash however many sessions share them. Loaded
+# sessions are cached in memory up to SESSION_CACHE_BYTES.
+SESSION_STORE_BACKEND = os.environ.get('SESSION_STORE_BACKEND', 'auto')
+SESSION_SQLITE_PATH = os.environ.get('SESSION_SQLITE_PATH', os.path.join(tempfile.gettempdir(), 'smartdoc_sessions.sqlite3'))
+SESSION_COMPRESSION_LEVEL = int(os.environ.get('SESSION_COMPRESSION_LEVEL', '6'))
+SESSION_CACHE_BYTES = int(os.environ.get('SESSION_CACHE_BYTES', str(32 * 1024 * 1024)))
+
+# Parse cache. The text extracted from an upload is stored under the SHA-256 of the
+# file in a SQLite file at PARSE_CACHE_PATH, shared by all worker processes on the
+# host, so uploading the same file again skips parsing. Document vocabularies are
+# stored there too. Least recently used entries are evicted once the compressed
+# entries exceed PARSE_CACHE_MAX_BYTES. An empty PARSE_CACHE_PATH disables the cache.
+PARSE_CACHE_PATH = os.environ.get('PARSE_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'smartdoc_parse_cache.sqlite3'))
+PARSE_CACHE_MAX_BYTES = int(os.environ.get('PARSE_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))
+
+# Corpus search (/corpus/*). Documents are indexed into a positional inverted index
+# in CORPUS_INDEX_DIR, shared by all worker processes on the host (uploads are added
+# automatically with CORPUS_INDEX_ON_UPLOAD). New documents are buffered in memory and
+# written as a segment every CORPUS_FLUSH_DOCUMENTS documents or after
+# CORPUS_FLUSH_INTERVAL_SECONDS; until then only the worker that received them finds
+# them. A background thread merges CORPUS_MERGE_FACTOR segments of similar size into
+# one, up to CORPUS_MERGE_MAX_DOCUMENTS documents per segment. Query expansion looks
+# up semantic matches among the CORPUS_EXPANSION_VOCABULARY most frequent words and
+# weighs them CORPUS_EXPANSION_WEIGHT. An empty CORPUS_INDEX_DIR disables the corpus.
+# Both are off by default: there is no access control, so anyone who can reach
+# /corpus/search sees the filenames and match offsets of every indexed document,
+# and the index has no retention or size limit. Only enable them where every user
+# may see every other user's uploads.
+CORPUS_INDEX_DIR = os.environ.get('CORPUS_INDEX_DIR', '')
+CORPUS_INDEX_ON_UPLOAD = _env_flag('CORPUS_INDEX_ON_UPLOAD', False)
+CORPUS_FLUSH_DOCUMENTS = int(os.environ.get('CORPUS_FLUSH_DOCUMENTS', '1000'))
+CORPUS_FLUSH_INTERVAL_SECONDS = float(os.environ.get('CORPUS_FLUSH_INTERVAL_SECONDS', '5'))
+CORPUS_MERGE_FACTOR = int(os.environ.get('CORPUS_MERGE_FACTOR', '10'))
+CORPUS_MERGE_MAX_DOCUMENTS = int(os.environ.get('CORPUS_MERGE_MAX_DOCUMENTS', '200000'))
+CORPUS_SEARCH_MAX_RESULTS = int(os.environ.get('CORPUS_SEARCH_MAX_RESULTS', '100'))
+CORPUS_MAX_MATCHES_PER_DOCUMENT = int(os.environ.get('CORPUS_MAX_MATCHES_PER_DOCUMENT', '50'))
+CORPUS_EXPANSION_VOCABULARY = int(os.environ.get('CORPUS_EXPANSION_VOCABULARY', '20000'))
+CORPUS_EXPANSION_WEIGHT = float(os.environ.get('CORPUS_EXPANSION_WEIGHT', '0.5'))
+
+# Instrumentation. /metrics serves Prometheus text metrics (per worker process).
+# SERVER_TIMING_HEADER adds a Server-Timing header with the request's stage timings.
+# The sampling profiler is armed with `kill -USR2 <worker pid>` (or POST
+# /metrics/profile when PROFILE_ENDPOINT is set); it then samples request stacks
+# every PROFILE_SAMPLE_INTERVAL_MS and writes the first request slower than
+# PROFILE_THRESHOLD_MS to PROFILE_DIR as collapsed stacks.
+SERVER_TIMING_HEADER = _env_flag('SERVER_TIMING_HEADER', False)
+PROFILE_ENDPOINT = _env_flag('PROFILE_ENDPOINT', False)
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', '5'))
+PROFILE_THRESHOLD_MS = float(os.environ.get('PROFILE_THRESHOLD_MS', '1000'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'smartdoc_profiles'))
+
+# Inference scheduler. Concurrent /search requests hand their un-cached words to one
+# background thread that waits up to INFERENCE_MAX_WAIT_MS for other requests,
+# deduplicates the texts and encodes up to INFERENCE_MAX_BATCH_SIZE of them in a
+# single model call. INFERENCE_SCHEDULER=0 calls the model directly from each request.
+INFERENCE_SCHEDULER = _env_flag('INFERENCE_SCHEDULER', True)
+INFERENCE_MAX_BATCH_SIZE = int(os.environ.get('INFERENCE_MAX_BATCH_SIZE', str(ENCODE_BATCH_SIZE)))
+INFERENCE_MAX_WAIT_MS = float(os.environ.get('INFERENCE_MAX_WAIT_MS', '5'))
+
+# ASGI serving mode (asgi.py). Handlers run on the event loop and hand blocking work
+# to two bounded thread pools: ASGI_CPU_WORKERS threads for parsing, embedding,
+# preprocessing and PDF rendering, and ASGI_IO_WORKERS threads for session storage
+# calls. Requests beyond that wait in the pools' queues instead of spawning threads.
+ASGI_CPU_WORKERS = int(os.environ.get('ASGI_CPU_WORKERS', str(os.cpu_count() or 1)))
+ASGI_IO_WORKERS = int(os.environ.get('ASGI_IO_WORKERS', '32'))
+
 # Add other configurations here as needed (e.g., database URLs)
\ No newline at end of file
@@ -1,12 +1,79 @@
 # smartdoc-insight/backend/app/main_routes.py
-from flask import Blueprint, jsonify, request, send_file, url_for # Added url_for for shareable link generation
-from .services.document_parser import parse_document
-from .services.nlp_service import preprocess_text, get_semantic_matches, get_definitions, get_suggested_words
-from .services.pdf_generator import generate_highlighted_pdf
+from flask import Blueprint, Response, g, jsonify, request, send_file, stream_with_context, url_for # Added url_for for shareable link generation
+from .services.document_parser import parse_document, iter_document_chunks, spool_upload, DocumentLimitError
+from .services.nlp_service import preprocess_text, preprocess_texts, get_definitions, get_definitions_batch
+from .services.document_store import (
+    register_document, get_document, search_document_terms, search_document_passages, precompute_passages,
+)
+from .services.parse_executor import get_parse_executor, ParseTimeoutError
+from .services.parse_cache import get_parse_cache
+from .services.corpus_index import SEARCH_MODES, get_corpus_index
+from .services.search_cache import etag_matches, search_etag
+from .services.highlighter import HIGHLIGHT_KINDS, get_highlights
+from .services.pdf_generator import generate_highlighted_pdf, get_highlighted_pdf, iter_pdf_chunks
 from .services.session_manager import save_session, load_session # New import for session management
+from .services import metrics
+from .config import (
+    CORPUS_INDEX_ON_UPLOAD, CORPUS_MAX_MATCHES_PER_DOCUMENT, CORPUS_SEARCH_MAX_RESULTS, DEFINITIONS_BATCH_MAX_WORDS, MAX_UPLOAD_BYTES, PARSE_POOL_WORKERS, PASSAGE_SEARCH_MAX_COUNT, PREPROCESS_MAX_TEXTS,
+    PREPROCESS_PARALLEL_MIN_TEXTS, PREPROCESS_WORKERS, PROFILE_ENDPOINT, SEARCH_MAX_TERMS, SERVER_TIMING_HEADER,
+)
+from urllib.parse import quote
+from werkzeug.http import dump_options_header
+import hashlib
 import io
+import json
+import logging
+import os
+import unicodedata
 
 bp = Blueprint('main', __name__)
+logger = logging.getLogger(__name__)
+
+def _resolve_document(data: dict):
+    """
+    Finds the document a request refers to, either by 'documentId' (preferred) or by
+    the full 'documentContent' for clients still sending the text.
+
+    Returns:
+        tuple: (DocumentRecord, None) on success, or (None, (error_response, status)).
+    """
+    document_id = data.get('documentId')
+    document_content = data.get('documentContent')
+    if document_id:
+        record = get_document(document_id)
+        if record is not None:
+            return record, None
+        if not document_content:
+            return None, (jsonify({"error": f"Unknown or expired documentId '{document_id}'. Please upload the document again."}), 404)
+    if not document_content:
+        return None, (jsonify({"error": "Missing 'documentId' or 'documentContent' in request"}), 400)
+    return register_document(document_content), None
+
+@bp.before_request
+def _begin_timing():
+    g.timings = metrics.begin_request(request.url_rule.rule if request.url_rule else 'unmatched')
+
+@bp.after_request
+def _end_timing(response):
+    timings = g.pop('timings', None)
+    if timings is not None:
+        if SERVER_TIMING_HEADER:
+            response.headers['Server-Timing'] = timings.server_timing()
+        if response.is_streamed:
+            # The body (and the work behind it) is produced after this returns; finish
+            # timing once the server has sent it and closes the response
+            status = response.status_code
+            response.call_on_close(lambda: metrics.end_request(timings, status))
+        else:
+            metrics.end_request(timings, response.status_code)
+    return response
+
+@bp.teardown_request
+def _end_timing_on_error(error):
+    # after_request does not run when a route raises
+    timings = g.pop('timings', None)
+    if timings is not None:
+        metrics.end_request(timings, 500)
 
 @bp.route('/status')
 def status():
@@ -15,10 +82,109 @@ def status():
     """
     return jsonify({"status": "Backend is running!"}), 200
 
+@bp.route('/metrics')
+def metrics_endpoint():
+    """
+    Prometheus metrics of this worker process: request and stage latency histograms,
+    model encode counters and the hit/miss counters of every cache.
+    """
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/metrics/profile', methods=['GET', 'POST'])
+def profile_endpoint():
+    """
+    Shows (GET) or changes (POST {"enabled": bool, "thresholdMs": number}) the state
+    of the slow-request sampling profiler. Only available with PROFILE_ENDPOINT set.
+    """
+    if not PROFILE_ENDPOINT:
+        return jsonify({"error": "The profiler endpoint is disabled (set PROFILE_ENDPOINT=1)."}), 404
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if data.get('enabled', True):
+            metrics.profiler.arm(float(data.get('thresholdMs', metrics.PROFILE_THRESHOLD_MS)))
+        else:
+            metrics.profiler.disarm()
+    return jsonify(metrics.profiler.state()), 200
+
+def _cache_extension(filename: str) -> str:
+    return os.path.splitext(filename)[1].lower()
+
+def parse_spooled_upload(path: str, filename: str, content_hash: str) -> str:
+    """
+    Returns the text of a spooled upload: from the parse cache if a file with the
+    same content hash was parsed before, else parsed (in the worker pool when
+    PARSE_POOL_WORKERS > 0) and added to the cache.
+    """
+    cache = get_parse_cache()
+    extension = _cache_extension(filename)
+    if cache is not None:
+        document_text = cache.get_text(content_hash, extension)
+        if document_text is not None:
+            return document_text
+    if PARSE_POOL_WORKERS > 0:
+        # Parse in the worker pool so a slow or malformed file cannot hold this worker
+        document_text = get_parse_executor().parse_file(path, filename)
+    else:
+        with open(path, 'rb') as file_stream:
+            document_text = parse_document(file_stream, filename)
+    if cache is not None:
+        cache.put_text(content_hash, extension, document_text)
+    return document_text
+
+def iter_spooled_upload(path: str, filename: str):
+    """
+    Returns an iterator over the chunks of a spooled upload for /upload/stream, parsed
+    in the worker pool (with its timeout and memory cap) when PARSE_POOL_WORKERS > 0.
+    Close it to stop parsing early.
+
+    Raises:
+        ValueError: If the file type is unsupported.
+    """
+    if PARSE_POOL_WORKERS > 0:
+        return get_parse_executor().iter_chunks(path, filename)
+    file_stream = open(path, 'rb')
+    try:
+        chunks = iter_document_chunks(file_stream, filename)
+    except ValueError:
+        file_stream.close()
+        raise
+
+    def read():
+        with file_stream:
+            yield from chunks
+    return read()
+
+def get_cached_upload_text(filename: str, content_hash: str) -> str | None:
+    """Returns the cached text of an upload for /upload/stream, or None."""
+    cache = get_parse_cache()
+    return None if cache is None else cache.get_text(content_hash, _cache_extension(filename))
+
+def cache_upload_text(filename: str, content_hash: str, document_text: str):
+    """Adds the text streamed by /upload/stream to the parse cache."""
+    cache = get_parse_cache()
+    if cache is not None:
+        cache.put_text(content_hash, _cache_extension(filename), document_text)
+
+def index_uploaded_document(record):
+    """
+    Adds an uploaded document to the corpus index (CORPUS_INDEX_ON_UPLOAD) and starts
+    embedding its passages in the background (PASSAGE_INDEX_ON_UPLOAD). Never fails the upload.
+    """
+    precompute_passages(record)
+    index = get_corpus_index() if CORPUS_INDEX_ON_UPLOAD else None
+    if index is None:
+        return
+    try:
+        # Tokenizing (and any segment flush) happens on the index's background thread
+        index.enqueue(record.document_id, record.text, record.filename)
+    except Exception as e:
+        print(f"Failed to add document '{record.document_id}' to the corpus index: {e}")
+
 @bp.route('/upload', methods=['POST'])
 def upload_document():
     """
-    Handles document uploads, parses them, and returns the extracted text.
+    Handles document uploads, parses them, and returns the extracted text together
+    with a documentId that later requests can use instead of resending the text.
     Expects a file under the 'file' key in the form data.
     """
     if 'file' not in request.files:
@@ -28,41 +194,248 @@ def upload_document():
         return jsonify({"error": "No selected file"}), 400
 
     if file:
+        spooled_path = None
         try:
-            file_stream = io.BytesIO(file.read())
-            document_text = parse_document(file_stream, file.filename)
-            return jsonify({"message": "File uploaded and parsed successfully", "content": document_text}), 200
+            # Spool the upload to disk in chunks instead of reading it into memory,
+            # hashing it on the way for the parse cache
+            hasher = hashlib.sha256()
+            spooled_path = spool_upload(file.stream, MAX_UPLOAD_BYTES, hasher=hasher)
+            document_text = parse_spooled_upload(spooled_path, file.filename, hasher.hexdigest())
+            record = register_document(document_text, file.filename)
+            index_uploaded_document(record)
+            return jsonify({
+                "message": "File uploaded and parsed successfully",
+                "content": document_text,
+                "documentId": record.document_id
+            }), 200
+        except DocumentLimitError as e:
+            return jsonify({"error": str(e)}), 413
         except ValueError as e:
             return jsonify({"error": str(e)}), 400
+        except ParseTimeoutError as e:
+            return jsonify({"error": str(e)}), 422
         except Exception as e:
             return jsonify({"error": f"Failed to process file: {str(e)}"}), 500
+        finally:
+            if spooled_path:
+                os.remove(spooled_path)
     return jsonify({"error": "Something went wrong with the file upload."}), 500
 
+@bp.route('/upload/stream', methods=['POST'])
+def upload_document_stream():
+    """
+    Streaming variant of /upload. Responds with NDJSON: one {"type": "page"} line per
+    extracted page, then a {"type": "done"} line with the documentId, or a
+    {"type": "error"} line if parsing fails part-way.
+    """
+    if 'file' not in request.files:
+        return jsonify({"error": "No file part in the request"}), 400
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({"error": "No selected file"}), 400
+
+    filename = file.filename
+    hasher = hashlib.sha256()
+    try:
+        spooled_path = spool_upload(file.stream, MAX_UPLOAD_BYTES, hasher=hasher)
+    except DocumentLimitError as e:
+        return jsonify({"error": str(e)}), 413
+    content_hash = hasher.hexdigest()
+    cached_text = get_cached_upload_text(filename, content_hash)
+    if cached_text is not None:
+        os.remove(spooled_path)
+        record = register_document(cached_text, filename)
+        index_uploaded_document(record)
+        lines = [
+            json.dumps({"type": "page", "page": 1, "text": cached_text}) + '\n',
+            json.dumps({"type": "done", "pages": 1, "documentId": record.document_id, "cached": True}) + '\n',
+        ]
+        return Response(lines, mimetype='application/x-ndjson', headers={"Cache-Control": "no-cache"})
+    try:
+        chunks = iter_spooled_upload(spooled_path, filename)
+    except ValueError as e:
+        os.remove(spooled_path)
+        return jsonify({"error": str(e)}), 400
+
+    def generate():
+        pages = []
+        try:
+            for page_number, text in enumerate(chunks, start=1):
+                pages.append(text)
+                yield json.dumps({"type": "page", "page": page_number, "text": text}) + '\n'
+            document_text = ''.join(pages)
+            cache_upload_text(filename, content_hash, document_text)
+            record = register_document(document_text, filename)
+            index_uploaded_document(record)
+            yield json.dumps({"type": "done", "pages": len(pages), "documentId": record.document_id}) + '\n'
+        except (ValueError, ParseTimeoutError) as e:
+            yield json.dumps({"type": "error", "error": str(e)}) + '\n'
+        except Exception as e:
+            yield json.dumps({"type": "error", "error": f"Failed to process file: {str(e)}"}) + '\n'
+        finally:
+            chunks.close()
+            os.remove(spooled_path)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"} # Don't let proxies buffer the stream
+    )
+
+@bp.app_errorhandler(413)
+def request_too_large(e):
+    """Returns a JSON error when a request body exceeds MAX_CONTENT_LENGTH."""
+    return jsonify({"error": f"File is too large: the limit is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB."}), 413
+
+def parse_search_terms(data: dict):
+    """
+    Reads the terms of a /search request: a list under 'searchTerms', or a single
+    'searchTerm'.
+
+    Returns:
+        tuple: (terms, None) on success, or (None, error message).
+    """
+    search_terms = data.get('searchTerms')
+    if search_terms is None:
+        search_term = data.get('searchTerm')
+        if not search_term:
+            return None, "Missing 'searchTerm' or 'searchTerms' in request"
+        return [search_term], None
+    if not isinstance(search_terms, list) or not search_terms or not all(isinstance(term, str) and term.strip() for term in search_terms):
+        return None, "'searchTerms' must be a non-empty list of strings"
+    if len(search_terms) > SEARCH_MAX_TERMS:
+        return None, f"Too many search terms: at most {SEARCH_MAX_TERMS} per request"
+    return search_terms, None
+
+def parse_highlight_range(data: dict):
+    """
+    Reads the optional 'rangeStart'/'rangeEnd' window (UTF-16 code unit offsets, as
+    JavaScript string indices) of a highlight request.
+
+    Returns:
+        tuple: (range_start, range_end, None) on success, or (None, None, error message).
+    """
+    range_start = data.get('rangeStart')
+    range_end = data.get('rangeEnd')
+    for value in (range_start, range_end):
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+            return None, None, "'rangeStart' and 'rangeEnd' must be non-negative integers"
+    return range_start, range_end, None
+
+def parse_passage_count(data: dict):
+    """
+    Reads the optional 'passageCount' of a /search request with 'includePassages'
+    (5 if not given).
+
+    Returns:
+        tuple: (count, None) on success, or (None, error message).
+    """
+    count = data.get('passageCount', 5)
+    if not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= PASSAGE_SEARCH_MAX_COUNT:
+        return None, f"'passageCount' must be an integer between 1 and {PASSAGE_SEARCH_MAX_COUNT}"
+    return count, None
+
+def build_search_response(data: dict, record, search_terms: list[str], results: list) -> dict:
+    """
+    Builds the /search response: top-level matches for a single 'searchTerm', or one
+    entry per term under 'results' for 'searchTerms'.
+    """
+    response = {"message": "Search processed successfully", "documentId": record.document_id}
+    if data.get('includePassages'):
+        passage_count, _ = parse_passage_count(data)
+        passages = search_document_passages(record, search_terms, passage_count)
+    else:
+        passages = None
+    if data.get('searchTerms') is None:
+        semantic_matches, suggested_words, phrase_matches = results[0]
+        response.update(searchTerm=search_terms[0], semanticMatches=semantic_matches, suggestedWords=suggested_words,
+                        phraseMatches=phrase_matches)
+        if passages is not None:
+            response["passages"] = passages[0]
+    else:
+        response["searchTerms"] = search_terms
+        response["results"] = [
+            {"searchTerm": term, "semanticMatches": semantic_matches, "suggestedWords": suggested_words,
+             "phraseMatches": phrase_matches}
+            for term, (semantic_matches, suggested_words, phrase_matches) in zip(search_terms, results)
+        ]
+        if passages is not None:
+            for entry, term_passages in zip(response["results"], passages):
+                entry["passages"] = term_passages
+    if data.get('includeHighlights'):
+        range_start, range_end, _ = parse_highlight_range(data)
+        response["highlights"] = get_highlights(
+            record.document_id, record.text, search_terms,
+            [match for semantic_matches, _, _ in results for match in semantic_matches],
+            range_start, range_end,
+        )
+    if data.get('includeDefinitions'):
+        response["definitions"] = get_definitions_batch(
+            list(dict.fromkeys(search_terms + [match for semantic_matches, _, _ in results for match in semantic_matches]))
+        )
+    return response
+
 @bp.route('/search', methods=['POST'])
 def search_document():
     """
-    Performs search and highlighting based on a search term and document content.
-    Uses NLP services to find exact matches, semantic matches, and suggestions.
+    Searches a document ('documentId' from /upload, or 'documentContent') for a
+    'searchTerm' or a list of 'searchTerms', returning exact matches, single-word
+    'semanticMatches', similar 'phraseMatches' and suggestions per term. Optional
+    'includeDefinitions', 'includeHighlights' and 'includePassages' add those to the
+    response. Responses carry an ETag; a matching If-None-Match gets 304 Not Modified.
     """
     data = request.get_json()
-    search_term = data.get('searchTerm')
-    document_content = data.get('documentContent')
-
-    if not search_term or not document_content:
-        return jsonify({"error": "Missing 'searchTerm' or 'documentContent' in request"}), 400
+    search_terms, message = parse_search_terms(data)
+    if not message:
+        _, _, message = parse_highlight_range(data)
+    if not message and data.get('includePassages'):
+        _, message = parse_passage_count(data)
+    if message:
+        return jsonify({"error": message}), 400
+    record, error = _resolve_document(data)
+    if error:
+        return error
+    etag = search_etag(record.document_id, data)
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        metrics.increment("smartdoc_search_not_modified_total")
+        not_modified = Response(status=304)
+        not_modified.set_etag(etag)
+        return not_modified
 
-    # Get semantic matches (synonyms) using Sentence-BERT
-    semantic_matches = get_semantic_matches(document_content, search_term) # Threshold is set in nlp_service.py
+    # Semantic matches (synonyms) and suggested related words come from the search
+    # result cache or one query against the document's cached indexes
+    results = search_document_terms(record, search_terms)
+    response = build_search_response(data, record, search_terms, results)
+    with metrics.stage('serialize'):
+        response = jsonify(response)
+    response.set_etag(etag)
+    return response, 200
 
-    # Get suggested related words using Sentence-BERT
-    suggested_words = get_suggested_words(search_term, document_content)
+@bp.route('/highlight', methods=['POST'])
+def highlight_document():
+    """
+    Returns the positions of search terms ('searchTerm' or 'searchTerms') and
+    'semanticMatches' in a document as compact [start, end, kind] spans, where kind
+    indexes the returned 'kinds' list. Offsets are UTF-16 code units, as JavaScript
+    string indices. 'rangeStart'/'rangeEnd' limit the response to the spans
+    overlapping that window, so a client can fetch highlights for the visible part only.
+    """
+    data = request.get_json()
+    search_terms, message = parse_search_terms(data)
+    semantic_matches = data.get('semanticMatches', [])
+    if not message and (not isinstance(semantic_matches, list) or not all(isinstance(word, str) for word in semantic_matches)):
+        message = "'semanticMatches' must be a list of strings"
+    if not message:
+        range_start, range_end, message = parse_highlight_range(data)
+    if message:
+        return jsonify({"error": message}), 400
+    record, error = _resolve_document(data)
+    if error:
+        return error
 
-    return jsonify({
-        "message": "Search processed successfully",
-        "searchTerm": search_term,
-        "semanticMatches": semantic_matches,
-        "suggestedWords": suggested_words
-    }), 200
+    highlights = get_highlights(record.document_id, record.text, search_terms, semantic_matches, range_start, range_end)
+    with metrics.stage('serialize'):
+        return jsonify({"documentId": record.document_id, **highlights}), 200
 
 @bp.route('/definitions', methods=['POST'])
 def get_word_definition():
@@ -77,71 +450,256 @@ def get_word_definition():
     definition = get_definitions(word)
     return jsonify({"word": word, "definition": definition}), 200
 
+@bp.route('/definitions/batch', methods=['POST'])
+def get_word_definitions_batch():
+    """
+    Fetches definitions for a list of words in one request.
+    Expects {"words": [...]} and returns {"definitions": {word: definition}}.
+    """
+    data = request.get_json()
+    words = data.get('words') if data else None
+    if not isinstance(words, list) or not words or not all(isinstance(word, str) and word for word in words):
+        return jsonify({"error": "'words' must be a non-empty list of strings"}), 400
+    if len(words) > DEFINITIONS_BATCH_MAX_WORDS:
+        return jsonify({"error": f"Too many words: at most {DEFINITIONS_BATCH_MAX_WORDS} per request"}), 400
+
+    return jsonify({"definitions": get_definitions_batch(words)}), 200
+
+def parse_preprocess_texts(data: dict):
+    """
+    Reads the 'texts' list of a batch /preprocess request.
+
+    Returns:
+        tuple: (texts, None) on success, or (None, error message).
+    """
+    texts = data.get('texts')
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return None, "'texts' must be a list of strings"
+    if len(texts) > PREPROCESS_MAX_TEXTS:
+        return None, f"Too many texts: the limit is {PREPROCESS_MAX_TEXTS} per request"
+    return texts, None
+
+def preprocess_batch(texts: list[str]) -> list[list[str]]:
+    """Preprocesses a batch of texts, in worker processes if it is large enough to pay off."""
+    workers = PREPROCESS_WORKERS if len(texts) >= PREPROCESS_PARALLEL_MIN_TEXTS else 0
+    return list(preprocess_texts(texts, workers=workers))
+
 @bp.route('/preprocess', methods=['POST'])
 def preprocess():
     """
     Endpoint to test the NLTK preprocessing service.
+    Accepts either 'text', the 'documentId' of an uploaded document, or a list of
+    'texts' (answered with one token list per text under 'processed_texts').
     """
     data = request.get_json()
-    if not data or 'text' not in data:
-        return jsonify({"error": "Missing 'text' in request body"}), 400
-    processed_tokens = preprocess_text(data['text'])
+    if data and 'texts' in data:
+        texts, message = parse_preprocess_texts(data)
+        if message:
+            return jsonify({"error": message}), 400
+        return jsonify({"processed_texts": preprocess_batch(texts)}), 200
+    if data and data.get('documentId'):
+        record = get_document(data['documentId'])
+        if record is None:
+            return jsonify({"error": f"Unknown or expired documentId '{data['documentId']}'"}), 404
+        text = record.text
+    elif data and 'text' in data:
+        text = data['text']
+    else:
+        return jsonify({"error": "Missing 'text', 'texts' or 'documentId' in request body"}), 400
+    processed_tokens = preprocess_text(text)
     return jsonify({"processed_text": processed_tokens}), 200
 
+def parse_corpus_search(data: dict):
+    """
+    Reads a /corpus/search request: 'query', and optionally 'mode' ('bm25', 'exact'
+    or 'phrase'), 'limit', 'expand' and 'maxMatches'.
+
+    Returns:
+        tuple: (keyword arguments for CorpusIndex.search(), None) on success, or (None, error message).
+    """
+    query = data.get('query')
+    if not isinstance(query, str) or not query.strip():
+        return None, "'query' must be a non-empty string"
+    mode = data.get('mode', 'bm25')
+    if mode not in SEARCH_MODES:
+        return None, f"'mode' must be one of {', '.join(SEARCH_MODES)}"
+    options = {"query": query, "mode": mode, "expand": bool(data.get('expand', False))}
+    for key, name, default, maximum in (
+        ('limit', 'limit', 10, CORPUS_SEARCH_MAX_RESULTS),
+        ('max_matches', 'maxMatches', CORPUS_MAX_MATCHES_PER_DOCUMENT, CORPUS_MAX_MATCHES_PER_DOCUMENT),
+    ):
+        value = data.get(name, default)
+        if not isinstance(value, int) or isinstance(value, bool) or not 1 <= value <= maximum:
+            return None, f"'{name}' must be an integer from 1 to {maximum}"
+        options[key] = value
+    return options, None
+
+CORPUS_DISABLED_MESSAGE = "Corpus search is disabled (set CORPUS_INDEX_DIR)."
+
+@bp.route('/corpus/documents', methods=['POST'])
+def add_corpus_document():
+    """
+    Adds a document, given as 'documentId' (from /upload) or 'documentContent' (with
+    an optional 'filename'), to the corpus index. Uploads are added automatically
+    unless CORPUS_INDEX_ON_UPLOAD is off.
+    """
+    index = get_corpus_index()
+    if index is None:
+        return jsonify({"error": CORPUS_DISABLED_MESSAGE}), 404
+    data = request.get_json() or {}
+    record, error = _resolve_document(data)
+    if error:
+        return error
+    added = index.add(record.document_id, record.text, record.filename or data.get('filename'))
+    return jsonify({"message": "Document indexed" if added else "Document already indexed",
+                    "documentId": record.document_id, "added": added}), 200
+
+@bp.route('/corpus/documents/<document_id>', methods=['DELETE'])
+def delete_corpus_document(document_id):
+    """Removes a document from the corpus index."""
+    index = get_corpus_index()
+    if index is None:
+        return jsonify({"error": CORPUS_DISABLED_MESSAGE}), 404
+    if not index.delete(document_id):
+        return jsonify({"error": f"Document '{document_id}' is not in the corpus index"}), 404
+    return jsonify({"message": "Document removed from the corpus index", "documentId": document_id}), 200
+
+@bp.route('/corpus/search', methods=['POST'])
+def search_corpus():
+    """
+    Searches every indexed document for a 'query'. 'mode' is 'bm25' (default: any
+    query word, ranked by BM25), 'exact' (all query words) or 'phrase' (the words in
+    order). With 'expand': true, semantic matches of the query words are searched too.
+    Returns up to 'limit' documents, best first, each with its 'documentId',
+    'filename', 'score', 'matchCount' and up to 'maxMatches' match offsets ([start,
+    end] in UTF-16 code units, as from /highlight) under 'matches'.
+    """
+    index = get_corpus_index()
+    if index is None:
+        return jsonify({"error": CORPUS_DISABLED_MESSAGE}), 404
+    options, message = parse_corpus_search(request.get_json() or {})
+    if message:
+        return jsonify({"error": message}), 400
+    response = index.search(**options)
+    with metrics.stage('serialize'):
+        return jsonify(response), 200
+
+def parse_pdf_highlights(data: dict):
+    """
+    Reads the optional 'highlights' of a /download_pdf request: {"kinds": [...],
+    "spans": [[start, end, kind], ...]} as returned by /highlight.
+
+    Returns:
+        tuple: (spans, kinds, None) on success, or (None, None, error message).
+    """
+    highlights = data.get('highlights') or {}
+    if not isinstance(highlights, dict) or not isinstance(highlights.get('spans', []), list):
+        return None, None, "'highlights' must be an object with a 'spans' list"
+    return highlights.get('spans', []), highlights.get('kinds', list(HIGHLIGHT_KINDS)), None
+
+# Control characters (newlines included) cannot appear in a header value
+_FILENAME_CONTROL_CHARACTERS = dict.fromkeys([*range(32), 127])
+
+def parse_pdf_filename(data: dict) -> str:
+    """Returns the download name of a /download_pdf request, without control characters."""
+    filename = data.get('filename')
+    filename = filename.translate(_FILENAME_CONTROL_CHARACTERS).strip() if isinstance(filename, str) else ''
+    return filename or 'highlighted_document.pdf'
+
+def attachment_disposition(filename: str) -> str:
+    """
+    Returns the Content-Disposition header of a file download, as send_file() builds
+    it: the name quoted and escaped, plus an RFC 5987 'filename*' for non-ASCII names
+    with an ASCII approximation in 'filename' for older clients.
+    """
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        return dump_options_header('attachment', {
+            "filename": simple, "filename*": f"UTF-8''{quote(filename, safe='!#$&+^`|')}",
+        })
+    return dump_options_header('attachment', {"filename": filename})
+
 @bp.route('/download_pdf', methods=['POST'])
 def download_pdf():
     """
-    Receives highlighted HTML content and returns it as a PDF file.
+    Returns a document with its highlights as a PDF file. Expects the document
+    ('documentId' or 'documentContent') and its 'highlights' spans as returned by
+    /highlight; the PDF is rendered from the text and cached, so exporting the same
+    view again is served from memory. The bytes are streamed in chunks.
+
+    Clients still sending rendered 'highlightedHtml' instead get it converted with xhtml2pdf.
     """
     data = request.get_json()
-    highlighted_html = data.get('highlightedHtml')
-    filename = data.get('filename', 'highlighted_document.pdf')
+    filename = parse_pdf_filename(data)
+
+    if data.get('highlightedHtml') and not (data.get('documentId') or data.get('documentContent')):
+        try:
+            pdf_bytes = generate_highlighted_pdf(data['highlightedHtml'], filename)
+            # Use send_file to send the PDF bytes as a file download
+            return send_file(
+                io.BytesIO(pdf_bytes),
+                mimetype='application/pdf',
+                as_attachment=True,
+                download_name=filename
+            )
+        except Exception as e:
+            print(f"Error generating PDF: {e}")
+            return jsonify({"error": f"Failed to generate PDF: {str(e)}"}), 500
 
-    if not highlighted_html:
-        return jsonify({"error": "No highlighted HTML content provided"}), 400
+    spans, kinds, message = parse_pdf_highlights(data)
+    if message:
+        return jsonify({"error": message}), 400
+    record, error = _resolve_document(data)
+    if error:
+        return error
 
     try:
-        pdf_bytes = generate_highlighted_pdf(highlighted_html, filename)
-        # Use send_file to send the PDF bytes as a file download
-        return send_file(
-            io.BytesIO(pdf_bytes),
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=filename
-        )
-    except NotImplementedError:
-        return jsonify({"error": "PDF generation is not implemented on the server."}), 501
+        pdf_bytes = get_highlighted_pdf(record.document_id, record.text, spans, kinds)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error generating PDF: {e}")
         return jsonify({"error": f"Failed to generate PDF: {str(e)}"}), 500
+    return Response(
+        iter_pdf_chunks(pdf_bytes),
+        mimetype='application/pdf',
+        headers={
+            "Content-Disposition": attachment_disposition(filename),
+            "Content-Length": str(len(pdf_bytes)),
+        }
+    )
 
 @bp.route('/session/save', methods=['POST'])
 def save_session_route():
     """
-    Saves the current session state to Firestore and returns a unique ID and shareable link.
+    Saves the current session state and returns a unique ID and shareable link.
     """
     data = request.get_json()
     search_term = data.get('searchTerm')
-    document_content = data.get('documentContent')
     highlighted_html = data.get('highlightedHtml') # The full HTML with highlights
 
-    if not all([search_term, document_content, highlighted_html]):
-        return jsonify({"error": "Missing session data (searchTerm, documentContent, highlightedHtml)"}), 400
+    if not all([search_term, highlighted_html]):
+        return jsonify({"error": "Missing session data (searchTerm, documentId or documentContent, highlightedHtml)"}), 400
+    record, error = _resolve_document(data)
+    if error:
+        return error
 
     try:
-        session_id = save_session(search_term, document_content, highlighted_html)
+        session_id = save_session(search_term, record.text, highlighted_html)
         # Construct the shareable link using the frontend's base URL
         # In a real deployed app, this would be your actual frontend domain (e.g., smartdoc.ai)
         shareable_link = f"http://localhost:5173/session/{session_id}" 
         return jsonify({"message": "Session saved successfully", "sessionId": session_id, "shareableLink": shareable_link}), 200
     except Exception as e:
-        print(f"Error in save_session_route: {e}")
+        logger.exception("Error in save_session_route: %s", e)
         return jsonify({"error": f"Failed to save session: {str(e)}"}), 500
 
 @bp.route('/session/<session_id>', methods=['GET'])
 def load_session_route(session_id):
     """
-    Loads a session state from Firestore given its ID.
+    Loads a session state from the session store given its ID.
     This endpoint would primarily be called by the frontend to reconstruct the session.
     """
     try:
@@ -151,5 +709,5 @@ def load_session_route(session_id):
         else:
             return jsonify({"error": "Session not found"}), 404
     except Exception as e:
-        print(f"Error in load_session_route: {e}")
+        logger.exception("Error in load_session_route: %s", e)
         return jsonify({"error": f"Failed to load session: {str(e)}"}), 500
\ No newline at end of file
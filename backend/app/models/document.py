@@ -0,0 +1,43 @@
+# smartdoc-insight/backend/app/models/document.py
+from dataclasses import dataclass, field
+import threading
+import time
+
+import numpy as np
+
+from ..services.vector_index import VectorIndex
+
+@dataclass
+class DocumentRecord:
+    """
+    A parsed document kept server-side so clients can refer to it by ID. The vocabulary,
+    phrase and passage indexes are filled in lazily and reused by later searches.
+    """
+    document_id: str
+    text: str
+    filename: str | None = None
+    created_at: float = field(default_factory=time.time)
+    vocabulary: list[str] | None = None
+    vocabulary_index: VectorIndex | None = None
+    phrase_indexes: dict[int, tuple[list[str], VectorIndex]] = field(default_factory=dict)
+    passages: np.ndarray | None = None  # (n, 2) start and end offsets
+    passage_index: VectorIndex | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+    passage_lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def size_bytes(self) -> int:
+        """Estimated memory footprint of the record, used for the store's memory budget."""
+        size = len(self.text.encode('utf-8'))
+        if self.vocabulary is not None:
+            size += sum(len(word) + 49 for word in self.vocabulary)  # str object overhead
+        if self.vocabulary_index is not None:
+            size += self.vocabulary_index.nbytes
+        for phrases, phrase_index in self.phrase_indexes.values():
+            size += sum(len(phrase) + 49 for phrase in phrases)
+            if phrase_index is not None:
+                size += phrase_index.nbytes
+        if self.passages is not None:
+            size += self.passages.nbytes
+        if self.passage_index is not None:
+            size += self.passage_index.nbytes
+        return size
@@ -0,0 +1,887 @@
+# smartdoc-insight/backend/app/services/corpus_index.py
+import atexit
+import fcntl
+import json
+import math
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import numpy as np
+
+from ..config import (
+    CORPUS_EXPANSION_VOCABULARY, CORPUS_EXPANSION_WEIGHT, CORPUS_FLUSH_DOCUMENTS, CORPUS_FLUSH_INTERVAL_SECONDS,
+    CORPUS_INDEX_DIR, CORPUS_MAX_MATCHES_PER_DOCUMENT, CORPUS_MERGE_FACTOR, CORPUS_MERGE_MAX_DOCUMENTS,
+)
+from .highlighter import to_utf16
+from .metrics import register_stats, stage
+from .nlp_service import build_vocabulary_index, encode_texts, score_search_terms
+
+SEARCH_MODES = ('bm25', 'exact', 'phrase')
+
+# Words are runs of letters and digits, lowercased. Longer tokens (hashes, base64)
+# are not indexed but still take a position, so phrases never match across them.
+_TOKEN = re.compile(r'[^\W_]+')
+MAX_TERM_LENGTH = 64
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Query expansion: semantic matches added per query word, and how long the index
+# over the corpus' most frequent words is reused before it is rebuilt
+_EXPANSION_MAX_TERMS = 5
+_EXPANSION_REFRESH_SECONDS = 300
+
+_ARRAYS = (
+    'term_offsets', 'term_starts', 'docs', 'tf_starts', 'positions', 'starts', 'lengths', 'doc_lengths', 'doc_positions',
+)
+_MANIFEST = 'manifest.json'
+_MANIFEST_VERSION = 1
+
+def query_terms(query: str) -> list[str]:
+    """Splits a query into index terms, the same way documents are tokenized."""
+    return [token.lower() for token in _TOKEN.findall(query) if len(token) <= MAX_TERM_LENGTH]
+
+@dataclass
+class _PendingDocument:
+    """A tokenized document waiting in the in-memory buffer to be written to a segment."""
+    document_id: str
+    filename: str | None
+    terms: list[str]
+    positions: np.ndarray
+    starts: np.ndarray
+    lengths: np.ndarray
+    token_count: int  # Positions taken, including tokens too long to index
+
+@stage('tokenize')
+def _tokenize_document(document_id: str, text: str, filename: str | None) -> _PendingDocument:
+    terms, positions, starts, ends = [], [], [], []
+    position = -1
+    for position, match in enumerate(_TOKEN.finditer(text)):
+        start, end = match.span()
+        if end - start > MAX_TERM_LENGTH:
+            continue
+        terms.append(match.group().lower())
+        positions.append(position)
+        starts.append(start)
+        ends.append(end)
+    # Offsets are stored as UTF-16 code units, like every offset the API returns
+    starts = to_utf16(text, np.array(starts, dtype=np.int64))
+    ends = to_utf16(text, np.array(ends, dtype=np.int64))
+    return _PendingDocument(
+        document_id, filename, terms, np.array(positions, dtype=np.int32),
+        starts.astype(np.int32), (ends - starts).astype(np.uint8), position + 1,
+    )
+
+def _build_postings(term_ids, docs, positions, starts, lengths, num_terms: int) -> dict:
+    """
+    Groups term occurrences, sorted by (term, document, position), into postings lists.
+
+    Returns:
+        dict: 'term_starts', 'docs' and 'tf_starts' offsets, plus the per-occurrence
+        'positions', 'starts' and 'lengths'.
+    """
+    order = np.lexsort((positions, docs, term_ids))
+    term_ids, docs = term_ids[order], docs[order]
+    boundaries = np.ones(len(order), dtype=bool)
+    boundaries[1:] = (term_ids[1:] != term_ids[:-1]) | (docs[1:] != docs[:-1])
+    posting_starts = np.flatnonzero(boundaries)
+    return {
+        "term_starts": np.searchsorted(term_ids[posting_starts], np.arange(num_terms + 1)).astype(np.int64),
+        "docs": docs[posting_starts].astype(np.int32),
+        "tf_starts": np.append(posting_starts, len(order)).astype(np.int64),
+        "positions": positions[order].astype(np.int64),
+        "starts": starts[order].astype(np.int32),
+        "lengths": lengths[order].astype(np.uint8),
+    }
+
+def _term_table(terms: list[str]) -> tuple[bytes, np.ndarray]:
+    """Packs sorted terms into one newline-separated UTF-8 blob and the offset of each term in it."""
+    encoded = [term.encode('utf-8') for term in terms]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(term) + 1 for term in encoded], out=offsets[1:])
+    return b'\n'.join(encoded), offsets
+
+class _Segment:
+    """
+    An immutable part of the corpus index. Terms are sorted by their UTF-8 bytes and
+    found by binary search over the term table; every other array is memory-mapped
+    from the segment directory, so opening a segment reads almost nothing.
+    """
+
+    def __init__(self, name: str, terms_blob: bytes, arrays: dict, document_ids: list[str], filenames: list):
+        self.name = name
+        self._terms_blob = terms_blob
+        for key in _ARRAYS:
+            setattr(self, key, arrays[key])
+        self.document_ids = document_ids
+        self.filenames = filenames
+        self._length_norms = None
+        # Segment-wide position of each document's first token
+        self.position_bases = np.concatenate(([0], np.cumsum(self.doc_positions, dtype=np.int64)))
+
+    def __len__(self) -> int:
+        return len(self.document_ids)
+
+    def terms(self) -> list[str]:
+        return self._terms_blob.decode('utf-8').split('\n') if len(self.term_offsets) > 1 else []
+
+    def postings(self, term: str) -> tuple[int, int] | None:
+        """Returns the range of the term's postings, or None if no document has it."""
+        key = term.encode('utf-8')
+        offsets, blob = self.term_offsets, self._terms_blob
+        low, high = 0, len(offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if blob[offsets[middle]:offsets[middle + 1] - 1] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(offsets) - 1 or blob[offsets[low]:offsets[low + 1] - 1] != key:
+            return None
+        return int(self.term_starts[low]), int(self.term_starts[low + 1])
+
+    def length_norms(self, average_length: float) -> np.ndarray:
+        """Returns the BM25 length normalization of every document, for the corpus' average length."""
+        cached = self._length_norms
+        if cached is None or cached[0] != average_length:
+            norms = BM25_K1 * (1 - BM25_B + BM25_B * np.asarray(self.doc_lengths, dtype=np.float32) / average_length)
+            self._length_norms = cached = (average_length, norms.astype(np.float32))
+        return cached[1]
+
+    def occurrences(self, first: int, last: int, mask: np.ndarray | None = None) -> np.ndarray:
+        """Returns the indexes of the occurrences of postings first..last (only those in `mask`)."""
+        if mask is None:
+            return np.arange(self.tf_starts[first], self.tf_starts[last])
+        postings = np.arange(first, last)[mask]
+        begins = np.asarray(self.tf_starts[postings])
+        counts = np.asarray(self.tf_starts[postings + 1]) - begins
+        # Concatenated ranges begins[i]..begins[i] + counts[i]
+        return np.repeat(begins - np.cumsum(counts) + counts, counts) + np.arange(int(counts.sum()))
+
+    def matches(self, first: int, last: int, ordinal: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the (segment-wide) positions, start offsets and lengths of a term in one document, given its postings range."""
+        posting = first + int(np.searchsorted(self.docs[first:last], np.int32(ordinal)))  # Same dtype: no copy
+        if posting == last or self.docs[posting] != ordinal:
+            begin = end = 0
+        else:
+            begin, end = self.tf_starts[posting], self.tf_starts[posting + 1]
+        return self.positions[begin:end], self.starts[begin:end], self.lengths[begin:end]
+
+    @classmethod
+    @stage('index')
+    def from_documents(cls, name: str, documents: list[_PendingDocument]) -> '_Segment':
+        vocabulary = {}
+        term_ids = np.fromiter(
+            (vocabulary.setdefault(term, len(vocabulary)) for document in documents for term in document.terms),
+            dtype=np.int64, count=sum(len(document.terms) for document in documents),
+        )
+        # Code point order of str equals byte order of UTF-8, which postings() relies on
+        terms = sorted(vocabulary)
+        rank = np.empty(len(terms), dtype=np.int64)
+        rank[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+        docs = np.repeat(np.arange(len(documents), dtype=np.int64), [len(document.terms) for document in documents])
+        bases = np.cumsum([0] + [document.token_count for document in documents][:-1], dtype=np.int64)
+        arrays = _build_postings(
+            rank[term_ids], docs,
+            np.concatenate([document.positions for document in documents]).astype(np.int64) + bases[docs],
+            np.concatenate([document.starts for document in documents]),
+            np.concatenate([document.lengths for document in documents]),
+            len(terms),
+        )
+        blob, arrays["term_offsets"] = _term_table(terms)
+        arrays["doc_lengths"] = np.array([len(document.terms) for document in documents], dtype=np.int32)
+        arrays["doc_positions"] = np.array([document.token_count for document in documents], dtype=np.int32)
+        return cls(name, blob, arrays, [document.document_id for document in documents],
+                   [document.filename for document in documents])
+
+    @classmethod
+    @stage('index')
+    def merge(cls, name: str, segments: list['_Segment'], live_masks: list) -> tuple['_Segment', list[np.ndarray]]:
+        """
+        Merges segments into one, leaving out deleted documents.
+
+        Returns:
+            tuple: The new segment, and per source segment an array mapping its document
+            ordinals to ordinals in the new segment (-1 for deleted documents).
+        """
+        source_terms = [segment.terms() for segment in segments]
+        terms = sorted(set().union(*source_terms))
+        term_index = {term: i for i, term in enumerate(terms)}
+        parts, remaps, document_ids, filenames, doc_lengths, doc_positions = [], [], [], [], [], []
+        position_base = 0
+        for segment, live, segment_terms in zip(segments, live_masks, source_terms):
+            live = np.ones(len(segment), dtype=bool) if live is None else live
+            remap = np.full(len(segment), -1, dtype=np.int64)
+            remap[live] = len(document_ids) + np.arange(int(live.sum()))
+            remaps.append(remap)
+            document_ids.extend(doc_id for doc_id, keep in zip(segment.document_ids, live) if keep)
+            filenames.extend(filename for filename, keep in zip(segment.filenames, live) if keep)
+            doc_lengths.append(np.asarray(segment.doc_lengths)[live])
+            doc_positions.append(np.asarray(segment.doc_positions)[live])
+
+            # Expand postings back to occurrences, renumbering terms and documents
+            tf = np.diff(segment.tf_starts)
+            global_terms = np.array([term_index[term] for term in segment_terms], dtype=np.int64)
+            posting_terms = np.repeat(global_terms, np.diff(segment.term_starts))
+            keep = np.repeat(remap[segment.docs] >= 0, tf)
+            # Positions move with their document: rebase them onto its position in the new segment
+            new_bases = np.zeros(len(segment), dtype=np.int64)
+            new_bases[live] = position_base + np.cumsum(doc_positions[-1], dtype=np.int64) - doc_positions[-1]
+            position_base += int(doc_positions[-1].sum())
+            occurrence_docs = np.repeat(np.asarray(segment.docs), tf)[keep]
+            positions = np.asarray(segment.positions)[keep] - segment.position_bases[occurrence_docs] + new_bases[occurrence_docs]
+            parts.append((
+                np.repeat(posting_terms, tf)[keep], remap[occurrence_docs],
+                positions, np.asarray(segment.starts)[keep], np.asarray(segment.lengths)[keep],
+            ))
+        arrays = _build_postings(*(np.concatenate(columns) for columns in zip(*parts)), len(terms))
+        blob, arrays["term_offsets"] = _term_table(terms)
+        arrays["doc_lengths"] = np.concatenate(doc_lengths).astype(np.int32)
+        arrays["doc_positions"] = np.concatenate(doc_positions).astype(np.int32)
+        return cls(name, blob, arrays, document_ids, filenames), remaps
+
+    def write(self, directory: str):
+        """Writes the segment to `directory`/name. The directory appears complete or not at all."""
+        staging = os.path.join(directory, f".{self.name}.tmp")
+        os.makedirs(staging)
+        with open(os.path.join(staging, 'terms.bin'), 'wb') as f:
+            f.write(self._terms_blob)
+        for key in _ARRAYS:
+            np.save(os.path.join(staging, f"{key}.npy"), getattr(self, key))
+        with open(os.path.join(staging, 'documents.json'), 'w', encoding='utf-8') as f:
+            json.dump({"ids": self.document_ids, "filenames": self.filenames}, f)
+        os.rename(staging, os.path.join(directory, self.name))
+
+    @classmethod
+    def load(cls, directory: str, name: str) -> '_Segment':
+        path = os.path.join(directory, name)
+        with open(os.path.join(path, 'terms.bin'), 'rb') as f:
+            blob = f.read()
+        arrays = {}
+        for key in _ARRAYS:
+            try:
+                # A plain ndarray view of the map: np.memmap's indexing overhead dominates small lookups
+                arrays[key] = np.asarray(np.load(os.path.join(path, f"{key}.npy"), mmap_mode='r'))
+            except ValueError:  # Empty arrays cannot be memory-mapped
+                arrays[key] = np.load(os.path.join(path, f"{key}.npy"))
+        with open(os.path.join(path, 'documents.json'), encoding='utf-8') as f:
+            documents = json.load(f)
+        return cls(name, blob, arrays, documents["ids"], documents["filenames"])
+
+@dataclass
+class _Snapshot:
+    """The segments listed by one version of the manifest, with their deletions applied."""
+    manifest: dict
+    segments: list[_Segment]
+    live: list  # Per segment: bool mask of live documents, or None if none is deleted
+    locations: dict[str, tuple[int, int]]  # Document ID -> (segment index, ordinal)
+    documents: int
+    total_length: int
+
+def _empty_manifest() -> dict:
+    return {"version": _MANIFEST_VERSION, "generation": 0, "segments": [], "deleted": {}}
+
+def _copy_manifest(manifest: dict) -> dict:
+    return {**manifest, "segments": list(manifest["segments"]),
+            "deleted": {name: list(ordinals) for name, ordinals in manifest["deleted"].items()}}
+
+def _bm25(tf: np.ndarray, length_norms: np.ndarray, df: int, num_documents: int) -> np.ndarray:
+    idf = math.log(1 + (num_documents - df + 0.5) / (df + 0.5))
+    tf = tf.astype(np.float32)
+    return np.float32(idf * (BM25_K1 + 1)) * tf / (tf + length_norms)
+
+def _isin_sorted(values: np.ndarray, sorted_values: np.ndarray, universe: int) -> np.ndarray:
+    """
+    np.isin() for a sorted second array of integers in 0..universe - 1: a binary
+    search per value, or for many values a lookup in a bitmap over the universe.
+    """
+    if len(sorted_values) == 0:
+        return np.zeros(len(values), dtype=bool)
+    if universe < 32 * len(values):
+        bitmap = np.zeros(universe, dtype=bool)
+        bitmap[sorted_values] = True
+        return bitmap[values]
+    found = np.searchsorted(sorted_values, values)
+    found[found == len(sorted_values)] = 0
+    return sorted_values[found] == values
+
+def _lookup_sorted(values: np.ndarray, sorted_values: np.ndarray, universe: int) -> np.ndarray:
+    """Returns the index of each of `values` in `sorted_values` (integers in 0..universe - 1), or -1."""
+    if universe < 32 * len(values):
+        table = np.full(universe, -1, dtype=np.int64)
+        table[sorted_values] = np.arange(len(sorted_values))
+        return table[values]
+    found = np.searchsorted(sorted_values, values)
+    found[found == len(sorted_values)] = 0
+    return np.where(sorted_values[found] == values, found, -1)
+
+def _runs(sorted_values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """np.unique(return_counts=True) for an already sorted array."""
+    if len(sorted_values) == 0:
+        return sorted_values, np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], sorted_values[1:] != sorted_values[:-1])))
+    return sorted_values[starts], np.diff(np.append(starts, len(sorted_values)))
+
+class CorpusIndex:
+    """
+    Positional inverted index over many documents, for exact-term, phrase and BM25
+    search. Immutable segments are listed in a manifest that several processes can
+    share; new documents are buffered in memory until flushed as a segment, and a
+    background thread flushes and merges segments.
+
+    Args:
+        directory (str): Directory holding the manifest and the segments.
+        flush_documents (int): Buffered documents that trigger writing a segment.
+        flush_interval (float): Seconds between background flushes and merges (0: no background thread).
+        merge_factor (int): Number of similar-size segments merged together.
+        merge_max_documents (int): Segments with at least this many documents are not merged further.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        flush_documents: int = CORPUS_FLUSH_DOCUMENTS,
+        flush_interval: float = CORPUS_FLUSH_INTERVAL_SECONDS,
+        merge_factor: int = CORPUS_MERGE_FACTOR,
+        merge_max_documents: int = CORPUS_MERGE_MAX_DOCUMENTS,
+    ):
+        self.directory = directory
+        self.flush_documents = flush_documents
+        self.flush_interval = flush_interval
+        self.merge_factor = max(merge_factor, 2)
+        self.merge_max_documents = merge_max_documents
+        self.queries = 0
+        self.flushes = 0
+        self.merges = 0
+        os.makedirs(directory, exist_ok=True)
+        self._manifest_path = os.path.join(directory, _MANIFEST)
+        self._lock = threading.RLock()  # Buffer, snapshot and open segments
+        self._write_lock = threading.Lock()  # Serializes this process' manifest changes
+        self._buffer: dict[str, _PendingDocument] = {}
+        self._buffer_segment = None
+        self._open_segments: dict[str, _Segment] = {}
+        self._snapshot = None
+        self._manifest_key = None
+        self._expansion = None
+        self._stop = threading.Event()
+        self._queue = queue.Queue(maxsize=max(flush_documents, 1))  # Documents passed to enqueue()
+        self._thread = None
+        if flush_interval > 0:
+            self._thread = threading.Thread(target=self._maintain, name='corpus-index', daemon=True)
+            self._thread.start()
+
+    # --- Manifest and snapshots ---
+
+    @contextmanager
+    def _file_lock(self, name: str, blocking: bool = True):
+        with open(os.path.join(self.directory, name), 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_manifest(self, manifest: dict):
+        manifest["generation"] += 1
+        staging = f"{self._manifest_path}.{os.getpid()}.tmp"
+        with open(staging, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(staging, self._manifest_path)
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self._manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return _empty_manifest()
+
+    def _load_snapshot(self) -> _Snapshot:
+        for attempt in range(3):
+            manifest = self._read_manifest()
+            try:
+                segments = [
+                    self._open_segments.get(name) or _Segment.load(self.directory, name) for name in manifest["segments"]
+                ]
+                break
+            except FileNotFoundError:
+                if attempt == 2:  # Merged away between reading the manifest and opening it, three times over
+                    raise
+        self._open_segments = {segment.name: segment for segment in segments}
+
+        live_masks, locations, documents, total_length = [], {}, 0, 0
+        for i, segment in enumerate(segments):
+            deleted = manifest["deleted"].get(segment.name)
+            live = None
+            if deleted:
+                live = np.ones(len(segment), dtype=bool)
+                live[deleted] = False
+            live_masks.append(live)
+            for ordinal, document_id in enumerate(segment.document_ids):
+                if live is None or live[ordinal]:
+                    locations[document_id] = (i, ordinal)
+            documents += len(segment) if live is None else int(live.sum())
+            total_length += int(np.asarray(segment.doc_lengths)[live].sum() if live is not None else segment.doc_lengths.sum())
+        return _Snapshot(manifest, segments, live_masks, locations, documents, total_length)
+
+    def _current(self) -> _Snapshot:
+        """Returns the snapshot of the latest manifest, reloading it if another process changed it."""
+        try:
+            stat = os.stat(self._manifest_path)
+            key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            key = None
+        with self._lock:
+            if self._snapshot is None or key != self._manifest_key:
+                self._snapshot = self._load_snapshot()
+                self._manifest_key = key
+            return self._snapshot
+
+    def _searchable(self) -> tuple[_Snapshot, _Segment | None]:
+        with self._lock:
+            snapshot = self._current()
+            if self._buffer and self._buffer_segment is None:
+                self._buffer_segment = _Segment.from_documents('buffer', list(self._buffer.values()))
+            return snapshot, self._buffer_segment if self._buffer else None
+
+    # --- Writing ---
+
+    def add(self, document_id: str, text: str, filename: str | None = None) -> bool:
+        """
+        Adds a document to the index. Returns False if a document with this ID is
+        already indexed (IDs are content hashes, so it is the same document).
+        """
+        if self.contains(document_id):
+            return False
+        document = _tokenize_document(document_id, text, filename)
+        with self._lock:
+            if document_id in self._buffer:
+                return False
+            self._buffer[document_id] = document
+            self._buffer_segment = None
+            full = len(self._buffer) >= self.flush_documents
+        if full:
+            self.flush()
+        return True
+
+    def enqueue(self, document_id: str, text: str, filename: str | None = None):
+        """
+        Adds a document from the background thread (or right away without one), so the
+        caller does not wait for tokenizing or flushing. Blocks while the queue is full.
+        """
+        if self._thread is None:
+            self.add(document_id, text, filename)
+        else:
+            self._queue.put((document_id, text, filename))
+
+    def _add_queued(self, timeout: float) -> bool:
+        """Adds the next enqueued document, waiting up to `timeout` seconds for one."""
+        try:
+            document = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        if document is not None:  # None only wakes the thread up on close()
+            try:
+                self.add(*document)
+            except Exception as e:
+                print(f"Failed to add document '{document[0]}' to the corpus index: {e}")
+        return True
+
+    def contains(self, document_id: str) -> bool:
+        with self._lock:
+            return document_id in self._buffer or document_id in self._current().locations
+
+    def delete(self, document_id: str) -> bool:
+        """Removes a document from the index. Returns False if it was not indexed."""
+        with self._write_lock:
+            with self._lock:
+                deleted = self._buffer.pop(document_id, None) is not None
+                self._buffer_segment = None
+            with self._file_lock('write.lock'):
+                snapshot = self._current()
+                location = snapshot.locations.get(document_id)
+                if location is not None:
+                    manifest = _copy_manifest(snapshot.manifest)
+                    segment_index, ordinal = location
+                    manifest["deleted"].setdefault(snapshot.segments[segment_index].name, []).append(ordinal)
+                    self._write_manifest(manifest)
+                    self._current()
+                    deleted = True
+        return deleted
+
+    def flush(self) -> bool:
+        """Writes the buffered documents as a new segment. Returns False if the buffer was empty."""
+        with self._write_lock:
+            with self._lock:
+                pending = list(self._buffer.values())
+            if not pending:
+                return False
+            name = f"segment-{uuid.uuid4().hex}"
+            _Segment.from_documents(name, pending).write(self.directory)
+            with self._file_lock('write.lock'):
+                snapshot = self._current()
+                manifest = _copy_manifest(snapshot.manifest)
+                manifest["segments"].append(name)
+                # Another process may have indexed the same document meanwhile
+                duplicates = [i for i, document in enumerate(pending) if document.document_id in snapshot.locations]
+                if duplicates:
+                    manifest["deleted"][name] = duplicates
+                self._write_manifest(manifest)
+            with self._lock:
+                self._current()
+                for document in pending:
+                    if self._buffer.get(document.document_id) is document:
+                        del self._buffer[document.document_id]
+                self._buffer_segment = None
+                self.flushes += 1
+        return True
+
+    def _merge_candidates(self, snapshot: _Snapshot) -> list[int]:
+        """Picks `merge_factor` segments from the smallest size tier that has that many."""
+        tiers = {}
+        for i, (segment, live) in enumerate(zip(snapshot.segments, snapshot.live)):
+            documents = len(segment) if live is None else int(live.sum())
+            if documents >= self.merge_max_documents:
+                continue
+            tiers.setdefault(int(math.log(max(documents, 1), self.merge_factor)), []).append(i)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.merge_factor:
+                return tiers[tier][:self.merge_factor]
+        return []
+
+    def merge(self) -> bool:
+        """Merges one group of similar-size segments, if there is one. Returns True if it did."""
+        with self._file_lock('merge.lock', blocking=False) as acquired:
+            if not acquired:
+                return False  # Another process is merging
+            snapshot = self._current()
+            sources = self._merge_candidates(snapshot)
+            if not sources:
+                return False
+            name = f"segment-{uuid.uuid4().hex}"
+            merged, remaps = _Segment.merge(
+                name, [snapshot.segments[i] for i in sources], [snapshot.live[i] for i in sources]
+            )
+            merged.write(self.directory)
+            source_names = [snapshot.segments[i].name for i in sources]
+            with self._write_lock, self._file_lock('write.lock'):
+                manifest = _copy_manifest(self._current().manifest)
+                # Carry over documents deleted while merging
+                deleted = []
+                for source_name, remap in zip(source_names, remaps):
+                    for ordinal in manifest["deleted"].pop(source_name, []):
+                        if remap[ordinal] >= 0:
+                            deleted.append(int(remap[ordinal]))
+                manifest["segments"] = [segment for segment in manifest["segments"] if segment not in source_names]
+                manifest["segments"].append(name)
+                if deleted:
+                    manifest["deleted"][name] = sorted(deleted)
+                self._write_manifest(manifest)
+                with self._lock:
+                    self._current()
+                    self.merges += 1
+        # Processes still reading the old segments keep their memory maps
+        for source_name in source_names:
+            shutil.rmtree(os.path.join(self.directory, source_name), ignore_errors=True)
+        return True
+
+    def _maintain(self):
+        next_maintenance = time.monotonic() + self.flush_interval
+        while not self._stop.is_set():
+            self._add_queued(max(next_maintenance - time.monotonic(), 0))
+            if time.monotonic() < next_maintenance:
+                continue
+            try:
+                self.flush()
+                while self.merge():
+                    pass
+            except Exception as e:
+                print(f"Corpus index maintenance failed: {e}")
+            next_maintenance = time.monotonic() + self.flush_interval
+
+    def close(self):
+        """Stops the background thread, adds the documents still queued and flushes the buffer."""
+        self._stop.set()
+        if self._thread is not None:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass  # The thread is busy with the queue and sees the stop flag next
+            self._thread.join()
+        while self._add_queued(0):
+            pass
+        self.flush()
+
+    # --- Searching ---
+
+    def _expansion_index(self, snapshot: _Snapshot):
+        """Returns the corpus' most frequent words and a vector index over them, rebuilt every few minutes."""
+        with self._lock:
+            if self._expansion is not None and time.monotonic() - self._expansion[0] < _EXPANSION_REFRESH_SECONDS:
+                return self._expansion[1], self._expansion[2]
+        frequencies = {}
+        for segment in snapshot.segments:
+            # The most frequent words of each segment are the candidates for the whole corpus
+            df = np.diff(segment.term_starts)
+            top = np.argsort(-df, kind='stable')[:CORPUS_EXPANSION_VOCABULARY * 2]
+            terms = segment.terms()
+            for i in top.tolist():
+                if terms[i].isalpha() and len(terms[i]) > 1:
+                    frequencies[terms[i]] = frequencies.get(terms[i], 0) + int(df[i])
+        vocabulary = sorted(frequencies, key=lambda term: -frequencies[term])[:CORPUS_EXPANSION_VOCABULARY]
+        index = build_vocabulary_index(encode_texts(vocabulary)) if vocabulary else None
+        with self._lock:
+            self._expansion = (time.monotonic(), vocabulary, index)
+        return vocabulary, index
+
+    def expand_terms(self, terms: list[str]) -> dict[str, list[str]]:
+        """Returns, per query word, its semantic matches among the corpus' frequent words."""
+        vocabulary, index = self._expansion_index(self._current())
+        if not vocabulary or not terms:
+            return {}
+        results = score_search_terms(vocabulary, index, terms, num_suggestions=0)
+        expansions = {}
+        for term, (matches, _, _) in zip(terms, results):
+            matches = [match for match in matches if match not in terms][:_EXPANSION_MAX_TERMS]
+            if matches:
+                expansions[term] = matches
+        return expansions
+
+    @staticmethod
+    def _phrase_hits(segment: _Segment, live, terms: list[str]) -> tuple[np.ndarray, np.ndarray] | None:
+        """
+        Finds the words of `terms` at consecutive positions, starting from the rarest word.
+
+        Returns:
+            tuple | None: Document ordinals and start positions of the matches, or None.
+        """
+        found = [segment.postings(term) for term in terms]
+        if any(postings is None for postings in found):
+            return None
+        sizes = [segment.tf_starts[last] - segment.tf_starts[first] for first, last in found]
+        order = sorted(range(len(terms)), key=sizes.__getitem__)
+        first, last = found[order[0]]
+        keys = segment.positions[segment.tf_starts[first]:segment.tf_starts[last]] - order[0]
+        universe = int(segment.position_bases[-1])
+        # Sorted, so the phrases that would start before or end after the segment are a prefix and a suffix
+        keys = keys[np.searchsorted(keys, 0):np.searchsorted(keys, universe - len(terms), side='right')]
+        for i in order[1:]:
+            if len(keys) == 0:
+                return None
+            first, last = found[i]
+            matched = _isin_sorted(keys + i, segment.positions[segment.tf_starts[first]:segment.tf_starts[last]], universe)
+            keys = keys[matched]
+        # Only now, for the few survivors: the phrase must lie within one live document
+        match_docs = np.searchsorted(segment.position_bases, keys, side='right') - 1
+        keep = keys + len(terms) <= segment.position_bases[match_docs + 1]
+        if live is not None:
+            keep &= live[match_docs]
+        if not keep.any():
+            return None
+        return match_docs[keep], keys[keep]
+
+    @stage('score')
+    def search(
+        self,
+        query: str,
+        mode: str = 'bm25',
+        limit: int = 10,
+        expand: bool = False,
+        max_matches: int = CORPUS_MAX_MATCHES_PER_DOCUMENT,
+    ) -> dict:
+        """
+        Searches the corpus.
+
+        Args:
+            query (str): Words to search for.
+            mode (str): 'bm25' (any word), 'exact' (all words) or 'phrase' (consecutive words).
+            limit (int): Maximum number of documents to return.
+            expand (bool): Also search for the words' semantic matches.
+            max_matches (int): Maximum number of match offsets returned per document.
+
+        Returns:
+            dict: 'terms', 'expansions', 'total' and 'results' (best first, with UTF-16 match offsets).
+
+        Raises:
+            ValueError: If `mode` is unknown.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: '{mode}'. Use one of {list(SEARCH_MODES)}.")
+        terms = query_terms(query)
+        if mode != 'phrase':
+            terms = list(dict.fromkeys(terms))
+        self.queries += 1
+        response = {"terms": terms, "expansions": {}, "total": 0, "results": []}
+        if not terms:
+            return response
+
+        snapshot, buffer = self._searchable()
+        segments = list(zip(snapshot.segments, snapshot.live))
+        num_documents, total_length = snapshot.documents, snapshot.total_length
+        if buffer is not None:
+            segments.append((buffer, None))
+            num_documents += len(buffer)
+            total_length += int(buffer.doc_lengths.sum())
+        if not num_documents:
+            return response
+        average_length = max(total_length / num_documents, 1.0)
+
+        if mode == 'phrase':
+            hits = [self._phrase_hits(segment, live, terms) for segment, live in segments]
+            runs = [_runs(hit[0]) if hit is not None else None for hit in hits]
+            df = sum(len(run[0]) for run in runs if run is not None)
+            candidates = []
+            for s, run in enumerate(runs):
+                if run is None:
+                    continue
+                ordinals, counts = run
+                norms = segments[s][0].length_norms(average_length)[ordinals]
+                candidates.append((s, ordinals, _bm25(counts, norms, df, num_documents), counts))
+        else:
+            expansions = self.expand_terms(terms) if expand else {}
+            response["expansions"] = expansions
+            groups = [[(term, 1.0)] + [(match, CORPUS_EXPANSION_WEIGHT) for match in expansions.get(term, [])]
+                      for term in terms]
+            # Postings of every word per segment, live documents only, and its document frequency
+            postings, df = {}, {}
+            for term, _ in (entry for group in groups for entry in group):
+                if term in postings:
+                    continue
+                postings[term] = []
+                for segment, live in segments:
+                    found = segment.postings(term)
+                    if found is None:
+                        postings[term].append(None)
+                        continue
+                    first, last = found
+                    docs = np.asarray(segment.docs[first:last])
+                    tf = np.diff(segment.tf_starts[first:last + 1])
+                    if live is not None:
+                        keep = live[docs]
+                        docs, tf = docs[keep], tf[keep]
+                    postings[term].append((docs, tf))
+                df[term] = sum(len(entry[0]) for entry in postings[term] if entry is not None)
+
+            candidates = []
+            for s, (segment, _) in enumerate(segments):
+                norms = segment.length_norms(average_length)
+                entries = [[(postings[term][s], weight, df[term]) for term, weight in group] for group in groups]
+                entries = [[entry for entry in group if entry[0] is not None] for group in entries]
+                if mode == 'exact':
+                    # Intersect the documents of every group (any word of a group will do), smallest first
+                    if not all(entries):
+                        continue
+                    group_docs = sorted(
+                        (_runs(np.sort(np.concatenate([entry[0][0] for entry in group])))[0] if len(group) > 1
+                         else group[0][0][0] for group in entries),
+                        key=len,
+                    )
+                    ordinals = group_docs[0]
+                    for docs in group_docs[1:]:
+                        ordinals = ordinals[_isin_sorted(ordinals, docs, len(segment))]
+                    if len(ordinals) == 0:
+                        continue
+                    scores = np.zeros(len(ordinals), dtype=np.float32)
+                    for (docs, tf), weight, term_df in (entry for group in entries for entry in group):
+                        at = _lookup_sorted(ordinals, docs, len(segment))
+                        hit = at >= 0
+                        scores[hit] += weight * _bm25(tf[at[hit]], norms[ordinals[hit]], term_df, num_documents)
+                else:
+                    scores = np.zeros(len(segment))
+                    for (docs, tf), weight, term_df in (entry for group in entries for entry in group):
+                        contributions = weight * _bm25(tf, norms[docs], term_df, num_documents)
+                        scores += np.bincount(docs, weights=contributions, minlength=len(segment))
+                    ordinals = np.flatnonzero(scores)
+                    scores = scores[ordinals]
+                if len(ordinals):
+                    candidates.append((s, ordinals, scores, None))
+
+        if not candidates:
+            return response
+        if len(candidates) == 1:
+            segment_indexes = np.full(len(candidates[0][1]), candidates[0][0])
+            _, ordinals, scores, counts = candidates[0]
+        else:
+            segment_indexes = np.concatenate([np.full(len(c[1]), c[0]) for c in candidates])
+            ordinals = np.concatenate([c[1] for c in candidates])
+            scores = np.concatenate([c[2] for c in candidates])
+            counts = np.concatenate([c[3] for c in candidates]) if mode == 'phrase' else None
+        response["total"] = len(scores)
+        top = np.arange(len(scores)) if len(scores) <= limit else np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        for i in top.tolist():
+            s, ordinal = int(segment_indexes[i]), int(ordinals[i])
+            segment = segments[s][0]
+            if mode == 'phrase':
+                docs, phrase_positions = hits[s]
+                first, last = np.searchsorted(docs, [ordinal, ordinal + 1])
+                phrase_positions = phrase_positions[first:last][:max_matches]
+                # Offsets from the first word's start to the last word's end
+                positions, starts, _ = segment.matches(*segment.postings(terms[0]), ordinal)
+                match_starts = starts[np.searchsorted(positions, phrase_positions)].astype(np.int64)
+                positions, starts, lengths = segment.matches(*segment.postings(terms[-1]), ordinal)
+                at = np.searchsorted(positions, phrase_positions + len(terms) - 1)
+                matches = np.stack([match_starts, starts[at].astype(np.int64) + lengths[at]], axis=1)
+                match_count = int(counts[i])
+            else:
+                spans, match_count = [], 0
+                for term in dict.fromkeys(term for group in groups for term, _ in group):
+                    found = segment.postings(term)
+                    if found is None:
+                        continue
+                    _, term_starts, term_lengths = segment.matches(*found, ordinal)
+                    match_count += len(term_starts)
+                    term_starts = np.asarray(term_starts[:max_matches], dtype=np.int64)
+                    spans.append(np.stack([term_starts, term_starts + term_lengths[:max_matches]], axis=1))
+                matches = np.concatenate(spans) if spans else np.empty((0, 2), dtype=np.int64)
+                matches = matches[np.argsort(matches[:, 0], kind='stable')]
+            response["results"].append({
+                "documentId": segment.document_ids[ordinal],
+                "filename": segment.filenames[ordinal],
+                "score": round(float(scores[i]), 4),
+                "matchCount": match_count,
+                "matches": matches[:max_matches].tolist(),
+            })
+        return response
+
+    def stats(self) -> dict:
+        snapshot = self._current()
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            "documents": snapshot.documents, "buffered": buffered, "queued": self._queue.qsize(),
+            "segments": len(snapshot.segments),
+            "generation": snapshot.manifest["generation"], "queries": self.queries, "flushes": self.flushes,
+            "merges": self.merges,
+        }
+
+_corpus_index = None
+_corpus_index_lock = threading.Lock()
+
+def get_corpus_index() -> CorpusIndex | None:
+    """Returns the process-wide corpus index, or None if CORPUS_INDEX_DIR is empty."""
+    global _corpus_index
+    if not CORPUS_INDEX_DIR:
+        return None
+    with _corpus_index_lock:
+        if _corpus_index is None:
+            _corpus_index = CorpusIndex(CORPUS_INDEX_DIR)
+            atexit.register(_corpus_index.close)  # Don't lose buffered documents on shutdown
+        return _corpus_index
+
+if CORPUS_INDEX_DIR:
+    register_stats('corpus_index', lambda: get_corpus_index().stats())
@@ -1,15 +1,86 @@
 # smartdoc-insight/backend/app/services/document_parser.py
-from docx import Document
-from pdfminer.high_level import extract_text as pdf_extract_text
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.pdfpage import PDFPage
+from typing import BinaryIO, Iterable, Iterator
 import io
+import os
+import posixpath
+import tempfile
+import xml.etree.ElementTree as ElementTree
+import zipfile
 
-def parse_document(file_stream: io.BytesIO, filename: str) -> str:
+from ..config import MAX_DOCUMENT_PAGES, UPLOAD_SPOOL_DIR
+from .metrics import stage
+
+# Number of .docx paragraphs grouped into one streamed chunk (docx files have no pages)
+DOCX_PARAGRAPHS_PER_CHUNK = 50
+
+# Bump whenever a change to the parsers changes the extracted text, so that the
+# parse cache (parse_cache.py) stops returning text extracted by the old version.
+# 2: .docx text includes tables, headers, footers, footnotes and endnotes.
+PARSER_VERSION = 2
+
+# WordprocessingML names used by the streaming .docx extractor
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_PARAGRAPH = _W + 'p'
+_RUN_TEXT = {_W + 't': None, _W + 'tab': '\t', _W + 'ptab': '\t', _W + 'br': '\n', _W + 'cr': '\n',
+             _W + 'noBreakHyphen': '-'}
+_HEADER_REFERENCE = _W + 'headerReference'
+_FOOTER_REFERENCE = _W + 'footerReference'
+_RELATIONSHIP_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+# Alternative renderings of the same content (e.g. a text box as VML): only the first is read
+_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+_RELATIONSHIPS = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+_OFFICE_DOCUMENT = '/officeDocument'
+
+class DocumentLimitError(ValueError):
+    """Raised when a document exceeds the configured page or byte limits."""
+
+def spool_upload(stream: BinaryIO, max_bytes: int | None = None, chunk_size: int = 1024 * 1024, hasher=None) -> str:
+    """
+    Copies an upload stream to a temporary file in fixed-size chunks.
+
+    Args:
+        stream (BinaryIO): The incoming file stream.
+        max_bytes (int | None): Maximum accepted size in bytes.
+        chunk_size (int): Number of bytes copied per read.
+        hasher: Optional hashlib object updated with every chunk.
+
+    Returns:
+        str: Path of the temporary file. The caller is responsible for deleting it.
+
+    Raises:
+        DocumentLimitError: If the upload is larger than `max_bytes`.
+    """
+    fd, path = tempfile.mkstemp(prefix='smartdoc_upload_', dir=UPLOAD_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as spooled:
+            written = 0
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if max_bytes is not None and written > max_bytes:
+                    raise DocumentLimitError(f"File is too large: the limit is {max_bytes // (1024 * 1024)} MB.")
+                spooled.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+@stage('parse')
+def parse_document(file_stream: BinaryIO, filename: str) -> str:
     """
     Parses a document stream and returns its text content.
     Supports .docx and .pdf files.
 
     Args:
-        file_stream (io.BytesIO): The file content as a byte stream.
+        file_stream (BinaryIO): The file content as a seekable byte stream.
         filename (str): The original filename, used to determine the file type.
 
     Returns:
@@ -17,8 +88,9 @@ def parse_document(file_stream: io.BytesIO, filename: str) -> str:
 
     Raises:
         ValueError: If the file type is unsupported.
+        DocumentLimitError: If the document has more than MAX_DOCUMENT_PAGES pages.
     """
-    file_extension = filename.split('.')[-1].lower()
+    file_extension = _file_extension(filename)
 
     if file_extension == 'docx':
         return _parse_docx(file_stream)
@@ -27,19 +99,159 @@ def parse_document(file_stream: io.BytesIO, filename: str) -> str:
     else:
         raise ValueError(f"Unsupported file type: .{file_extension}. Only .docx and .pdf are supported.")
 
-def _parse_docx(file_stream: io.BytesIO) -> str:
+def iter_document_chunks(file_stream: BinaryIO, filename: str) -> Iterator[str]:
     """
-    Parses a .docx file stream and extracts all text.
+    Lazily extracts a document piece by piece: one chunk per page for .pdf files and
+    one chunk per DOCX_PARAGRAPHS_PER_CHUNK paragraphs for .docx files. Joining all
+    chunks gives the same text as parse_document().
+
+    Raises:
+        ValueError: If the file type is unsupported.
+        DocumentLimitError: If the document has more than MAX_DOCUMENT_PAGES pages.
     """
-    document = Document(file_stream)
-    full_text = []
-    for para in document.paragraphs:
-        full_text.append(para.text)
-    return '\n'.join(full_text)
+    file_extension = _file_extension(filename)
+
+    if file_extension == 'docx':
+        return _iter_docx_chunks(file_stream)
+    elif file_extension == 'pdf':
+        return iter_pdf_pages(file_stream)
+    else:
+        raise ValueError(f"Unsupported file type: .{file_extension}. Only .docx and .pdf are supported.")
+
+def _file_extension(filename: str) -> str:
+    return filename.split('.')[-1].lower()
 
-def _parse_pdf(file_stream: io.BytesIO) -> str:
+def _parse_docx(file_stream: BinaryIO) -> str:
+    """
+    Parses a .docx file stream and extracts all text, one line per paragraph.
+    """
+    return '\n'.join(iter_docx_paragraphs(file_stream))
+
+def _iter_docx_chunks(file_stream: BinaryIO) -> Iterator[str]:
+    """
+    Yields the paragraphs of a .docx file in groups, each group followed by the
+    newline that separates it from the next one.
+    """
+    group = []
+    for paragraph in iter_docx_paragraphs(file_stream):
+        if len(group) == DOCX_PARAGRAPHS_PER_CHUNK:
+            yield '\n'.join(group) + '\n'
+            group = []
+        group.append(paragraph)
+    if group:
+        yield '\n'.join(group)
+
+def _read_relationships(archive: zipfile.ZipFile, part: str) -> list[tuple[str, str, str]]:
+    """Returns the (id, type, target part) relationships of a package part, or of the package for part ''."""
+    directory, name = posixpath.split(part)
+    try:
+        data = archive.read(posixpath.join(directory, '_rels', f"{name}.rels"))
+    except KeyError:
+        return []
+    relationships = []
+    for relationship in ElementTree.fromstring(data).iter(_RELATIONSHIPS):
+        if relationship.get('TargetMode') == 'External':
+            continue
+        target = relationship.get('Target', '')
+        target = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(directory, target))
+        relationships.append((relationship.get('Id'), relationship.get('Type', ''), target))
+    return relationships
+
+def _iter_part_paragraphs(archive: zipfile.ZipFile, part: str, references: list | None = None) -> Iterator[str]:
+    """
+    Streams the paragraphs of one WordprocessingML part in document order, dropping
+    each element once read. Header and footer references are appended to `references`.
+    """
+    paragraphs = []  # Text of the open paragraphs, innermost last (text boxes nest them)
+    open_elements = []
+    skipping = 0
+    with archive.open(part) as xml:
+        for event, element in ElementTree.iterparse(xml, events=('start', 'end')):
+            tag = element.tag
+            if event == 'start':
+                open_elements.append(element)
+                if tag == _FALLBACK:
+                    skipping += 1
+                elif tag == _PARAGRAPH and not skipping:
+                    paragraphs.append([])
+                continue
+            open_elements.pop()
+            if open_elements:
+                open_elements[-1].remove(element)  # Its earlier siblings are gone already, so this is O(1)
+            if tag == _FALLBACK:
+                skipping -= 1
+            elif skipping:
+                pass
+            elif tag in _RUN_TEXT:
+                if paragraphs:
+                    text = _RUN_TEXT[tag]
+                    paragraphs[-1].append((element.text or '') if text is None else text)
+            elif tag == _PARAGRAPH:
+                yield ''.join(paragraphs.pop())
+            elif references is not None and tag in (_HEADER_REFERENCE, _FOOTER_REFERENCE):
+                references.append(element.get(_RELATIONSHIP_ID))
+
+def iter_docx_paragraphs(file_stream: BinaryIO) -> Iterator[str]:
+    """
+    Extracts the text of a .docx file one paragraph at a time: the body, then headers,
+    footers, footnotes and endnotes.
+
+    Raises:
+        ValueError: If the file is not a .docx package.
+    """
+    try:
+        archive = zipfile.ZipFile(file_stream)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Invalid .docx file: {e}")
+    with archive:
+        main_part = next((target for _, kind, target in _read_relationships(archive, '')
+                          if kind.endswith(_OFFICE_DOCUMENT)), 'word/document.xml')
+        if main_part not in archive.NameToInfo:
+            raise ValueError("Invalid .docx file: it has no main document part.")
+        references = []
+        yield from _iter_part_paragraphs(archive, main_part, references)
+
+        relationships = {relationship_id: (kind.rsplit('/', 1)[-1], target)
+                         for relationship_id, kind, target in _read_relationships(archive, main_part)}
+        referenced = [relationships[ref] for ref in dict.fromkeys(references) if ref in relationships]
+        parts = [target for kind, target in referenced if kind == 'header']
+        parts += [target for kind, target in referenced if kind == 'footer']
+        parts += [target for kind in ('footnotes', 'endnotes') for part_kind, target in relationships.values()
+                  if part_kind == kind]
+        for part in parts:
+            if part in archive.NameToInfo:
+                yield from (paragraph for paragraph in _iter_part_paragraphs(archive, part) if paragraph.strip())
+
+def _parse_pdf(file_stream: BinaryIO) -> str:
     """
     Parses a .pdf file stream and extracts all text using pdfminer.six.
     """
-    # pdfminer.six's extract_text function expects a file-like object
-    return pdf_extract_text(file_stream)
\ No newline at end of file
+    return ''.join(iter_pdf_pages(file_stream))
+
+def count_pdf_pages(file_stream: BinaryIO) -> int:
+    """Counts the pages of a .pdf file without extracting any text."""
+    return sum(1 for _ in PDFPage.get_pages(file_stream))
+
+def iter_pdf_pages(file_stream: BinaryIO, max_pages: int | None = MAX_DOCUMENT_PAGES,
+                   page_numbers: Iterable[int] | None = None) -> Iterator[str]:
+    """
+    Extracts the text of a .pdf file one page at a time, as extract_text() would.
+
+    Raises:
+        DocumentLimitError: If the document has more than `max_pages` pages.
+    """
+    resource_manager = PDFResourceManager()
+    output = io.StringIO()
+    device = TextConverter(resource_manager, output, codec='utf-8', laparams=LAParams())
+    interpreter = PDFPageInterpreter(resource_manager, device)
+    try:
+        pages = PDFPage.get_pages(file_stream, pagenos=set(page_numbers) if page_numbers is not None else None)
+        for page_number, page in enumerate(pages, start=1):
+            if max_pages is not None and page_number > max_pages:
+                raise DocumentLimitError(f"Document is too long: the limit is {max_pages} pages.")
+            interpreter.process_page(page)
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+    finally:
+        device.close()
@@ -0,0 +1,197 @@
+# smartdoc-insight/backend/app/services/document_store.py
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+
+import numpy as np
+
+from ..config import (
+    DOCUMENT_STORE_MAX_DOCUMENTS, DOCUMENT_STORE_MAX_BYTES, DOCUMENT_STORE_TTL_SECONDS,
+    SEARCH_PHRASE_MAX_NGRAMS, SEARCH_PHRASE_MAX_WORDS, PASSAGE_INDEX_ON_UPLOAD, PASSAGE_MAX_PASSAGES,
+)
+from ..models.document import DocumentRecord
+from .highlighter import to_utf16
+from .lru_cache import BoundedLRUCache
+from .metrics import register_stats
+from .parse_cache import get_parse_cache
+from .search_cache import get_search_cache
+from .nlp_service import (
+    extract_vocabulary, extract_phrases, encode_texts, build_vocabulary_index, normalize_phrase, score_search_terms,
+    split_passages, encode_passages, score_passages,
+)
+
+# Parsed documents by ID, bounded by count, total memory and idle time.
+_documents = BoundedLRUCache(
+    max_items=DOCUMENT_STORE_MAX_DOCUMENTS,
+    max_bytes=DOCUMENT_STORE_MAX_BYTES,
+    ttl_seconds=DOCUMENT_STORE_TTL_SECONDS,
+    sizeof=lambda record: record.size_bytes(),
+)
+
+def compute_document_id(text: str) -> str:
+    """Derives a document ID from the content hash, so identical text shares one entry."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+def register_document(text: str, filename: str | None = None) -> DocumentRecord:
+    """Stores a parsed document and returns its record, or the existing record for the same text."""
+    document_id = compute_document_id(text)
+    record = _documents.get(document_id)
+    if record is None:
+        record = DocumentRecord(document_id=document_id, text=text, filename=filename)
+        _documents.put(document_id, record)
+    return record
+
+def get_document(document_id: str) -> DocumentRecord | None:
+    """Returns the stored record for `document_id`, or None if unknown or expired."""
+    return _documents.get(document_id)
+
+def ensure_vocabulary(record: DocumentRecord) -> DocumentRecord:
+    """
+    Tokenizes, embeds and indexes the document vocabulary on first use, then
+    re-accounts the record's size against the store's memory budget.
+    """
+    if record.vocabulary_index is not None:
+        return record
+    with record.lock:
+        if record.vocabulary_index is None:
+            cache = get_parse_cache()
+            vocabulary = cache.get_vocabulary(record.document_id) if cache is not None else None
+            if vocabulary is None:
+                vocabulary = extract_vocabulary(record.text)
+                if cache is not None:
+                    cache.put_vocabulary(record.document_id, vocabulary)
+            vocabulary_index = build_vocabulary_index(encode_texts(vocabulary))
+            record.vocabulary = vocabulary
+            record.vocabulary_index = vocabulary_index
+            if record.document_id in _documents:
+                _documents.put(record.document_id, record)
+    return record
+
+def ensure_phrase_indexes(record: DocumentRecord, lengths) -> dict:
+    """
+    Extracts, embeds and indexes the document's n-word phrases for every length in
+    `lengths` not indexed yet, then re-accounts the record's size.
+
+    Returns:
+        dict: The record's phrase indexes, by phrase length.
+    """
+    missing = sorted(set(lengths) - set(record.phrase_indexes))
+    if not missing:
+        return record.phrase_indexes
+    with record.lock:
+        for n in missing:
+            if n not in record.phrase_indexes:
+                phrases = extract_phrases(record.text, n, max_phrases=SEARCH_PHRASE_MAX_NGRAMS)
+                phrase_index = build_vocabulary_index(encode_texts(phrases)) if phrases else None
+                record.phrase_indexes = {**record.phrase_indexes, n: (phrases, phrase_index)}
+        if record.document_id in _documents:
+            _documents.put(record.document_id, record)
+    return record.phrase_indexes
+
+def search_document_terms(
+    record: DocumentRecord,
+    search_terms: list[str],
+    similarity_threshold: float = 0.4,
+    num_suggestions: int = 5,
+    suggestion_threshold: float = 0.25,
+) -> list[tuple[list[str], list[str], list[str]]]:
+    """
+    Scores search terms and phrases against a stored document, building its vocabulary
+    index and the phrase indexes the terms need on first use. Results are looked up in
+    the search result cache first; only the terms it misses are scored (in one pass).
+
+    Returns:
+        list[tuple[list[str], list[str], list[str]]]: Per term, the semantic matches,
+        suggested words and phrase matches (see score_search_terms()).
+    """
+    cache = get_search_cache()
+    keys = [cache.key(record.document_id, term, similarity_threshold, num_suggestions, suggestion_threshold)
+            for term in search_terms]
+    results = {}
+    for term, key in zip(search_terms, keys):
+        if key not in results:
+            result = cache.get(key)
+            if result is not None:
+                results[key] = result
+    missing = list({key: term for term, key in zip(search_terms, keys) if key not in results}.items())
+    if missing:
+        ensure_vocabulary(record)
+        lengths = {len(normalize_phrase(term).split()) for _, term in missing}
+        phrase_indexes = ensure_phrase_indexes(record, [n for n in lengths if 2 <= n <= SEARCH_PHRASE_MAX_WORDS])
+        scored = score_search_terms(
+            record.vocabulary, record.vocabulary_index, [term for _, term in missing], phrase_indexes,
+            similarity_threshold=similarity_threshold,
+            num_suggestions=num_suggestions,
+            suggestion_threshold=suggestion_threshold,
+        )
+        for (key, _), result in zip(missing, scored):
+            results[key] = result
+            cache.put(key, result)
+    return [results[key] for key in keys]
+
+def ensure_passages(record: DocumentRecord) -> DocumentRecord:
+    """
+    Splits, embeds and indexes the document's passages on first use, then re-accounts
+    the record's size. Offsets and embeddings are kept in the parse cache.
+    """
+    if record.passage_index is not None:
+        return record
+    with record.passage_lock:
+        if record.passage_index is None:
+            cache = get_parse_cache()
+            cached = cache.get_passages(record.document_id) if cache is not None else None
+            if cached is None:
+                offsets = np.array(
+                    split_passages(record.text, max_passages=PASSAGE_MAX_PASSAGES), dtype=np.int64,
+                ).reshape(-1, 2)
+                embeddings = encode_passages([record.text[start:end] for start, end in offsets.tolist()])
+                if cache is not None:
+                    cache.put_passages(record.document_id, offsets, embeddings)
+            else:
+                offsets, embeddings = cached
+            record.passages = offsets
+            record.passage_index = build_vocabulary_index(embeddings)
+            if record.document_id in _documents:
+                _documents.put(record.document_id, record)
+    return record
+
+# Passages of new uploads are embedded one document at a time, off the request thread
+_passage_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='passage-index')
+
+def _ensure_passages_logged(record: DocumentRecord):
+    try:
+        ensure_passages(record)
+    except Exception as e:
+        print(f"Failed to index the passages of document '{record.document_id}': {e}")
+
+def precompute_passages(record: DocumentRecord):
+    """Starts embedding the passages of an uploaded document in the background (PASSAGE_INDEX_ON_UPLOAD)."""
+    if PASSAGE_INDEX_ON_UPLOAD and record.passage_index is None:
+        _passage_executor.submit(_ensure_passages_logged, record)
+
+def search_document_passages(record: DocumentRecord, search_terms: list[str], count: int) -> list[list[dict]]:
+    """
+    Finds the passages of a stored document most similar to each search term, indexing
+    the passages first if that has not happened yet.
+
+    Returns:
+        list[list[dict]]: Per term, up to `count` passages, best first: 'start' and 'end'
+        (UTF-16 code unit offsets), 'score' (cosine similarity) and 'text'.
+    """
+    ensure_passages(record)
+    if len(record.passages) == 0:
+        return [[] for _ in search_terms]
+    bounds = to_utf16(record.text, record.passages.ravel()).reshape(-1, 2).tolist()
+    results = []
+    for scores, ids in score_passages(record.passage_index, search_terms, count):
+        results.append([
+            {"start": bounds[i][0], "end": bounds[i][1], "score": round(float(score), 4),
+             "text": record.text[record.passages[i, 0]:record.passages[i, 1]]}
+            for score, i in zip(scores.tolist(), ids.tolist())
+        ])
+    return results
+
+def get_document_store_stats() -> dict:
+    """Returns hit/miss/eviction counters and the current size of the store."""
+    return _documents.stats()
+
+register_stats('document_store', get_document_store_stats)
@@ -0,0 +1,286 @@
+# smartdoc-insight/backend/app/services/embedding_cache.py
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from .lru_cache import BoundedLRUCache
+
+try:
+    import fcntl
+except ImportError:  # Windows: the disk tier is then only safe for a single process
+    fcntl = None
+
+class _Generation:
+    """
+    One generation of the disk tier: `vectors[.N].f32` (a raw float32 matrix read
+    through np.memmap) and `tokens[.N].jsonl`, mapping each text to its row.
+    Generation 0 keeps the unnumbered file names of stores written before rotation.
+    """
+
+    def __init__(self, directory: str, number: int):
+        suffix = f".{number}" if number else ''
+        self.number = number
+        self.vectors_path = os.path.join(directory, f'vectors{suffix}.f32')
+        self.tokens_path = os.path.join(directory, f'tokens{suffix}.jsonl')
+        self.index = {}
+        self.index_offset = 0
+        self.vectors = None
+
+    def refresh_index(self):
+        """Reads index lines appended (by any process) since the last refresh."""
+        try:
+            if os.path.getsize(self.tokens_path) <= self.index_offset:
+                return
+        except FileNotFoundError:
+            return
+        with open(self.tokens_path, 'rb') as f:
+            f.seek(self.index_offset)
+            data = f.read()
+        complete = data.rfind(b'\n') + 1  # Ignore a line that is still being written
+        for line in data[:complete].splitlines():
+            text, row = json.loads(line)
+            self.index[text] = row
+        self.index_offset += complete
+
+    def matrix(self, dim: int, min_rows: int) -> np.ndarray:
+        """Returns a memmap over the vector file, remapping it if it has grown."""
+        if self.vectors is None or self.vectors.shape[0] < min_rows:
+            rows = os.path.getsize(self.vectors_path) // (dim * np.dtype(np.float32).itemsize)
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(rows, dim))
+        return self.vectors
+
+    def remove_files(self):
+        for path in (self.vectors_path, self.tokens_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+class _DiskEmbeddingStore:
+    """
+    On-disk embedding tier shared by every worker process on the host. Files are
+    append-only within a generation and rotated at half of `max_rows`; lookups read
+    the current and the previous generation (see _Generation).
+    """
+
+    def __init__(self, directory: str, model_name: str, max_rows: int | None = None):
+        self.directory = directory
+        self.model_name = model_name
+        self.max_rows = max_rows
+        self.dim = None
+        self.hits = 0
+        self.misses = 0
+        self.rotations = 0
+        self._generations = [_Generation(directory, 0)]  # Current first, then the previous one
+        self._meta_mtime = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._meta_path = os.path.join(directory, 'meta.json')
+        self._lock_path = os.path.join(directory, '.lock')
+        self._read_meta()
+
+    def _read_meta(self):
+        """Reads the model dimension and current generation, if `meta.json` changed since the last read."""
+        try:
+            stat = os.stat(self._meta_path)
+            mtime = (stat.st_ino, stat.st_mtime_ns)  # Rewritten by os.replace, so the inode changes too
+            if mtime == self._meta_mtime:
+                return
+            with open(self._meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        self._meta_mtime = mtime
+        if meta.get('model') != self.model_name:
+            return
+        self.dim = int(meta['dim'])
+        number = int(meta.get('generation', 0))
+        if number != self._generations[0].number:
+            known = {generation.number: generation for generation in self._generations}
+            self._generations = [known.get(n) or _Generation(self.directory, n) for n in (number, number - 1) if n >= 0]
+
+    def _write_meta(self, generation: int):
+        temporary_path = f"{self._meta_path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            json.dump({"model": self.model_name, "dim": self.dim, "generation": generation}, f)
+        os.replace(temporary_path, self._meta_path)  # Readers never see a partial file
+        self._read_meta()
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self._lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _row_bytes(self) -> int:
+        return self.dim * np.dtype(np.float32).itemsize
+
+    def lookup(self, texts: list[str]) -> tuple[dict[str, np.ndarray], list[str]]:
+        """
+        Returns the stored embeddings for whichever of `texts` are on disk, and which
+        of those were only found in the previous generation (to be copied forward).
+        """
+        with self._lock:
+            if not all(any(text in generation.index for generation in self._generations) for text in texts):
+                self._read_meta()
+                for generation in self._generations:
+                    generation.refresh_index()
+            found = {}
+            stale = []
+            if self.dim is not None:
+                for position, generation in enumerate(self._generations):
+                    rows = {text: generation.index[text] for text in texts
+                            if text not in found and text in generation.index}
+                    if not rows:
+                        continue
+                    try:
+                        matrix = generation.matrix(self.dim, max(rows.values()) + 1)
+                    except FileNotFoundError:  # Deleted by another process's rotation
+                        continue
+                    for text, row in rows.items():
+                        found[text] = np.array(matrix[row])
+                    if position:
+                        stale.extend(rows)
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+            return found, stale
+
+    def append(self, texts: list[str], embeddings: np.ndarray):
+        """Appends embeddings for texts that are not in the current generation yet."""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with self._lock, self._file_lock():
+            self._read_meta()
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+                self._write_meta(0)
+            elif self.dim != embeddings.shape[1]:
+                return
+            current = self._generations[0]
+            current.refresh_index()
+
+            new_rows = []
+            seen = set()
+            for i, text in enumerate(texts):
+                if text not in current.index and text not in seen:
+                    seen.add(text)
+                    new_rows.append(i)
+            if not new_rows:
+                return
+
+            capacity = None if self.max_rows is None else max(self.max_rows // 2, 1)
+            if capacity is not None and os.path.exists(current.vectors_path) \
+                    and os.path.getsize(current.vectors_path) // self._row_bytes() >= capacity:
+                # Current generation full: start the next one, drop the one before the previous
+                for generation in self._generations[1:]:
+                    generation.remove_files()
+                self._write_meta(current.number + 1)
+                self.rotations += 1
+                current = self._generations[0]
+
+            with open(current.vectors_path, 'ab') as f:
+                # Drop a partial row left behind by a writer that crashed mid-append
+                size = f.tell()
+                first_row = size // self._row_bytes()
+                if size % self._row_bytes():
+                    f.truncate(first_row * self._row_bytes())
+                if capacity is not None:
+                    new_rows = new_rows[:max(capacity - first_row, 0)]
+                    if not new_rows:
+                        return
+                f.write(embeddings[new_rows].tobytes())
+
+            lines = []
+            for offset, i in enumerate(new_rows):
+                lines.append(json.dumps([texts[i], first_row + offset]) + '\n')
+            with open(current.tokens_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(lines))
+            current.refresh_index()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": True, "hits": self.hits, "misses": self.misses, "rotations": self.rotations,
+                    "generation": self._generations[0].number}
+
+class EmbeddingCache:
+    """
+    Text -> embedding cache in front of the Sentence-BERT model: an in-process LRU and an
+    optional memory-mapped disk tier, with every key scoped to `model_name`.
+
+    Args:
+        model_name (str): Name of the model producing the embeddings.
+        memory_bytes (int): Byte budget of the in-memory tier.
+        disk_dir (str | None): Root directory of the disk tier, or None to disable it.
+        disk_max_rows (int | None): Maximum number of vectors kept on disk.
+    """
+
+    def __init__(self, model_name: str, memory_bytes: int, disk_dir: str | None = None, disk_max_rows: int | None = None):
+        self.model_name = model_name
+        self.memory = BoundedLRUCache(max_bytes=memory_bytes)
+        self.disk = None
+        if disk_dir:
+            safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+            digest = hashlib.sha1(model_name.encode('utf-8')).hexdigest()[:10]
+            try:
+                self.disk = _DiskEmbeddingStore(os.path.join(disk_dir, f"{safe_name}-{digest}"), model_name, disk_max_rows)
+            except OSError as e:
+                print(f"Embedding disk cache disabled, cannot use '{disk_dir}': {e}")
+
+    def get_many(self, texts: list[str]) -> tuple[dict[str, np.ndarray], list[str]]:
+        """
+        Looks up embeddings for `texts` in the memory tier, then the disk tier.
+
+        Returns:
+            tuple[dict[str, np.ndarray], list[str]]: The cached embeddings by text and
+            the texts that still need to be encoded.
+        """
+        found = {}
+        missing = []
+        for text in texts:
+            embedding = self.memory.get((self.model_name, text))
+            if embedding is None:
+                missing.append(text)
+            else:
+                found[text] = embedding
+
+        if missing and self.disk is not None:
+            from_disk, stale = self.disk.lookup(missing)
+            for text, embedding in from_disk.items():
+                self.memory.put((self.model_name, text), embedding)
+            found.update(from_disk)
+            missing = [text for text in missing if text not in from_disk]
+            if stale:
+                # Still in use: copy forward before their generation is deleted
+                self._append_to_disk(stale, np.stack([from_disk[text] for text in stale]))
+        return found, missing
+
+    def put_many(self, texts: list[str], embeddings: np.ndarray):
+        """Stores freshly computed embeddings (one row per text) in both tiers."""
+        for text, embedding in zip(texts, embeddings):
+            # Copy each row so an evicted entry does not keep the whole batch alive
+            self.memory.put((self.model_name, text), np.array(embedding))
+        if self.disk is not None and len(texts):
+            self._append_to_disk(texts, embeddings)
+
+    def _append_to_disk(self, texts: list[str], embeddings: np.ndarray):
+        try:
+            self.disk.append(texts, embeddings)
+        except OSError as e:
+            print(f"Error writing embeddings to disk cache: {e}")
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters for both tiers."""
+        return {
+            "model": self.model_name,
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else {"enabled": False, "hits": 0, "misses": 0},
+        }
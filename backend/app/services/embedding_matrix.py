@@ -0,0 +1,165 @@
+# smartdoc-insight/backend/app/services/embedding_matrix.py
+import os
+import tempfile
+import weakref
+
+import numpy as np
+
+STORAGE_DTYPES = ('float32', 'float16', 'int8')
+
+# Rows dequantized at a time while scoring. Small enough for the float32 scratch
+# block to stay in the CPU cache, which makes int8 scoring faster than float32.
+SCORE_CHUNK_ROWS = 1024
+
+def quantize(vectors: np.ndarray, dtype: str) -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    Converts float32 rows to a compact storage type (int8 with symmetric per-row scales).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray | None]: The stored rows and, for int8, the per-row scales.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == 'float32':
+        return vectors, None
+    if dtype == 'float16':
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127 if len(vectors) else np.zeros(0, dtype=np.float32)
+    scales = scales.astype(np.float32)
+    safe = np.where(scales == 0, 1, scales)
+    return np.rint(vectors / safe[:, None]).astype(np.int8), scales
+
+class EmbeddingMatrix:
+    """
+    Growable matrix of embeddings stored as float32, float16 or int8. Scores are computed
+    on the stored rows in chunks and returned as float32.
+
+    Args:
+        dim (int): Vector dimensionality.
+        dtype (str): One of STORAGE_DTYPES.
+
+    Raises:
+        ValueError: If `dtype` is not supported.
+    """
+
+    def __init__(self, dim: int, dtype: str = 'float32'):
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unsupported embedding storage dtype: '{dtype}'. Use one of {list(STORAGE_DTYPES)}.")
+        self.dim = dim
+        self.dtype = dtype
+        self._data = np.zeros((0, dim), dtype=np.dtype(dtype))
+        self._scales = np.zeros(0, dtype=np.float32) if dtype == 'int8' else None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def data(self) -> np.ndarray:
+        """The stored (compact) rows."""
+        return self._data[:self._size]
+
+    @property
+    def scales(self) -> np.ndarray | None:
+        """Per-row scales of int8 storage, None otherwise."""
+        return None if self._scales is None else self._scales[:self._size]
+
+    @property
+    def is_mmapped(self) -> bool:
+        return isinstance(self._data, np.memmap)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held on the process heap; memory-mapped rows are not counted."""
+        scale_bytes = 0 if self._scales is None else self._scales.nbytes
+        return scale_bytes + (0 if self.is_mmapped else self._data.nbytes)
+
+    def append(self, vectors: np.ndarray) -> np.ndarray:
+        """Quantizes and appends float32 rows with amortized growth, returning their ids."""
+        data, scales = quantize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim), self.dtype)
+        needed = self._size + len(data)
+        if needed > len(self._data) or self.is_mmapped:
+            grown = np.zeros((max(needed, 2 * len(self._data)), self.dim), dtype=self._data.dtype)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown  # Appending to a spilled matrix brings it back onto the heap
+            if self._scales is not None:
+                grown_scales = np.zeros(len(grown), dtype=np.float32)
+                grown_scales[:self._size] = self._scales[:self._size]
+                self._scales = grown_scales
+        self._data[self._size:needed] = data
+        if self._scales is not None:
+            self._scales[self._size:needed] = scales
+        ids = np.arange(self._size, needed)
+        self._size = needed
+        return ids
+
+    def load_rows(self, data: np.ndarray, scales: np.ndarray | None = None):
+        """Replaces the contents with rows that are already in this matrix's storage type."""
+        if data.dtype != np.dtype(self.dtype) or (self.dtype == 'int8') != (scales is not None):
+            raise ValueError(f"Rows of type {data.dtype} do not match '{self.dtype}' storage.")
+        self._data = np.array(data).reshape(-1, self.dim)
+        self._scales = None if scales is None else np.array(scales, dtype=np.float32)
+        self._size = len(self._data)
+
+    def to_float32(self, rows=None) -> np.ndarray:
+        """Returns the dequantized rows selected by `rows` (a slice or id array; all by default)."""
+        rows = slice(0, self._size) if rows is None else rows
+        block = self._data[:self._size][rows].astype(np.float32)
+        if self._scales is not None:
+            block *= self._scales[:self._size][rows][:, None]
+        return block
+
+    def dot(self, query: np.ndarray, ids: np.ndarray | None = None) -> np.ndarray:
+        """
+        Inner products of `query` with the stored rows (all rows, or only `ids`).
+
+        Returns:
+            np.ndarray: float32 scores, one per row.
+        """
+        return self.dot_many(np.asarray(query, dtype=np.float32)[None, :], ids)[:, 0]
+
+    def dot_many(self, queries: np.ndarray, ids: np.ndarray | None = None) -> np.ndarray:
+        """
+        Inner products of several queries (one per row) with the stored rows, computed
+        as one matrix-matrix product per chunk of rows.
+
+        Returns:
+            np.ndarray: A float32 (rows, queries) score matrix.
+        """
+        queries_t = np.ascontiguousarray(np.asarray(queries, dtype=np.float32).T)
+        count = self._size if ids is None else len(ids)
+        scores = np.empty((count, queries_t.shape[1]), dtype=np.float32)
+        for start in range(0, count, SCORE_CHUNK_ROWS):
+            stop = min(start + SCORE_CHUNK_ROWS, count)
+            rows = slice(start, stop) if ids is None else ids[start:stop]
+            block = self._data[:self._size][rows]
+            scores[start:stop] = block @ queries_t if self.dtype == 'float32' else block.astype(np.float32) @ queries_t
+            if self._scales is not None:
+                scores[start:stop] *= self._scales[:self._size][rows][:, None]
+        return scores
+
+    def spill(self, directory: str | None = None):
+        """
+        Moves the rows to a file in `directory` and memory-maps it read-only. The file
+        is unlinked right away where the OS allows it (the mapping keeps it alive),
+        otherwise when the matrix is garbage collected.
+        """
+        if self.is_mmapped or self._size == 0:
+            return
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix='smartdoc_embeddings_', suffix='.npy', dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, self.data)
+        self._data = np.load(path, mmap_mode='r')
+        if self._scales is not None:
+            self._scales = self._scales[:self._size].copy()
+        try:
+            os.remove(path)
+        except OSError:  # Windows cannot unlink a mapped file
+            weakref.finalize(self, _remove_quietly, path)
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
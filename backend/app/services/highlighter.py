@@ -0,0 +1,192 @@
+# smartdoc-insight/backend/app/services/highlighter.py
+from collections import deque
+import re
+
+import numpy as np
+
+from ..config import HIGHLIGHT_CACHE_BYTES
+from .lru_cache import BoundedLRUCache
+from .metrics import register_stats, stage
+from .nlp_service import normalize_phrase
+
+# Highlight kinds, in priority order: a phrase that is both a search term and a
+# semantic match is highlighted as 'exact'. Spans refer to kinds by index.
+HIGHLIGHT_KINDS = ('exact', 'semantic')
+
+# Words, plus the hyphens and apostrophes joining them ("non-compete", "lessee's"), which
+# search terms keep; a term like "lessee" still matches the first part of "lessee's"
+_WORD = re.compile(r"\w+|(?<=\w)['\u2019-](?=\w)")
+_ASTRAL = re.compile('[\U00010000-\U0010FFFF]')
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over word tokens, so matches fall on word boundaries. Phrase
+    words must be separated by whitespace only: "liability cap" does not match "liability, cap".
+
+    Args:
+        patterns (dict[str, int]): Lowercased, whitespace-normalized pattern -> kind index.
+    """
+
+    def __init__(self, patterns: dict[str, int]):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]  # node -> [(pattern length in words, kind)]
+        self.max_words = 0
+        for pattern, kind in patterns.items():
+            words = [word.replace('\u2019', "'") for word in _WORD.findall(pattern)]
+            if not words:
+                continue
+            node = 0
+            for word in words:
+                child = self._goto[node].get(word)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[node][word] = child
+                node = child
+            self._output[node].append((len(words), kind))
+            self.max_words = max(self.max_words, len(words))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(word, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text: str) -> list[tuple[int, int, int]]:
+        """
+        Returns the leftmost-longest, non-overlapping matches in `text` as
+        (start, end, kind) character offsets, sorted by start.
+        """
+        if self.max_words == 0:
+            return []
+        goto, fail, output = self._goto, self._fail, self._output
+        # Lowercase once up front unless that would shift offsets (e.g. 'İ' lowercases to two characters)
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            lowered = None
+        matches = []
+        starts = deque(maxlen=self.max_words)  # Start offsets of the words on the current path
+        node = 0
+        previous_end = 0
+        for match in _WORD.finditer(text if lowered is None else lowered):
+            word = match.group().lower() if lowered is None else match.group()
+            if word == '\u2019':
+                word = "'"
+            if node:
+                gap = text[previous_end:match.start()]
+                if gap and not gap.isspace():
+                    node = 0  # Phrases do not continue across punctuation
+                else:
+                    while node and word not in goto[node]:
+                        node = fail[node]
+            node = goto[node].get(word, 0)
+            if not node:
+                continue  # Most words: not part of any pattern
+            start, previous_end = match.span()
+            starts.append(start)
+            for length, kind in output[node]:
+                matches.append((starts[-length], previous_end, kind))
+
+        # Keep the leftmost-longest matches; equal spans prefer the lower kind index
+        matches.sort(key=lambda span: (span[0], -span[1], span[2]))
+        selected = []
+        last_end = -1
+        for start, end, kind in matches:
+            if start >= last_end:
+                selected.append((start, end, kind))
+                last_end = end
+        return selected
+
+def to_utf16(text: str, offsets: np.ndarray) -> np.ndarray:
+    """Converts code point offsets to UTF-16 code unit offsets (JavaScript string indices)."""
+    if text.isascii():
+        return offsets
+    astral = np.array([match.start() for match in _ASTRAL.finditer(text)], dtype=np.int64)
+    if len(astral) == 0:
+        return offsets
+    return offsets + np.searchsorted(astral, offsets, side='left')
+
+def from_utf16(text: str, offsets: np.ndarray) -> np.ndarray:
+    """
+    Converts UTF-16 code unit offsets (as sent by a browser) back to code point offsets.
+    An offset inside a surrogate pair maps to the start of that character.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if text.isascii():
+        return offsets
+    astral = np.array([match.start() for match in _ASTRAL.finditer(text)], dtype=np.int64)
+    if len(astral) == 0:
+        return offsets
+    astral_utf16 = astral + np.arange(len(astral))  # Each earlier astral character adds one code unit
+    return offsets - np.searchsorted(astral_utf16, offsets, side='left')
+
+@stage('highlight')
+def compute_highlights(text: str, exact_terms: list[str], semantic_terms: list[str]) -> np.ndarray:
+    """
+    Finds every occurrence of the search terms and semantic matches in a document.
+
+    Returns:
+        np.ndarray: An (n, 3) int64 array of (start, end, kind) rows sorted by start, with
+        offsets in UTF-16 code units and kinds indexing HIGHLIGHT_KINDS.
+    """
+    patterns = {normalize_phrase(term): 1 for term in semantic_terms}
+    patterns.update((normalize_phrase(term), 0) for term in exact_terms)
+    spans = np.array(PhraseMatcher(patterns).find(text), dtype=np.int64).reshape(-1, 3)
+    spans[:, 0] = to_utf16(text, spans[:, 0])
+    spans[:, 1] = to_utf16(text, spans[:, 1])
+    return spans
+
+# Computed spans by (document ID, terms), so paging through a document does not rescan it
+_highlight_cache = BoundedLRUCache(max_bytes=HIGHLIGHT_CACHE_BYTES)
+
+def get_highlights(document_id: str, text: str, exact_terms: list[str], semantic_terms: list[str],
+                   range_start: int | None = None, range_end: int | None = None) -> dict:
+    """
+    Returns the highlight spans of a document, optionally only those overlapping the
+    character range [range_start, range_end).
+
+    Args:
+        document_id (str): ID of the document, used as the cache key.
+        text (str): The document text.
+        exact_terms (list[str]): Search terms, highlighted as 'exact'.
+        semantic_terms (list[str]): Semantic matches, highlighted as 'semantic'.
+        range_start (int | None): First character (UTF-16 code unit) of the window.
+        range_end (int | None): End of the window (exclusive).
+
+    Returns:
+        dict: {"kinds": [...], "spans": [[start, end, kind], ...], "total": all spans
+        in the document, "range": [start, end]}.
+    """
+    key = (document_id, tuple(sorted(set(map(normalize_phrase, exact_terms)))),
+           tuple(sorted(set(map(normalize_phrase, semantic_terms)))))
+    spans = _highlight_cache.get(key)
+    if spans is None:
+        spans = compute_highlights(text, exact_terms, semantic_terms)
+        _highlight_cache.put(key, spans, size=spans.nbytes + 200)
+
+    range_start = 0 if range_start is None else max(range_start, 0)
+    window = spans
+    if range_start > 0 or range_end is not None:
+        first = np.searchsorted(spans[:, 1], range_start, side='right')
+        last = len(spans) if range_end is None else np.searchsorted(spans[:, 0], range_end, side='left')
+        window = spans[first:max(first, last)]
+    return {
+        "kinds": list(HIGHLIGHT_KINDS),
+        "spans": window.tolist(),
+        "total": len(spans),
+        "range": [range_start, range_end],
+    }
+
+def get_highlight_cache_stats() -> dict:
+    """Returns hit/miss counters of the highlight span cache."""
+    return _highlight_cache.stats()
+
+register_stats('highlight_cache', get_highlight_cache_stats)
@@ -0,0 +1,146 @@
+# smartdoc-insight/backend/app/services/inference_scheduler.py
+from collections import Counter, deque
+from concurrent.futures import Future
+import os
+import threading
+import time
+from typing import Callable
+
+import numpy as np
+
+class _EncodeJob:
+    """Up to `max_batch_size` texts of one caller, waiting for a batch."""
+    __slots__ = ('texts', 'future', 'enqueued_at')
+
+    def __init__(self, texts: list[str]):
+        self.texts = texts
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+class InferenceScheduler:
+    """
+    Coalesces encode requests from concurrent request handlers into shared, deduplicated model calls.
+
+    Args:
+        encode_fn (Callable[[list[str]], np.ndarray]): Encodes a list of distinct texts.
+        max_batch_size (int): Maximum number of distinct texts per model call.
+        max_wait_seconds (float): How long a request may wait for others to join its batch.
+        delay_samples (int): Number of recent queueing delays kept for the percentiles.
+    """
+
+    def __init__(self, encode_fn: Callable[[list[str]], np.ndarray], max_batch_size: int = 256,
+                 max_wait_seconds: float = 0.005, delay_samples: int = 1024):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max_wait_seconds
+        self._jobs = deque()
+        self._queued_texts = Counter()  # Occurrences of each text in the queued jobs
+        self._condition = threading.Condition()
+        self._worker = None
+        self._worker_pid = None
+        self.batches = 0
+        self.texts_requested = 0
+        self.texts_encoded = 0
+        self._queue_delays = deque(maxlen=delay_samples)
+
+    def _ensure_worker(self):
+        # A worker thread does not survive fork(), e.g. gunicorn --preload
+        if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """
+        Encodes `texts` together with whatever other callers submit at the same time.
+
+        Returns:
+            np.ndarray: One row per text, in the order given.
+
+        Raises:
+            ValueError: If `texts` is empty.
+            Exception: Whatever `encode_fn` raised for a batch containing these texts.
+        """
+        if not texts:
+            raise ValueError("encode() needs at least one text.")
+        jobs = [_EncodeJob(texts[start:start + self.max_batch_size])
+                for start in range(0, len(texts), self.max_batch_size)]
+        with self._condition:
+            self._ensure_worker()
+            self._jobs.extend(jobs)
+            for job in jobs:
+                self._queued_texts.update(job.texts)
+            self._condition.notify()
+        return np.concatenate([job.future.result() for job in jobs])
+
+    def _next_batch(self) -> list[_EncodeJob]:
+        """Blocks until a batch is full or its oldest job has waited long enough."""
+        with self._condition:
+            while not self._jobs:
+                self._condition.wait()
+            deadline = self._jobs[0].enqueued_at + self.max_wait_seconds
+            while True:
+                remaining = deadline - time.perf_counter()
+                if len(self._queued_texts) >= self.max_batch_size or remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch, texts = [], set()
+            while self._jobs:
+                job_texts = set(self._jobs[0].texts)
+                if batch and len(texts) + len(job_texts - texts) > self.max_batch_size:
+                    break
+                job = self._jobs.popleft()
+                batch.append(job)
+                texts |= job_texts
+                self._queued_texts.subtract(job.texts)
+                for text in job_texts:
+                    if self._queued_texts[text] <= 0:
+                        del self._queued_texts[text]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            unique_texts = list(dict.fromkeys(text for job in batch for text in job.texts))
+            try:
+                embeddings = self.encode_fn(unique_texts)
+            except Exception as e:
+                for job in batch:
+                    job.future.set_exception(e)
+                continue
+            rows = {text: row for text, row in zip(unique_texts, embeddings)}
+            for job in batch:
+                job.future.set_result(np.stack([rows[text] for text in job.texts]))
+
+            with self._condition:
+                self.batches += 1
+                self.texts_requested += sum(len(job.texts) for job in batch)
+                self.texts_encoded += len(unique_texts)
+                self._queue_delays.extend(started - job.enqueued_at for job in batch)
+
+    def stats(self) -> dict:
+        """
+        Returns batching counters: mean batch fill ratio (distinct texts per model call
+        relative to `max_batch_size`), the share of texts saved by deduplication, and
+        queueing delay percentiles over the most recent requests.
+        """
+        with self._condition:
+            delays = np.array(self._queue_delays) * 1000
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+                "queued_jobs": len(self._jobs),
+                "batches": self.batches,
+                "texts_requested": self.texts_requested,
+                "texts_encoded": self.texts_encoded,
+                "mean_batch_size": self.texts_encoded / self.batches if self.batches else 0.0,
+                "batch_fill_ratio": self.texts_encoded / (self.batches * self.max_batch_size) if self.batches else 0.0,
+                "dedup_ratio": 1 - self.texts_encoded / self.texts_requested if self.texts_requested else 0.0,
+                "queue_delay_ms": {
+                    "p50": float(np.percentile(delays, 50)) if len(delays) else 0.0,
+                    "p95": float(np.percentile(delays, 95)) if len(delays) else 0.0,
+                    "max": float(delays.max()) if len(delays) else 0.0,
+                },
+            }
@@ -0,0 +1,129 @@
+# smartdoc-insight/backend/app/services/lru_cache.py
+from collections import OrderedDict
+import sys
+import threading
+import time
+
+import numpy as np
+
+def estimate_size(value) -> int:
+    """
+    Roughly estimates the memory footprint of a cached value in bytes.
+    NumPy arrays report their buffer size; strings and bytes their length.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+class BoundedLRUCache:
+    """
+    A thread-safe least-recently-used cache bounded by item count and/or total bytes.
+    Entries can optionally expire after a period without being read or written.
+
+    Args:
+        max_items (int | None): Maximum number of entries, or None for no limit.
+        max_bytes (int | None): Maximum total estimated size in bytes, or None for no limit.
+        ttl_seconds (float | None): Idle time after which an entry expires, or None.
+        sizeof (callable): Function used to estimate the size of a value.
+    """
+
+    def __init__(self, max_items: int | None = None, max_bytes: int | None = None,
+                 ttl_seconds: float | None = None, sizeof=estimate_size):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (value, size, last_access)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Returns the cached value for `key` (marking it recently used), or `default`."""
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is not None and self._expired(entry, now):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries[key] = (entry[0], entry[1], now)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size: int | None = None):
+        """Stores `value` under `key`, evicting least-recently-used entries if over budget."""
+        if size is None:
+            size = self._sizeof(value)
+        with self._lock:
+            self._remove(key)  # Also when the new value is not cached: the old one is stale
+            if self.max_bytes is not None and size > self.max_bytes:
+                return  # Never cache a value that alone exceeds the budget
+            self._entries[key] = (value, size, time.monotonic())
+            self._total_bytes += size
+            self._evict()
+
+    def pop(self, key, default=None):
+        """Removes `key` from the cache and returns its value, or `default`."""
+        with self._lock:
+            entry = self._remove(key)
+            return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _expired(self, entry, now: float) -> bool:
+        return self.ttl_seconds is not None and now - entry[2] > self.ttl_seconds
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+        return entry
+
+    def _evict(self):
+        if self.ttl_seconds is not None:
+            now = time.monotonic()
+            # Entries are kept in access order, so expired ones sit at the front
+            while self._entries and self._expired(next(iter(self._entries.values())), now):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        while self._entries and (
+            (self.max_items is not None and len(self._entries) > self.max_items)
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        ):
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def stats(self) -> dict:
+        """Returns hit/miss/eviction counters and the current size of the cache."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "items": len(self._entries),
+            "bytes": self._total_bytes,
+        }
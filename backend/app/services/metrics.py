@@ -0,0 +1,345 @@
+# smartdoc-insight/backend/app/services/metrics.py
+"""
+Request instrumentation: exclusive per-request stage timings (`with stage('encode'):`),
+process-wide counters and histograms, and a sampling profiler for slow requests.
+render_prometheus() exports them, per process, in the Prometheus text format.
+"""
+from contextlib import contextmanager
+import contextvars
+import os
+import re
+import sys
+import threading
+import time
+
+from ..config import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL_MS, PROFILE_THRESHOLD_MS
+
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_HELP = {
+    "smartdoc_requests_total": ("counter", "Requests handled, by endpoint and status code."),
+    "smartdoc_request_seconds": ("histogram", "Request handling time, by endpoint."),
+    "smartdoc_stage_seconds": ("histogram", "Exclusive time spent in each processing stage."),
+    "smartdoc_model_encode_calls_total": ("counter", "Calls into the embedding model."),
+    "smartdoc_model_texts_encoded_total": ("counter", "Texts embedded by the model."),
+    "smartdoc_profiles_written_total": ("counter", "Slow-request profiles written by the sampling profiler."),
+}
+
+# Stats keys that only ever grow; they are exported as counters (suffixed _total) so
+# rate() works on them, everything else as gauges
+_COUNTER_STATS = frozenset({
+    'hits', 'misses', 'shared_hits', 'evictions', 'batches', 'texts_requested', 'texts_encoded',
+    'completed_jobs', 'timed_out_jobs', 'queries', 'flushes', 'merges',
+})
+
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+_stats_sources = {}  # component name -> function returning a stats dict
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def increment(name: str, value: float = 1, **labels):
+    """Adds `value` to a counter."""
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name: str, seconds: float, **labels):
+    """Records one observation in a histogram."""
+    key = (name, _label_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(_BUCKETS) + 2)
+        for i, bound in enumerate(_BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += seconds
+        histogram[-1] += 1
+
+def register_stats(component: str, stats_fn):
+    """
+    Exposes a component's stats() dict as metrics named smartdoc_<component>_<key>
+    (nested keys joined with '_'), read at scrape time: keys in _COUNTER_STATS as
+    counters named <name>_total, the rest as gauges. Dicts with 'hits' and 'misses'
+    also get a '<prefix>_hit_ratio' gauge.
+    """
+    _stats_sources[component] = stats_fn
+
+# --- Per-request timings ---
+
+class RequestTimings:
+    """Stage timings of one request, and the threads working on it (for the profiler)."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.stages = {}  # stage -> seconds, in first-seen order
+        self.threads = {threading.get_ident()}
+        self.samples = None  # collapsed stack -> count, while the profiler watches this request
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Formats the stages as a Server-Timing header value (durations in ms)."""
+        with self._lock:
+            entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        entries.append(f"total;dur={self.elapsed * 1000:.1f}")
+        return ', '.join(entries)
+
+_current_request = contextvars.ContextVar('smartdoc_request', default=None)
+_current_stage = contextvars.ContextVar('smartdoc_stage', default=None)
+
+def begin_request(endpoint: str) -> RequestTimings:
+    """Starts timing a request in the current context."""
+    timings = RequestTimings(endpoint)
+    _current_request.set(timings)
+    _current_stage.set(None)
+    profiler.watch(timings)
+    return timings
+
+def end_request(timings: RequestTimings, status: int):
+    """Records a finished request and hands it to the profiler."""
+    elapsed = timings.elapsed
+    increment("smartdoc_requests_total", endpoint=timings.endpoint, status=status)
+    observe("smartdoc_request_seconds", elapsed, endpoint=timings.endpoint)
+    profiler.finish(timings, elapsed)
+    _current_request.set(None)
+
+def current_request() -> RequestTimings | None:
+    return _current_request.get()
+
+@contextmanager
+def stage(name: str):
+    """Times a processing stage (exclusive of stages nested inside it)."""
+    parent = _current_stage.get()
+    frame = [0.0]  # Time spent in nested stages
+    token = _current_stage.set(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _current_stage.reset(token)
+        if parent is not None:
+            parent[0] += elapsed
+        exclusive = max(elapsed - frame[0], 0.0)
+        observe("smartdoc_stage_seconds", exclusive, stage=name)
+        timings = _current_request.get()
+        if timings is not None:
+            timings.add(name, exclusive)
+
+@contextmanager
+def track_thread():
+    """Marks the current (pool) thread as working on the current request, for the profiler."""
+    timings = _current_request.get()
+    if timings is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    timings.threads.add(thread_id)
+    try:
+        yield
+    finally:
+        timings.threads.discard(thread_id)
+
+# --- Sampling profiler ---
+
+class SlowRequestProfiler:
+    """
+    Samples the stacks of in-flight requests while armed, and writes those of the first
+    request slower than the threshold to PROFILE_DIR as collapsed stacks, then disarms.
+    """
+
+    def __init__(self, interval_seconds: float, output_dir: str):
+        self.interval_seconds = interval_seconds
+        self.output_dir = output_dir
+        self.threshold_seconds = None
+        self.last_profile = None
+        self._watched = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def armed(self) -> bool:
+        return self.threshold_seconds is not None
+
+    def arm(self, threshold_ms: float = PROFILE_THRESHOLD_MS):
+        """Starts sampling requests; the first one slower than `threshold_ms` is written out."""
+        with self._lock:
+            self.threshold_seconds = threshold_ms / 1000
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='slow-request-profiler', daemon=True)
+                self._thread.start()
+        print(f"Slow-request profiler armed (threshold {threshold_ms:.0f} ms).")
+
+    def disarm(self):
+        with self._lock:
+            self.threshold_seconds = None
+            for timings in self._watched:
+                timings.samples = None
+            self._watched.clear()
+
+    def toggle(self):
+        if self.armed:
+            self.disarm()
+        else:
+            self.arm()
+
+    def state(self) -> dict:
+        return {
+            "armed": self.armed,
+            "thresholdMs": None if self.threshold_seconds is None else self.threshold_seconds * 1000,
+            "lastProfile": self.last_profile,
+        }
+
+    def watch(self, timings: RequestTimings):
+        if not self.armed:
+            return
+        with self._lock:
+            if self.armed:
+                timings.samples = {}
+                self._watched.add(timings)
+
+    def finish(self, timings: RequestTimings, elapsed: float):
+        with self._lock:
+            self._watched.discard(timings)
+            samples, timings.samples = timings.samples, None
+            if not self.armed or not samples or elapsed < self.threshold_seconds:
+                return
+            self.threshold_seconds = None
+            for other in self._watched:
+                other.samples = None
+            self._watched.clear()
+        self._write(timings, elapsed, samples)
+
+    def _write(self, timings: RequestTimings, elapsed: float, samples: dict):
+        os.makedirs(self.output_dir, exist_ok=True)
+        endpoint = re.sub(r'[^A-Za-z0-9]+', '_', timings.endpoint).strip('_') or 'request'
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{elapsed * 1000:.0f}ms.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(samples.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+        self.last_profile = path
+        increment("smartdoc_profiles_written_total")
+        print(f"Slow request {timings.endpoint} took {elapsed * 1000:.0f} ms "
+              f"({timings.server_timing()}); profile written to {path}")
+
+    def _run(self):
+        own_thread = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self.armed:
+                    self._thread = None
+                    return
+                watched = list(self._watched)
+            if watched:
+                frames = sys._current_frames()
+                for timings in watched:
+                    samples = timings.samples
+                    if samples is None:
+                        continue
+                    for thread_id in list(timings.threads):
+                        frame = frames.get(thread_id)
+                        if frame is None or thread_id == own_thread:
+                            continue
+                        stack = []
+                        while frame is not None:
+                            code = frame.f_code
+                            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                            frame = frame.f_back
+                        key = ';'.join(reversed(stack))
+                        samples[key] = samples.get(key, 0) + 1
+            time.sleep(self.interval_seconds)
+
+profiler = SlowRequestProfiler(PROFILE_SAMPLE_INTERVAL_MS / 1000, PROFILE_DIR)
+
+def install_profiler_signal() -> bool:
+    """
+    Lets `kill -USR2 <worker pid>` arm or disarm the profiler on a live worker.
+    Only possible from the main thread, on platforms with SIGUSR2.
+
+    Returns:
+        bool: Whether the handler was installed.
+    """
+    import signal
+    if not hasattr(signal, 'SIGUSR2') or threading.current_thread() is not threading.main_thread():
+        return False
+    # Toggle from another thread: the handler may interrupt the main thread while it
+    # holds the profiler's lock (sync workers serve requests on the main thread)
+    signal.signal(signal.SIGUSR2, lambda signum, frame: threading.Thread(target=profiler.toggle, daemon=True).start())
+    return True
+
+# --- Prometheus text format ---
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    labels = labels + extra
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+def _flatten(prefix: str, stats: dict, out: list):
+    for key, value in stats.items():
+        name = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', str(key))}"
+        if isinstance(value, dict):
+            _flatten(name, value, out)
+        elif isinstance(value, (int, float)):  # Includes bools, reported as 0/1
+            if key in _COUNTER_STATS:
+                out.append((f"{name}_total", "counter", float(value)))
+            else:
+                out.append((name, "gauge", float(value)))
+    hits, misses = stats.get('hits'), stats.get('misses')
+    if isinstance(hits, (int, float)) and isinstance(misses, (int, float)):
+        out.append((f"{prefix}_hit_ratio", "gauge", hits / (hits + misses) if hits + misses else 0.0))
+
+def render_prometheus() -> str:
+    """Returns all metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(value) for key, value in _histograms.items()}
+
+    by_name = {}
+    for (name, labels), value in counters.items():
+        by_name.setdefault(name, []).append((labels, value))
+    for name in sorted(by_name):
+        kind, help_text = _HELP.get(name, ("counter", name))
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        lines += [f"{name}{_format_labels(labels)} {value:g}" for labels, value in sorted(by_name[name])]
+
+    by_name = {}
+    for (name, labels), value in histograms.items():
+        by_name.setdefault(name, []).append((labels, value))
+    for name in sorted(by_name):
+        kind, help_text = _HELP.get(name, ("histogram", name))
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for labels, histogram in sorted(by_name[name]):
+            for bound, count in zip(_BUCKETS, histogram):
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', f'{bound:g}'),))} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {histogram[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram[-2]:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram[-1]}")
+
+    for component, stats_fn in sorted(_stats_sources.items()):
+        try:
+            samples = []
+            _flatten(f"smartdoc_{component}", stats_fn(), samples)
+        except Exception as e:
+            print(f"Error collecting {component} stats: {e}")
+            continue
+        for name, kind, value in samples:
+            lines += [f"# TYPE {name} {kind}", f"{name} {value:g}"]
+    return '\n'.join(lines) + '\n'
@@ -1,37 +1,87 @@
 # smartdoc-insight/backend/app/services/nlp_service.py
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
-from nltk.corpus import wordnet # New import for WordNet
-from sentence_transformers import SentenceTransformer
+# Heavy dependencies (NLTK, which pulls in scipy, its corpora, and
+# sentence_transformers/torch) are loaded on first use or during the explicit
+# warm-up in app/startup.py, never at import time.
 # from openai import OpenAI # Commented out for free alternative
-from flask import current_app # Still needed for app context, but not for API key directly
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator
+import multiprocessing
 import numpy as np
+import re
+import threading
 import time
-from .similarity_calculator import calculate_cosine_similarity
+from ..config import (
+    ENCODE_BATCH_SIZE, SENTENCE_BERT_MODEL, NLTK_AUTO_DOWNLOAD,
+    INFERENCE_SCHEDULER, INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS,
+    VECTOR_INDEX_BACKEND, VECTOR_INDEX_IVF_MIN_VECTORS, VECTOR_INDEX_IVF_NPROBE,
+    DEFINITION_CACHE_SIZE, LEMMA_CACHE_SIZE, PREPROCESS_WORKERS, PASSAGE_MAX_CHARS, PASSAGE_OVERLAP_SENTENCES,
+    EMBEDDING_CACHE_MEMORY_BYTES, EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_DISK_MAX_ROWS,
+    EMBEDDING_STORAGE_DTYPE, EMBEDDING_MMAP_DIR,
+)
+from .embedding_cache import EmbeddingCache
+from .inference_scheduler import InferenceScheduler
+from .lru_cache import BoundedLRUCache
+from .metrics import increment, register_stats, stage
+from .vector_index import VectorIndex, create_index
 
-# --- NLTK Data Downloads (Run once on app startup or during setup) ---
-def _download_nltk_data():
-    """Downloads necessary NLTK data if not already present."""
-    data_packages = ['punkt', 'stopwords', 'wordnet', 'omw-1.4']
-    for package in data_packages:
+# --- NLTK Data (checked during warm-up, not at import) ---
+NLTK_DATA_PACKAGES = ['punkt', 'stopwords', 'wordnet', 'omw-1.4']
+
+def ensure_nltk_data(download: bool = NLTK_AUTO_DOWNLOAD) -> list[str]:
+    """
+    Checks that the NLTK data packages are installed, downloading missing ones
+    only if `download` is set (the Dockerfile installs them at build time).
+
+    Returns:
+        list[str]: The packages that are still missing.
+    """
+    import nltk
+
+    missing = []
+    for package in NLTK_DATA_PACKAGES:
         try:
             nltk.data.find(f'tokenizers/{package}' if package == 'punkt' else f'corpora/{package}')
-            print(f"NLTK data '{package}' already downloaded.")
         except LookupError:
-            print(f"Downloading NLTK data '{package}'...")
-            nltk.download(package, quiet=True)
-            print(f"NLTK data '{package}' downloaded.")
-        except Exception as e:
-            print(f"Error downloading NLTK data '{package}': {e}")
+            if download:
+                print(f"Downloading NLTK data '{package}'...")
+                if nltk.download(package, quiet=True):
+                    continue
+            missing.append(package)
+    if missing:
+        print(f"NLTK data missing: {', '.join(missing)}")
+    return missing
+
+def word_tokenize(text: str) -> list[str]:
+    """NLTK's word_tokenize, importing NLTK on first use."""
+    from nltk.tokenize import word_tokenize as nltk_word_tokenize
+    return nltk_word_tokenize(text)
+
+def _get_wordnet():
+    from nltk.corpus import wordnet
+    return wordnet
+
+_lemmatizer = None
+_stop_words = None
+# Lemma memo by word. Word frequencies follow Zipf's law, so a few thousand words make
+# up most tokens and nearly every lemmatization becomes a dict lookup.
+_lemmas = {}
 
-# Call the download function when the service file is imported
-_download_nltk_data()
+def _get_lemmatizer():
+    """Creates the WordNet lemmatizer on first use."""
+    global _lemmatizer
+    if _lemmatizer is None:
+        from nltk.stem import WordNetLemmatizer
+        _lemmatizer = WordNetLemmatizer()
+    return _lemmatizer
 
-# Initialize NLTK components after ensuring data is downloaded
-lemmatizer = WordNetLemmatizer()
-stop_words = set(stopwords.words('english'))
+def _get_stop_words() -> set[str]:
+    """Loads the English stop word list on first use."""
+    global _stop_words
+    if _stop_words is None:
+        from nltk.corpus import stopwords
+        _stop_words = set(stopwords.words('english'))
+    return _stop_words
 
 # --- Sentence-BERT Model Loading ---
 _sentence_bert_model = None
@@ -40,118 +90,559 @@ def _load_sentence_bert_model():
     """Loads the Sentence-BERT model. Lazy loading for efficiency."""
     global _sentence_bert_model
     if _sentence_bert_model is None:
-        print("Loading Sentence-BERT model 'all-MiniLM-L6-v2'...")
-        _sentence_bert_model = SentenceTransformer('all-MiniLM-L6-v2')
+        from sentence_transformers import SentenceTransformer  # Imports torch; deferred until needed
+        print(f"Loading Sentence-BERT model '{SENTENCE_BERT_MODEL}'...")
+        _sentence_bert_model = SentenceTransformer(SENTENCE_BERT_MODEL)
         print("Sentence-BERT model loaded.")
     return _sentence_bert_model
 
+# --- Embedding Cache ---
+_embedding_cache = None
+
+def _get_embedding_cache() -> EmbeddingCache:
+    """Creates the process-wide word-embedding cache on first use."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(
+            SENTENCE_BERT_MODEL,
+            memory_bytes=EMBEDDING_CACHE_MEMORY_BYTES,
+            disk_dir=EMBEDDING_CACHE_DIR or None,
+            disk_max_rows=EMBEDDING_CACHE_DISK_MAX_ROWS,
+        )
+    return _embedding_cache
+
+def get_embedding_cache_stats() -> dict:
+    """Returns hit/miss counters of the word-embedding cache."""
+    return _get_embedding_cache().stats()
+
+# --- Inference Scheduler ---
+_inference_scheduler = None
+_inference_scheduler_lock = threading.Lock()
+
+def _encode_with_model(texts: list[str], batch_size: int = ENCODE_BATCH_SIZE) -> np.ndarray:
+    """Runs the Sentence-BERT model over `texts` and L2-normalizes the result."""
+    model = _load_sentence_bert_model()
+    increment("smartdoc_model_encode_calls_total")
+    increment("smartdoc_model_texts_encoded_total", len(texts))
+    embeddings = model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    return _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+
+def _get_inference_scheduler() -> InferenceScheduler:
+    """Creates the process-wide scheduler that batches model calls across requests."""
+    global _inference_scheduler
+    with _inference_scheduler_lock:
+        if _inference_scheduler is None:
+            _inference_scheduler = InferenceScheduler(
+                lambda texts: _encode_with_model(texts, batch_size=INFERENCE_MAX_BATCH_SIZE),
+                max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+                max_wait_seconds=INFERENCE_MAX_WAIT_MS / 1000,
+            )
+    return _inference_scheduler
+
+def get_inference_scheduler_stats() -> dict:
+    """Returns batch fill ratio and queueing delay metrics of the inference scheduler."""
+    if not INFERENCE_SCHEDULER:
+        return {"enabled": False}
+    return {"enabled": True, **_get_inference_scheduler().stats()}
+
+# --- WordNet Definition Cache ---
+# Bounded memoization of WordNet lookups by lowercased word. Words without a
+# definition are cached as None, so _MISSING marks a cache miss.
+_MISSING = object()
+_definition_cache = BoundedLRUCache(max_items=DEFINITION_CACHE_SIZE)
+
 # --- Core NLP Functions ---
 
+def iter_content_tokens(text: str) -> Iterator[str]:
+    """
+    Yields the lowercased alphanumeric tokens of a text in order. The tokenization
+    shared by preprocessing and document vocabulary extraction.
+    """
+    return (token for token in word_tokenize(text.lower()) if token.isalnum())
+
+def _lemmatize_uncached(word: str) -> str:
+    if len(_lemmas) >= LEMMA_CACHE_SIZE:
+        _lemmas.clear()
+    lemma = _lemmas[word] = _get_lemmatizer().lemmatize(word)
+    return lemma
+
+def lemmatize(word: str) -> str:
+    """Returns the WordNet lemma of a lowercased word, memoized."""
+    lemma = _lemmas.get(word)
+    return lemma if lemma is not None else _lemmatize_uncached(word)
+
+@stage('tokenize')
 def preprocess_text(text: str) -> list[str]:
     """
     Performs basic text preprocessing: tokenization, lowercasing,
-    stop word removal, and lemmatization.
+    stop word removal, and lemmatization (memoized per word).
     """
     if not text:
         return []
-    
-    tokens = word_tokenize(text.lower())
-    filtered_tokens = [
-        lemmatizer.lemmatize(word) for word in tokens
-        if word.isalnum() and word not in stop_words
-    ]
+
+    stop_words = _get_stop_words()
+    lemmas = _lemmas
+    filtered_tokens = []
+    for word in iter_content_tokens(text):
+        if word in stop_words:
+            continue
+        lemma = lemmas.get(word)
+        filtered_tokens.append(lemma if lemma is not None else _lemmatize_uncached(word))
     return filtered_tokens
 
-def get_semantic_matches(document_text: str, search_term: str, similarity_threshold: float = 0.4) -> list[str]: # Lowered threshold
+_preprocess_pool = None
+_preprocess_pool_lock = threading.Lock()
+
+def _get_preprocess_pool(workers: int) -> ProcessPoolExecutor:
+    """Returns the process pool for batch preprocessing, created on first use."""
+    global _preprocess_pool
+    with _preprocess_pool_lock:
+        if _preprocess_pool is None:
+            # 'spawn' keeps workers free of the parent's threads and loaded models
+            _preprocess_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _preprocess_pool
+
+def preprocess_texts(texts: Iterable[str], workers: int = PREPROCESS_WORKERS, chunk_size: int = 16) -> Iterator[list[str]]:
     """
-    Finds semantically related words in the document using Sentence-BERT.
+    Preprocesses many texts (see preprocess_text()), yielding the token lists in input order.
 
     Args:
-        document_text (str): The full text of the document.
-        search_term (str): The word to find semantic matches for.
-        similarity_threshold (float): Minimum cosine similarity to consider a match.
+        texts (Iterable[str]): The texts, consumed lazily.
+        workers (int): Worker processes to spread the texts over, or 0 for the calling thread.
+        chunk_size (int): Texts sent to a worker at a time.
+    """
+    if workers <= 0:
+        for text in texts:
+            yield preprocess_text(text)
+        return
+    pool = _get_preprocess_pool(workers)
+    iterator = iter(texts)
+    while batch := list(islice(iterator, workers * chunk_size * 4)):
+        yield from pool.map(preprocess_text, batch, chunksize=chunk_size)
+
+@stage('tokenize')
+def extract_vocabulary(text: str) -> list[str]:
+    """
+    Tokenizes a document once and returns its unique candidate words in
+    first-occurrence order (lowercased, alphanumeric, longer than one character).
+    """
+    if not text:
+        return []
+    return list(dict.fromkeys(word for word in iter_content_tokens(text) if len(word) > 1))
+
+def normalize_phrase(term: str) -> str:
+    """Lowercases a search term and collapses its whitespace, the form phrases are indexed in."""
+    return ' '.join(term.lower().split())
+
+@stage('tokenize')
+def extract_phrases(text: str, n: int, max_phrases: int | None = None) -> list[str]:
+    """
+    Returns the unique n-word phrases of a document in first-occurrence order, without
+    phrases spanning punctuation or starting or ending with a stop word.
+
+    Args:
+        text (str): The document text.
+        n (int): Number of words per phrase (at least 2).
+        max_phrases (int | None): Keep only the most frequent phrases, up to this many.
+    """
+    if not text or n < 2:
+        return []
+    stop_words = _get_stop_words()
+    counts = {}
+    run = []
+    for token in word_tokenize(text.lower()) + ['.']:
+        if token.isalnum():
+            run.append(token)
+            continue
+        for start in range(len(run) - n + 1):
+            gram = run[start:start + n]
+            if gram[0] not in stop_words and gram[-1] not in stop_words:
+                phrase = ' '.join(gram)
+                counts[phrase] = counts.get(phrase, 0) + 1
+        run = []
+    phrases = list(counts)
+    if max_phrases is not None and len(phrases) > max_phrases:
+        position = {phrase: i for i, phrase in enumerate(phrases)}
+        kept = sorted(phrases, key=lambda phrase: (-counts[phrase], position[phrase]))[:max_phrases]
+        phrases = sorted(kept, key=position.__getitem__)
+    return phrases
+
+# A sentence ends at '.', '!' or '?' (possibly followed by a closing quote or bracket)
+# before whitespace, or at a blank line
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+|(?<=[.!?][\'"”’)\]])\s+|\n\s*\n')
+_WORD = re.compile(r'\S+')
+
+def _sentence_spans(text: str, max_chars: int) -> list[tuple[int, int]]:
+    """Returns the (start, end) offsets of the sentences of a text, cutting sentences longer than max_chars into windows of words."""
+    spans = []
+    start = 0
+    for end, next_start in [(match.start(), match.end()) for match in _SENTENCE_BREAK.finditer(text)] + [(len(text), len(text))]:
+        if end - start <= max_chars:
+            if text[start:end].strip():
+                spans.append((start, end))
+        else:
+            window_start = window_end = None
+            for word in _WORD.finditer(text, start, end):
+                if window_start is not None and word.end() - window_start > max_chars:
+                    spans.append((window_start, window_end))
+                    window_start = None
+                if window_start is None:
+                    window_start = word.start()
+                window_end = word.end()
+            if window_start is not None:
+                spans.append((window_start, window_end))
+        start = next_start
+    # Leading whitespace belongs to no sentence
+    return [(begin + len(text[begin:end]) - len(text[begin:end].lstrip()), end) for begin, end in spans]
+
+@stage('tokenize')
+def split_passages(
+    text: str,
+    max_chars: int = PASSAGE_MAX_CHARS,
+    overlap: int = PASSAGE_OVERLAP_SENTENCES,
+    max_passages: int | None = None,
+) -> list[tuple[int, int]]:
+    """
+    Splits a document into overlapping passages of whole sentences for passage search.
+
+    Args:
+        text (str): The document text.
+        max_chars (int): Maximum passage length.
+        overlap (int): Sentences shared by consecutive passages.
+        max_passages (int | None): Stop after this many passages.
 
     Returns:
-        list[str]: A list of unique semantically matching words found in the document.
+        list[tuple[int, int]]: The (start, end) character offsets of the passages.
     """
-    model = _load_sentence_bert_model()
-    if model is None:
-        print("Sentence-BERT model not loaded, cannot find semantic matches.")
+    if not text:
         return []
+    sentences = _sentence_spans(text, max_chars)
+    passages = []
+    first = 0
+    while first < len(sentences) and (max_passages is None or len(passages) < max_passages):
+        last = first + 1
+        while last < len(sentences) and sentences[last][1] - sentences[first][0] <= max_chars:
+            last += 1
+        passages.append((sentences[first][0], sentences[last - 1][1]))
+        if last == len(sentences):
+            break
+        # Overlap only as far as the next passage still has room for a new sentence
+        first = max(last - overlap, first + 1)
+        while first < last and sentences[last][1] - sentences[first][0] > max_chars:
+            first += 1
+    return passages
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalizes each row so cosine similarity becomes a plain dot product."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+@stage('encode')
+def encode_texts(texts: list[str], batch_size: int = ENCODE_BATCH_SIZE) -> np.ndarray:
+    """
+    Encodes texts into an L2-normalized float32 matrix, using the embedding cache and the inference scheduler.
+
+    Args:
+        texts (list[str]): The words or phrases to embed.
+        batch_size (int): Number of texts per forward pass when the scheduler is disabled.
+
+    Returns:
+        np.ndarray: A (len(texts), dim) matrix of unit-length embeddings.
+    """
+    if not texts:
+        model = _load_sentence_bert_model()
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    cache = _get_embedding_cache()
+    cached, missing = cache.get_many(list(dict.fromkeys(texts)))
+    if missing:
+        if INFERENCE_SCHEDULER:
+            embeddings = _get_inference_scheduler().encode(missing)
+        else:
+            embeddings = _encode_with_model(missing, batch_size=batch_size)
+        cache.put_many(missing, embeddings)
+        cached.update(zip(missing, embeddings))
+    return np.stack([cached[text] for text in texts])
+
+@stage('encode')
+def encode_passages(passages: list[str], batch_size: int = ENCODE_BATCH_SIZE) -> np.ndarray:
+    """
+    Encodes document passages into an L2-normalized float32 matrix, bypassing the word
+    embedding cache and handing the inference scheduler one batch at a time.
+    """
+    if not passages:
+        model = _load_sentence_bert_model()
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    # Whitespace inside a passage (line breaks, indentation) carries no meaning for the model
+    passages = [' '.join(passage.split()) for passage in passages]
+    if not INFERENCE_SCHEDULER:
+        return _encode_with_model(passages, batch_size=batch_size)
+    scheduler = _get_inference_scheduler()
+    size = scheduler.max_batch_size
+    return np.concatenate([scheduler.encode(passages[start:start + size]) for start in range(0, len(passages), size)])
+
+@stage('index')
+def build_vocabulary_index(
+    vocabulary_embeddings: np.ndarray,
+    backend: str = VECTOR_INDEX_BACKEND,
+    dtype: str = EMBEDDING_STORAGE_DTYPE,
+    mmap_dir: str | None = EMBEDDING_MMAP_DIR or None,
+) -> VectorIndex:
+    """
+    Builds the vector index used to query a document vocabulary.
 
-    document_words_raw = [word for word in word_tokenize(document_text.lower()) if word.isalnum() and len(word) > 1]
-    document_words_unique = list(set(document_words_raw))
-    
-    if not document_words_unique:
+    Args:
+        vocabulary_embeddings (np.ndarray): Normalized embeddings, one row per word.
+        backend (str): 'exact', 'ivf', or 'auto' to use the approximate IVF index only
+            for vocabularies of at least VECTOR_INDEX_IVF_MIN_VECTORS words.
+        dtype (str): Storage type of the embeddings: 'float32', 'float16' or 'int8'.
+        mmap_dir (str | None): If set, the embeddings are moved to a memory-mapped file there.
+
+    Returns:
+        VectorIndex: An index whose ids are positions in the vocabulary.
+    """
+    if backend == 'auto':
+        backend = 'ivf' if len(vocabulary_embeddings) >= VECTOR_INDEX_IVF_MIN_VECTORS else 'exact'
+    options = {"nprobe": VECTOR_INDEX_IVF_NPROBE} if backend == 'ivf' else {}
+    index = create_index(backend, vocabulary_embeddings.shape[1], dtype=dtype, **options)
+    index.add(vocabulary_embeddings)
+    if mmap_dir:
+        index.spill(mmap_dir)
+    return index
+
+def _query_entries(entries: list[str], index: VectorIndex, query_embeddings: np.ndarray,
+                   normalized_terms: list[str], k: int, similarity_threshold: float) -> list[tuple[list[str], list]]:
+    """
+    Scores every query embedding against one index in a single pass and returns, per
+    query, the matching entries (in entry order) and (score, entry) suggestion candidates
+    (best first), leaving out the search term itself.
+    """
+    results = []
+    # Ask for one extra neighbour per query in case the term itself is an entry
+    for term, ((top_scores, top_ids), (_, match_ids)) in zip(
+        normalized_terms, index.query_many(query_embeddings, k + 1, similarity_threshold)
+    ):
+        matches = [entries[i] for i in match_ids if entries[i] != term]
+        candidates = [(float(score), entries[i]) for score, i in zip(top_scores, top_ids) if entries[i] != term]
+        results.append((matches, candidates))
+    return results
+
+@stage('score')
+def score_search_terms(
+    vocabulary: list[str],
+    vocabulary_index: VectorIndex,
+    search_terms: list[str],
+    phrase_indexes: dict[int, tuple[list[str], VectorIndex]] | None = None,
+    similarity_threshold: float = 0.4,
+    num_suggestions: int = 5,
+    suggestion_threshold: float = 0.25,
+) -> list[tuple[list[str], list[str], list[str]]]:
+    """
+    Scores several search terms and phrases against a document in one batch.
+
+    Args:
+        vocabulary (list[str]): Unique document words, in document order.
+        vocabulary_index (VectorIndex): Index over the vocabulary embeddings.
+        search_terms (list[str]): Words and phrases to search for.
+        phrase_indexes (dict | None): Phrase length -> (phrases, index over their embeddings).
+        similarity_threshold (float): Minimum cosine similarity for a semantic match.
+        num_suggestions (int): Maximum number of suggested words to return per term.
+        suggestion_threshold (float): Minimum cosine similarity for a suggestion.
+
+    Returns:
+        list[tuple[list[str], list[str], list[str]]]: Per search term, the semantic matches,
+        the suggested words and the matching document phrases.
+    """
+    if not search_terms:
         return []
+    k = max(num_suggestions, 0)
+    normalized_terms = [normalize_phrase(term) for term in search_terms]
+    query_embeddings = encode_texts(search_terms)
+    matches = [[] for _ in search_terms]
+    candidates = [[] for _ in search_terms]
+    phrase_matches = [[] for _ in search_terms]
 
-    search_embedding = model.encode(search_term)
+    if vocabulary:
+        for i, (term_matches, term_candidates) in enumerate(_query_entries(
+            vocabulary, vocabulary_index, query_embeddings, normalized_terms, k, similarity_threshold
+        )):
+            matches[i] = term_matches
+            candidates[i] = term_candidates
 
-    semantic_matches = []
-    for doc_word in document_words_unique:
-        if doc_word == search_term.lower():
+    for n, (phrases, phrase_index) in (phrase_indexes or {}).items():
+        positions = [i for i, term in enumerate(normalized_terms) if len(term.split()) == n]
+        if not positions or not phrases:
             continue
-            
-        doc_word_embedding = model.encode(doc_word)
-        similarity = calculate_cosine_similarity(search_embedding, doc_word_embedding)
-        
-        if similarity >= similarity_threshold:
-            semantic_matches.append(doc_word)
+        for i, (term_matches, _) in zip(positions, _query_entries(
+            phrases, phrase_index, query_embeddings[positions], [normalized_terms[i] for i in positions], 0,
+            similarity_threshold,
+        )):
+            phrase_matches[i] = term_matches
+
+    results = []
+    for term_matches, term_candidates, term_phrases in zip(matches, candidates, phrase_matches):
+        suggested_words = [entry for score, entry in term_candidates if score >= suggestion_threshold][:k]
+        results.append((term_matches, suggested_words, term_phrases))
+    return results
+
+@stage('score')
+def score_passages(passage_index: VectorIndex, search_terms: list[str], k: int) -> list[tuple[np.ndarray, np.ndarray]]:
+    """
+    Ranks a document's passages against several search terms.
+
+    Args:
+        passage_index (VectorIndex): Index over the passage embeddings (see encode_passages()).
+        search_terms (list[str]): Words, phrases or questions to search for.
+        k (int): Number of passages to return per term.
+
+    Returns:
+        list[tuple[np.ndarray, np.ndarray]]: Per search term, the scores and ids of its best passages.
+    """
+    if not search_terms:
+        return []
+    query_embeddings = encode_texts(search_terms)
+    return [top for top, _ in passage_index.query_many(query_embeddings, k, np.inf)]
+
+def score_vocabulary(
+    vocabulary: list[str],
+    vocabulary_index: VectorIndex,
+    search_term: str,
+    similarity_threshold: float = 0.4,
+    num_suggestions: int = 5,
+    suggestion_threshold: float = 0.25,
+) -> tuple[list[str], list[str]]:
+    """
+    Scores an indexed vocabulary against a search term and derives both result
+    lists from that single scoring pass.
+
+    Args:
+        vocabulary (list[str]): Unique document words, in document order.
+        vocabulary_index (VectorIndex): Index over the vocabulary embeddings.
+        search_term (str): The word to find semantic matches and suggestions for.
+        similarity_threshold (float): Minimum cosine similarity for a semantic match.
+        num_suggestions (int): Maximum number of suggested words to return.
+        suggestion_threshold (float): Minimum cosine similarity for a suggestion.
+
+    Returns:
+        tuple[list[str], list[str]]: The semantic matches (in document order) and the
+        suggested words (most similar first).
+    """
+    if not vocabulary:
+        return [], []
+    semantic_matches, suggested_words, _ = score_search_terms(
+        vocabulary, vocabulary_index, [search_term],
+        similarity_threshold=similarity_threshold,
+        num_suggestions=num_suggestions,
+        suggestion_threshold=suggestion_threshold,
+    )[0]
+    return semantic_matches, suggested_words
+
+def analyze_search_term(
+    document_text: str,
+    search_term: str,
+    similarity_threshold: float = 0.4,
+    num_suggestions: int = 5,
+    suggestion_threshold: float = 0.25,
+    batch_size: int = ENCODE_BATCH_SIZE,
+) -> tuple[list[str], list[str]]:
+    """
+    Runs the shared semantic analysis for a search with score_vocabulary().
+
+    Args:
+        document_text (str): The full text of the document.
+        search_term (str): The word to find semantic matches and suggestions for.
+        similarity_threshold (float): Minimum cosine similarity for a semantic match.
+        num_suggestions (int): Maximum number of suggested words to return.
+        suggestion_threshold (float): Minimum cosine similarity for a suggestion.
+        batch_size (int): Number of vocabulary words per forward pass.
 
+    Returns:
+        tuple[list[str], list[str]]: The semantic matches and the suggested words.
+    """
+    vocabulary = extract_vocabulary(document_text)
+    if not vocabulary:
+        return [], []
+    vocabulary_index = build_vocabulary_index(encode_texts(vocabulary, batch_size=batch_size))
+    return score_vocabulary(
+        vocabulary, vocabulary_index, search_term,
+        similarity_threshold=similarity_threshold,
+        num_suggestions=num_suggestions,
+        suggestion_threshold=suggestion_threshold,
+    )
+
+def get_semantic_matches(document_text: str, search_term: str, similarity_threshold: float = 0.4) -> list[str]: # Lowered threshold
+    """
+    Finds semantically related words in the document using Sentence-BERT.
+
+    Args:
+        document_text (str): The full text of the document.
+        search_term (str): The word to find semantic matches for.
+        similarity_threshold (float): Minimum cosine similarity to consider a match.
+
+    Returns:
+        list[str]: A list of unique semantically matching words found in the document.
+    """
+    semantic_matches, _ = analyze_search_term(document_text, search_term, similarity_threshold=similarity_threshold)
     return semantic_matches
 
+def load_wordnet() -> bool:
+    """
+    Loads the WordNet corpus and the stop word list eagerly. Called once during
+    warm-up so the first request does not pay for the lazy corpus loads.
+    """
+    try:
+        _get_wordnet().ensure_loaded()
+        _get_stop_words()
+        return True
+    except LookupError as e:
+        print(f"Error loading WordNet, definitions will be unavailable: {e}")
+        return False
+
+def _lookup_definition(word_lower: str) -> str | None:
+    """Returns the first WordNet definition for a lowercased word, memoized."""
+    definition = _definition_cache.get(word_lower, _MISSING)
+    if definition is _MISSING:
+        synsets = _get_wordnet().synsets(word_lower)
+        # Use the definition of the first (most common) synset
+        definition = synsets[0].definition() if synsets else None
+        _definition_cache.put(word_lower, definition, size=1)
+    return definition
+
 def get_definitions(word: str) -> str:
     """
     Fetches the definition of a word using NLTK's WordNet.
     """
-    print(f"Fetching definition for '{word}' using WordNet...")
-    synsets = wordnet.synsets(word.lower())
-    if synsets:
-        # Return the definition of the first (most common) synset
-        return synsets[0].definition()
+    definition = _lookup_definition(word.lower())
+    if definition is not None:
+        return definition
     return f"Definition for '{word}' not found via WordNet."
 
-def get_suggested_words(search_term: str, context_text: str, num_suggestions: int = 5) -> list[str]:
+@stage('definitions')
+def get_definitions_batch(words: list[str]) -> dict[str, str]:
     """
-    Suggests semantically related terms using Sentence-BERT by finding similar words
-    within the document context, excluding exact and semantic matches.
+    Fetches definitions for many words at once.
+
+    Args:
+        words (list[str]): The words to define. Duplicates are resolved once.
+
+    Returns:
+        dict[str, str]: The definition (or not-found message) for each distinct word.
     """
-    model = _load_sentence_bert_model()
-    if model is None:
-        print("Sentence-BERT model not loaded, cannot suggest words.")
-        return []
+    return {word: get_definitions(word) for word in dict.fromkeys(words)}
 
-    document_words_raw = [word for word in word_tokenize(context_text.lower()) if word.isalnum() and len(word) > 1]
-    document_words_unique = list(set(document_words_raw))
+def get_definition_cache_stats() -> dict:
+    """Returns hit/miss counters of the definition memoization layer."""
+    return _definition_cache.stats()
 
-    if not document_words_unique:
-        return []
+def get_suggested_words(search_term: str, context_text: str, num_suggestions: int = 5) -> list[str]:
+    """
+    Suggests semantically related terms using Sentence-BERT by finding similar words
+    within the document context, excluding the search term itself.
+    """
+    _, suggested_words = analyze_search_term(context_text, search_term, num_suggestions=num_suggestions)
+    return suggested_words
 
-    search_embedding = model.encode(search_term)
-    
-    suggestions_with_similarity = []
-    for doc_word in document_words_unique:
-        if doc_word == search_term.lower():
-            continue
-        
-        doc_word_embedding = model.encode(doc_word)
-        similarity = calculate_cosine_similarity(search_embedding, doc_word_embedding)
-        suggestions_with_similarity.append((doc_word, similarity))
-
-    # Sort by similarity in descending order and filter out low-similarity suggestions
-    suggestions_with_similarity = [
-        (word, sim) for word, sim in suggestions_with_similarity if sim >= 0.25 # Lowered threshold for suggestions
-    ]
-    suggestions_with_similarity.sort(key=lambda x: x[1], reverse=True)
-
-    final_suggestions = []
-    seen_words = {search_term.lower()}
-    
-    for word, _ in suggestions_with_similarity:
-        if word not in seen_words:
-            final_suggestions.append(word)
-            seen_words.add(word)
-        if len(final_suggestions) >= num_suggestions:
-            break
-            
-    return final_suggestions[:num_suggestions]
\ No newline at end of file
+register_stats('embedding_cache', get_embedding_cache_stats)
+register_stats('definition_cache', get_definition_cache_stats)
+register_stats('inference_scheduler', get_inference_scheduler_stats)
@@ -0,0 +1,189 @@
+# smartdoc-insight/backend/app/services/parse_cache.py
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from ..config import (
+    PARSE_CACHE_MAX_BYTES, PARSE_CACHE_PATH, PASSAGE_MAX_CHARS, PASSAGE_OVERLAP_SENTENCES, SENTENCE_BERT_MODEL,
+)
+from .document_parser import PARSER_VERSION
+from .metrics import register_stats, stage
+
+class ParseCache:
+    """
+    Persistent SQLite (WAL) cache shared by the worker processes on the host: extracted
+    text by upload hash, vocabularies and passages by document ID, and the shared tier
+    of the search result cache. Values are zlib-compressed; least recently used entries
+    are evicted above `max_bytes`.
+
+    Args:
+        path (str): Path of the SQLite file.
+        max_bytes (int): Maximum total size of the stored (compressed) values.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS entries '
+            '(key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)'
+        )
+        self._connection.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+        # Running count and size of the entries, kept up to date by every write, so a
+        # write does not have to sum the whole table to know whether to evict
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS totals '
+            '(id INTEGER PRIMARY KEY CHECK (id = 0), items INTEGER NOT NULL, size INTEGER NOT NULL)'
+        )
+        self._connection.execute(
+            'INSERT OR IGNORE INTO totals (id, items, size) SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+        )
+
+    def _get(self, key: str) -> bytes | None:
+        with self._lock:
+            row = self._connection.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._connection.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+            self.hits += 1
+        return zlib.decompress(row[0])
+
+    def _put(self, key: str, value: bytes):
+        data = zlib.compress(value, 6)
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            # One transaction, so other workers never see the totals disagree with the
+            # entries or a half-evicted cache; IMMEDIATE takes the write lock up front
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._connection.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)',
+                    (key, data, len(data), time.time())
+                )
+                self._connection.execute(
+                    'UPDATE totals SET items = items + ?, size = size + ? WHERE id = 0',
+                    (int(row is None), len(data) - (row[0] if row else 0))
+                )
+                evicted = self._evict()
+                self._connection.execute('COMMIT')
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+            self.evictions += evicted
+
+    def _evict(self) -> int:
+        """Deletes the least recently used entries if they exceed max_bytes. Runs inside _put's transaction."""
+        total = self._connection.execute('SELECT size FROM totals WHERE id = 0').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        target = int(self.max_bytes * 0.9)
+        evicted = freed = 0
+        for key, size in self._connection.execute('SELECT key, size FROM entries ORDER BY last_access').fetchall():
+            if total - freed <= target:
+                break
+            self._connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            freed += size
+            evicted += 1
+        self._connection.execute('UPDATE totals SET items = items - ?, size = size - ? WHERE id = 0', (evicted, freed))
+        return evicted
+
+    @staticmethod
+    def _text_key(content_hash: str, extension: str) -> str:
+        return f"text:v{PARSER_VERSION}:{extension}:{content_hash}"
+
+    @stage('storage')
+    def get_text(self, content_hash: str, extension: str) -> str | None:
+        """Returns the text extracted from a file with this SHA-256 and extension, if cached."""
+        value = self._get(self._text_key(content_hash, extension))
+        return None if value is None else value.decode('utf-8')
+
+    @stage('storage')
+    def put_text(self, content_hash: str, extension: str, text: str):
+        self._put(self._text_key(content_hash, extension), text.encode('utf-8'))
+
+    @stage('storage')
+    def get_vocabulary(self, document_id: str) -> list[str] | None:
+        """Returns the vocabulary extracted from a document's text, if cached."""
+        value = self._get(f"vocabulary:v{PARSER_VERSION}:{document_id}")
+        if value is None:
+            return None
+        return value.decode('utf-8').split('\n') if value else []
+
+    @stage('storage')
+    def put_vocabulary(self, document_id: str, vocabulary: list[str]):
+        # Vocabulary words are single tokens, so they never contain a newline
+        self._put(f"vocabulary:v{PARSER_VERSION}:{document_id}", '\n'.join(vocabulary).encode('utf-8'))
+
+    @staticmethod
+    def _passages_key(document_id: str) -> str:
+        # Passages depend on how the text is split and on the model that embedded them
+        return (f"passages:v{PARSER_VERSION}:{PASSAGE_MAX_CHARS}:{PASSAGE_OVERLAP_SENTENCES}:"
+                f"{SENTENCE_BERT_MODEL}:{document_id}")
+
+    @stage('storage')
+    def get_passages(self, document_id: str) -> tuple[np.ndarray, np.ndarray] | None:
+        """Returns the passage offsets and (float32) embeddings of a document, if cached."""
+        value = self._get(self._passages_key(document_id))
+        if value is None:
+            return None
+        with np.load(io.BytesIO(value), allow_pickle=False) as data:
+            return data['offsets'], data['embeddings'].astype(np.float32)
+
+    @stage('storage')
+    def put_passages(self, document_id: str, offsets: np.ndarray, embeddings: np.ndarray):
+        # float16 halves the entry; the index quantizes the rows further anyway
+        buffer = io.BytesIO()
+        np.savez(buffer, offsets=offsets, embeddings=embeddings.astype(np.float16))
+        self._put(self._passages_key(document_id), buffer.getvalue())
+
+    @stage('storage')
+    def get_search_result(self, key: str) -> tuple[list[str], list[str], list[str]] | None:
+        """Returns the (semantic matches, suggested words, phrase matches) stored under a search cache key, if any."""
+        value = self._get(f"search:{key}")
+        if value is None:
+            return None
+        semantic_matches, suggested_words, phrase_matches = json.loads(value)
+        return semantic_matches, suggested_words, phrase_matches
+
+    @stage('storage')
+    def put_search_result(self, key: str, result: tuple[list[str], list[str], list[str]]):
+        self._put(f"search:{key}", json.dumps(result, ensure_ascii=False).encode('utf-8'))
+
+    def stats(self) -> dict:
+        """Returns hit/miss/eviction counters of this process and the size of the shared cache."""
+        with self._lock:
+            items, size = self._connection.execute('SELECT items, size FROM totals WHERE id = 0').fetchone()
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "items": items, "bytes": size}
+
+_parse_cache = None
+_parse_cache_lock = threading.Lock()
+
+def get_parse_cache() -> ParseCache | None:
+    """Returns the process-wide parse cache, or None if PARSE_CACHE_PATH is empty."""
+    global _parse_cache
+    if not PARSE_CACHE_PATH:
+        return None
+    with _parse_cache_lock:
+        if _parse_cache is None:
+            _parse_cache = ParseCache(PARSE_CACHE_PATH, PARSE_CACHE_MAX_BYTES)
+        return _parse_cache
+
+if PARSE_CACHE_PATH:
+    register_stats('parse_cache', lambda: get_parse_cache().stats())
@@ -0,0 +1,295 @@
+# smartdoc-insight/backend/app/services/parse_executor.py
+from concurrent.futures import CancelledError, ProcessPoolExecutor, wait, FIRST_EXCEPTION
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator
+import multiprocessing
+import os
+import threading
+import time
+
+from ..config import (
+    PARSE_POOL_WORKERS, PARSE_TIMEOUT_SECONDS, PARSE_MEMORY_LIMIT_BYTES,
+    PARSE_PAGES_PER_TASK, MAX_DOCUMENT_PAGES,
+)
+from .document_parser import parse_document, count_pdf_pages, iter_document_chunks, iter_pdf_pages, DocumentLimitError
+from .metrics import register_stats, stage
+
+try:
+    import resource
+except ImportError:  # Windows: the memory cap is not enforced
+    resource = None
+
+# Futures cancelled by shutdown(cancel_futures=True) never wake up wait() (their
+# executor does not notify waiters), so waits check for cancellation this often
+_CANCEL_CHECK_SECONDS = 0.5
+
+class ParseTimeoutError(Exception):
+    """Raised when parsing a document takes longer than the configured timeout."""
+
+# --- Worker-process functions (module level so they can be pickled) ---
+
+def _init_worker(memory_limit_bytes: int | None, started):
+    """Caps the address space of each parser process and reports its PID to the pool's owner."""
+    if memory_limit_bytes and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+    started.put(os.getpid())
+
+def _count_pages(path: str) -> int:
+    with open(path, 'rb') as file_stream:
+        return count_pdf_pages(file_stream)
+
+def _parse_pdf_pages(path: str, first_page: int, last_page: int) -> list[str]:
+    with open(path, 'rb') as file_stream:
+        return list(iter_pdf_pages(file_stream, max_pages=None, page_numbers=range(first_page, last_page)))
+
+def _parse_whole(path: str, filename: str) -> str:
+    with open(path, 'rb') as file_stream:
+        return parse_document(file_stream, filename)
+
+def _parse_chunks(path: str, filename: str) -> list[str]:
+    with open(path, 'rb') as file_stream:
+        return list(iter_document_chunks(file_stream, filename))
+
+class ParseExecutor:
+    """
+    Parses documents in a pool of worker processes with a wall-clock timeout per document.
+
+    Args:
+        max_workers (int): Number of parser processes.
+        timeout_seconds (float): Wall-clock limit per document.
+        memory_limit_bytes (int | None): Address-space cap per parser process.
+        pages_per_task (int): PDF pages parsed by one task.
+    """
+
+    def __init__(self, max_workers: int, timeout_seconds: float, memory_limit_bytes: int | None = None,
+                 pages_per_task: int = 20):
+        self.max_workers = max_workers
+        self.timeout_seconds = timeout_seconds
+        self.memory_limit_bytes = memory_limit_bytes
+        self.pages_per_task = pages_per_task
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending_tasks = 0
+        self._outstanding = {}  # Executor -> its futures that are not done yet
+        self._started = {}  # Executor -> queue of the PIDs its workers report on start
+        self._active_jobs = 0
+        self.completed_jobs = 0
+        self.timed_out_jobs = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # 'spawn' keeps workers free of the parent's threads and loaded models
+                context = multiprocessing.get_context('spawn')
+                started = context.SimpleQueue()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self.memory_limit_bytes, started),
+                )
+                self._started[self._executor] = started
+            return self._executor
+
+    def _recycle(self, executor: ProcessPoolExecutor, stuck: set):
+        """
+        Replaces the pool after the job owning the `stuck` futures timed out. Queued tasks of
+        other jobs are cancelled (and retried); the old workers are terminated once idle.
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+            others = self._outstanding.get(executor, set()) - stuck
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        def reap():
+            deadline = time.monotonic() + self.timeout_seconds
+            while not all(future.done() for future in others) and time.monotonic() < deadline:
+                wait(others, timeout=_CANCEL_CHECK_SECONDS)
+            with self._lock:
+                self._outstanding.pop(executor, None)
+                started = self._started.pop(executor)
+            pids = set()
+            while not started.empty():
+                pids.add(started.get())
+            started.close()
+            # Workers that already exited are no longer active children, so a reused PID is never hit
+            for process in multiprocessing.active_children():
+                if process.pid in pids:
+                    process.terminate()
+
+        threading.Thread(target=reap, name='parse-pool-reaper', daemon=True).start()
+
+    def _submit(self, executor: ProcessPoolExecutor, fn, *args):
+        future = executor.submit(fn, *args)
+        with self._lock:
+            self._pending_tasks += 1
+            self._outstanding.setdefault(executor, set()).add(future)
+        future.add_done_callback(lambda done: self._task_done(executor, done))
+        return future
+
+    def _task_done(self, executor: ProcessPoolExecutor, future):
+        with self._lock:
+            self._pending_tasks -= 1
+            self._outstanding.get(executor, set()).discard(future)
+
+    def _wait(self, executor: ProcessPoolExecutor, futures: list, deadline: float, job: list | None = None) -> list:
+        """
+        Waits for all futures before `deadline` and returns their results in order.
+
+        Raises:
+            CancelledError: If another job's timeout cancelled one of the futures.
+        """
+        while True:
+            remaining = deadline - time.monotonic()
+            done, not_done = wait(futures, timeout=max(min(remaining, _CANCEL_CHECK_SECONDS), 0),
+                                  return_when=FIRST_EXCEPTION)
+            if not not_done or remaining <= 0 or any(future.exception() is not None for future in done):
+                break
+            if any(future.cancelled() for future in not_done):
+                for future in not_done:
+                    future.cancel()
+                raise CancelledError()
+        if not_done:
+            failed = [future for future in done if future.exception() is not None]
+            if failed:
+                for future in not_done:
+                    future.cancel()
+                failed[0].result()
+            self._recycle(executor, set(not_done) | {future for future in job or () if not future.done()})
+            with self._lock:
+                self.timed_out_jobs += 1
+            raise ParseTimeoutError(f"Parsing did not finish within {self.timeout_seconds:g} seconds.")
+        return [future.result() for future in futures]
+
+    def _parse(self, path: str, filename: str, deadline: float) -> str:
+        executor = self._get_executor()
+        if filename.split('.')[-1].lower() != 'pdf':
+            return self._wait(executor, [self._submit(executor, _parse_whole, path, filename)], deadline)[0]
+
+        page_count = self._wait(executor, [self._submit(executor, _count_pages, path)], deadline)[0]
+        if MAX_DOCUMENT_PAGES is not None and page_count > MAX_DOCUMENT_PAGES:
+            raise DocumentLimitError(f"Document is too long: the limit is {MAX_DOCUMENT_PAGES} pages.")
+        futures = [
+            self._submit(executor, _parse_pdf_pages, path, first, min(first + self.pages_per_task, page_count))
+            for first in range(0, page_count, self.pages_per_task)
+        ]
+        return ''.join(text for pages in self._wait(executor, futures, deadline) for text in pages)
+
+    @stage('parse')
+    def parse_file(self, path: str, filename: str) -> str:
+        """
+        Parses the document at `path` in the worker pool.
+
+        Args:
+            path (str): Path of the (spooled) document file.
+            filename (str): The original filename, used to determine the file type.
+
+        Returns:
+            str: The extracted text, identical to parse_document().
+
+        Raises:
+            ValueError: If the file type is unsupported.
+            DocumentLimitError: If the document is too long or exceeds the memory cap.
+            ParseTimeoutError: If parsing exceeds the timeout.
+        """
+        deadline = time.monotonic() + self.timeout_seconds
+        with self._lock:
+            self._active_jobs += 1
+        try:
+            try:
+                return self._parse(path, filename, deadline)
+            except (BrokenProcessPool, CancelledError):
+                # Another job's timeout replaced the pool (or a worker crashed); retry once
+                return self._parse(path, filename, deadline)
+        except MemoryError:
+            raise DocumentLimitError("Document needs more memory than the parser is allowed to use.")
+        finally:
+            with self._lock:
+                self._active_jobs -= 1
+                self.completed_jobs += 1
+
+    def iter_chunks(self, path: str, filename: str) -> Iterator[str]:
+        """
+        Parses the document at `path` in the worker pool like parse_file(), yielding the
+        chunks of iter_document_chunks() in order as the tasks holding them finish.
+
+        Raises:
+            ValueError: If the file type is unsupported (raised here, before parsing).
+        """
+        extension = filename.split('.')[-1].lower()
+        if extension not in ('pdf', 'docx'):
+            raise ValueError(f"Unsupported file type: .{extension}. Only .docx and .pdf are supported.")
+        return self._iter_chunks(path, filename, extension == 'pdf')
+
+    def _iter_chunks(self, path: str, filename: str, is_pdf: bool) -> Iterator[str]:
+        deadline = time.monotonic() + self.timeout_seconds
+        with self._lock:
+            self._active_jobs += 1
+        futures = []
+        sent = 0  # Chunks yielded so far; a retry resumes after them
+        try:
+            for attempt in range(2):
+                executor = self._get_executor()
+                try:
+                    if is_pdf:
+                        with stage('parse'):
+                            page_count = self._wait(executor, [self._submit(executor, _count_pages, path)], deadline)[0]
+                        if MAX_DOCUMENT_PAGES is not None and page_count > MAX_DOCUMENT_PAGES:
+                            raise DocumentLimitError(f"Document is too long: the limit is {MAX_DOCUMENT_PAGES} pages.")
+                        futures = [
+                            self._submit(executor, _parse_pdf_pages, path, first, min(first + self.pages_per_task, page_count))
+                            for first in range(sent, page_count, self.pages_per_task)
+                        ]
+                    else:
+                        futures = [self._submit(executor, _parse_chunks, path, filename)]
+                    skip = 0 if is_pdf else sent
+                    for i, future in enumerate(futures):
+                        with stage('parse'):
+                            chunks = self._wait(executor, [future], deadline, job=futures[i:])[0]
+                        for chunk in chunks[skip:]:
+                            sent += 1
+                            yield chunk
+                    return
+                except (BrokenProcessPool, CancelledError):
+                    if attempt:
+                        raise
+                    # Another job's timeout replaced the pool (or a worker crashed); retry once
+        except MemoryError:
+            raise DocumentLimitError("Document needs more memory than the parser is allowed to use.")
+        finally:
+            for future in futures:
+                future.cancel()  # The consumer stopped early or parsing failed
+            with self._lock:
+                self._active_jobs -= 1
+                self.completed_jobs += 1
+
+    def stats(self) -> dict:
+        """Returns the queue depth and job counters of the pool."""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "pending_tasks": self._pending_tasks,
+                "active_jobs": self._active_jobs,
+                "completed_jobs": self.completed_jobs,
+                "timed_out_jobs": self.timed_out_jobs,
+            }
+
+_parse_executor = None
+_parse_executor_lock = threading.Lock()
+
+def get_parse_executor() -> ParseExecutor:
+    """Returns the process-wide parse executor, creating it on first use."""
+    global _parse_executor
+    with _parse_executor_lock:
+        if _parse_executor is None:
+            _parse_executor = ParseExecutor(
+                max_workers=PARSE_POOL_WORKERS,
+                timeout_seconds=PARSE_TIMEOUT_SECONDS,
+                memory_limit_bytes=PARSE_MEMORY_LIMIT_BYTES,
+                pages_per_task=PARSE_PAGES_PER_TASK,
+            )
+    return _parse_executor
+
+if PARSE_POOL_WORKERS > 0:
+    register_stats('parse_pool', lambda: get_parse_executor().stats())
@@ -1,8 +1,59 @@
 # backend/app/services/pdf_generator.py
-from xhtml2pdf import pisa
+import functools
+import hashlib
 import io
 import os
+import re
 
+import numpy as np
+
+from ..config import PDF_CACHE_BYTES, PDF_STREAM_CHUNK_BYTES, PDF_UNICODE_FONT_PATH
+from .highlighter import HIGHLIGHT_KINDS, from_utf16
+from .lru_cache import BoundedLRUCache
+from .metrics import register_stats, stage
+
+# Layout of PDFs rendered from text. Bump PDF_STYLE_VERSION whenever any of these
+# change, so renders cached with the old style are not served again.
+PDF_STYLE_VERSION = 1
+PDF_FONT = 'Helvetica'
+PDF_UNICODE_FONT = 'SmartdocUnicode'  # PDF_UNICODE_FONT_PATH, registered on first use
+PDF_FONT_SIZE = 11
+PDF_LEADING = 1.625 * PDF_FONT_SIZE  # Line height of the frontend's document area (leading-relaxed)
+PDF_MARGIN = 48  # Points (2/3 inch)
+PDF_TEXT_COLOR = '#1F2937'  # Tailwind gray-800
+PDF_HIGHLIGHT_COLORS = {
+    'exact': '#FDE047',  # Tailwind yellow-300, as in the frontend
+    'semantic': '#86EFAC',  # Tailwind green-300
+}
+
+_TOKEN = re.compile(r'\S+\s*|\s+')
+# Tabs become spaces; other control characters have no glyph and are dropped
+_DISPLAY = str.maketrans({'\t': '    ', '\r': None, '\f': None, '\v': None})
+
+@functools.cache
+def _unicode_font() -> str | None:
+    """Registers PDF_UNICODE_FONT_PATH with reportlab; returns its name, or None if it is unavailable."""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont, TTFError
+
+    try:
+        pdfmetrics.registerFont(TTFont(PDF_UNICODE_FONT, PDF_UNICODE_FONT_PATH))
+    except (OSError, TTFError) as e:
+        print(f"PDF font {PDF_UNICODE_FONT_PATH!r} unavailable, non-Latin-1 text will be blank: {e}")
+        return None
+    return PDF_UNICODE_FONT
+
+def pdf_font(text: str) -> str:
+    """Returns the font a document's text is rendered with: Helvetica if it covers the text."""
+    if text.isascii():
+        return PDF_FONT
+    try:
+        text.encode('latin-1')
+    except UnicodeEncodeError:
+        return _unicode_font() or PDF_FONT
+    return PDF_FONT
+
+@stage('render')
 def generate_highlighted_pdf(html_content: str, filename: str = "highlighted_document.pdf") -> bytes:
     """
     Generates a PDF from HTML content, preserving highlights.
@@ -19,6 +70,8 @@ def generate_highlighted_pdf(html_content: str, filename: str = "highlighted_doc
     Raises:
         Exception: If PDF generation fails.
     """
+    from xhtml2pdf import pisa  # Pulls in reportlab; imported on first export, not at boot
+
     result_file = io.BytesIO()
 
     # Define basic HTML template with more comprehensive inline styles
@@ -90,4 +143,168 @@ def generate_highlighted_pdf(html_content: str, filename: str = "highlighted_doc
         print(f"PDF generation error: {pisa_status.err}")
         raise Exception("PDF generation failed.")
 
-    return result_file.getvalue()
\ No newline at end of file
+    return result_file.getvalue()
+
+def _layout_lines(text: str, max_width: float, width) -> list[tuple[int, int]]:
+    """
+    Wraps the text greedily at whitespace into lines no wider than `max_width`,
+    breaking words that are wider than a whole line.
+
+    Returns:
+        list[tuple[int, int]]: (start, end) offsets of each line in `text`.
+    """
+    lines = []
+    paragraph_start = 0
+    for paragraph_end in [match.start() for match in re.finditer('\n', text)] + [len(text)]:
+        line_start, line_width = paragraph_start, 0.0
+        for token in _TOKEN.finditer(text, paragraph_start, paragraph_end):
+            word = token.group()
+            word_width = width(word.rstrip())
+            if line_width + word_width > max_width and token.start() > line_start:
+                lines.append((line_start, token.start()))
+                line_start, line_width = token.start(), 0.0
+            if word_width > max_width:
+                # A single word wider than the page: cut it into line-sized pieces
+                piece_start = token.start()
+                for i in range(token.start() + 1, token.end()):
+                    if width(text[piece_start:i + 1]) > max_width:
+                        lines.append((piece_start, i))
+                        piece_start = i
+                line_start, line_width = piece_start, width(text[piece_start:token.end()])
+                continue
+            line_width += width(word)
+        lines.append((line_start, paragraph_end))
+        paragraph_start = paragraph_end + 1
+    return lines
+
+@stage('render')
+def render_highlighted_pdf(text: str, spans: np.ndarray, kinds: list[str]) -> bytes:
+    """
+    Renders a document's text with highlighted spans straight to PDF with reportlab.
+
+    Args:
+        text (str): The document text.
+        spans (np.ndarray): Sorted, non-overlapping (start, end, kind) code point offsets.
+        kinds (list[str]): Highlight kind names indexed by the spans' kind column.
+
+    Returns:
+        bytes: The binary content of the generated PDF file.
+    """
+    from reportlab.lib.colors import HexColor
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    from reportlab.pdfgen import canvas
+
+    font = pdf_font(text)
+
+    widths = {}
+    def width(fragment: str) -> float:
+        # Documents repeat the same words many times; measure each once
+        value = widths.get(fragment)
+        if value is None:
+            value = widths[fragment] = stringWidth(fragment.translate(_DISPLAY), font, PDF_FONT_SIZE)
+        return value
+
+    page_width, page_height = A4
+    lines = _layout_lines(text, page_width - 2 * PDF_MARGIN, width)
+    colors = [HexColor(PDF_HIGHLIGHT_COLORS[kind]) for kind in kinds]
+    text_color = HexColor(PDF_TEXT_COLOR)
+
+    result_file = io.BytesIO()
+    pdf = canvas.Canvas(result_file, pagesize=A4, pageCompression=1)
+    pdf.setTitle("Highlighted Document")
+    pdf.setFont(font, PDF_FONT_SIZE)
+    top = page_height - PDF_MARGIN - PDF_FONT_SIZE
+    y = top
+    span_list = spans.tolist()
+    next_span = 0
+    for line_start, line_end in lines:
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(font, PDF_FONT_SIZE)
+            y = top
+        while next_span < len(span_list) and span_list[next_span][1] <= line_start:
+            next_span += 1
+        i = next_span
+        while i < len(span_list) and span_list[i][0] < line_end:
+            start, end, kind = span_list[i]
+            x0 = PDF_MARGIN + width(text[line_start:max(start, line_start)])
+            x1 = PDF_MARGIN + width(text[line_start:min(end, line_end)])
+            pdf.setFillColor(colors[kind])
+            pdf.rect(x0 - 1, y - 0.3 * PDF_FONT_SIZE, x1 - x0 + 2, 1.3 * PDF_FONT_SIZE, stroke=0, fill=1)
+            i += 1
+        pdf.setFillColor(text_color)
+        pdf.drawString(PDF_MARGIN, y, text[line_start:line_end].translate(_DISPLAY))
+        y -= PDF_LEADING
+    pdf.save()
+    return result_file.getvalue()
+
+def normalize_spans(text: str, spans, kinds: list[str]) -> np.ndarray:
+    """
+    Converts client highlight spans (UTF-16 offsets) for render_highlighted_pdf().
+
+    Raises:
+        ValueError: If the spans or kinds are malformed.
+    """
+    if not isinstance(kinds, list) or not all(kind in PDF_HIGHLIGHT_COLORS for kind in kinds):
+        raise ValueError(f"'kinds' must be a list of highlight kinds from {list(HIGHLIGHT_KINDS)}")
+    try:
+        spans = np.array(spans, dtype=np.int64).reshape(-1, 3)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("'spans' must be a list of [start, end, kind] integer triples")
+    if len(spans) and (spans.min() < 0 or spans[:, 2].max() >= len(kinds) or (spans[:, 1] < spans[:, 0]).any()):
+        raise ValueError("Every span needs 0 <= start <= end and a kind indexing 'kinds'")
+    spans[:, 0] = np.minimum(from_utf16(text, spans[:, 0]), len(text))
+    spans[:, 1] = np.minimum(from_utf16(text, spans[:, 1]), len(text))
+    spans = spans[spans[:, 1] > spans[:, 0]]
+    spans = spans[np.lexsort((-spans[:, 1], spans[:, 0]))]
+    keep = np.ones(len(spans), dtype=bool)
+    last_end = -1
+    for i, (start, end) in enumerate(spans[:, :2].tolist()):
+        if start < last_end:
+            keep[i] = False
+        else:
+            last_end = end
+    return spans[keep]
+
+# Rendered PDFs by content hash of (document, highlights, style version)
+_pdf_cache = BoundedLRUCache(max_bytes=PDF_CACHE_BYTES)
+
+def get_highlighted_pdf(document_id: str, text: str, spans, kinds: list[str]) -> bytes:
+    """
+    Returns the PDF of a document with the given highlights, rendered once per view.
+
+    Args:
+        document_id (str): ID of the document (a hash of its text).
+        text (str): The document text.
+        spans: [start, end, kind] rows in UTF-16 code units, kind indexing `kinds`.
+        kinds (list[str]): Highlight kind names, e.g. HIGHLIGHT_KINDS.
+
+    Returns:
+        bytes: The binary content of the PDF file.
+
+    Raises:
+        ValueError: If the spans or kinds are malformed.
+    """
+    spans = normalize_spans(text, spans, kinds)
+    font = pdf_font(text)
+    digest = hashlib.sha256(f"{PDF_STYLE_VERSION}:{font}:{document_id}:{','.join(kinds)}:".encode('utf-8'))
+    digest.update(spans.tobytes())
+    key = digest.hexdigest()
+    pdf_bytes = _pdf_cache.get(key)
+    if pdf_bytes is None:
+        pdf_bytes = render_highlighted_pdf(text, spans, kinds)
+        _pdf_cache.put(key, pdf_bytes)
+    return pdf_bytes
+
+def iter_pdf_chunks(pdf_bytes: bytes):
+    """Yields the PDF in PDF_STREAM_CHUNK_BYTES pieces for a streamed response body."""
+    view = memoryview(pdf_bytes)
+    for start in range(0, len(view), PDF_STREAM_CHUNK_BYTES):
+        yield bytes(view[start:start + PDF_STREAM_CHUNK_BYTES])
+
+def get_pdf_cache_stats() -> dict:
+    """Returns hit/miss counters of the rendered PDF cache."""
+    return _pdf_cache.stats()
+
+register_stats('pdf_cache', get_pdf_cache_stats)
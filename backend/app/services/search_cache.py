@@ -0,0 +1,113 @@
+# smartdoc-insight/backend/app/services/search_cache.py
+import hashlib
+import json
+import threading
+
+from ..config import (
+    EMBEDDING_STORAGE_DTYPE, PASSAGE_MAX_CHARS, PASSAGE_OVERLAP_SENTENCES, SEARCH_CACHE_ITEMS, SEARCH_CACHE_SHARED,
+    SEARCH_PHRASE_MAX_NGRAMS, SEARCH_PHRASE_MAX_WORDS, SENTENCE_BERT_MODEL, VECTOR_INDEX_BACKEND,
+    VECTOR_INDEX_IVF_MIN_VECTORS, VECTOR_INDEX_IVF_NPROBE,
+)
+from .lru_cache import BoundedLRUCache
+from .metrics import register_stats
+from .nlp_service import normalize_phrase
+from .parse_cache import get_parse_cache
+
+# Bump whenever a change to scoring changes search results, so that cached results
+# (in every worker's memory and in the shared tier) are not served again.
+SEARCH_RESULTS_VERSION = 2  # 2: phrase matches are kept apart from semantic matches
+
+# Everything besides the document, the term and the thresholds that decides a result
+# (the IVF settings decide which matches an approximate index returns under 'auto')
+_SETTINGS = (f"{SEARCH_RESULTS_VERSION}:{SENTENCE_BERT_MODEL}:{EMBEDDING_STORAGE_DTYPE}:{VECTOR_INDEX_BACKEND}:"
+             f"{VECTOR_INDEX_IVF_MIN_VECTORS}:{VECTOR_INDEX_IVF_NPROBE}:"
+             f"{SEARCH_PHRASE_MAX_WORDS}:{SEARCH_PHRASE_MAX_NGRAMS}")
+
+class SearchResultCache:
+    """
+    Cache of per-term /search results by document ID, normalized term and scoring
+    settings: an in-process LRU in front of an optional tier shared through the parse cache.
+
+    Args:
+        max_items (int): Maximum number of results kept in memory.
+        shared (bool): Also read and write the shared tier, if the parse cache is enabled.
+    """
+
+    def __init__(self, max_items: int, shared: bool = True):
+        self._memory = BoundedLRUCache(max_items=max_items)
+        self._shared = shared
+        self._lock = threading.Lock()
+        self.shared_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(document_id: str, term: str, similarity_threshold: float, num_suggestions: int,
+            suggestion_threshold: float) -> str:
+        return (f"{_SETTINGS}:{similarity_threshold}:{suggestion_threshold}:{num_suggestions}:"
+                f"{document_id}:{normalize_phrase(term)}")
+
+    def get(self, key: str) -> tuple[list[str], list[str], list[str]] | None:
+        """Returns the cached (semantic matches, suggested words, phrase matches) for `key`, or None."""
+        result = self._memory.get(key)
+        if result is not None:
+            return result
+        shared = get_parse_cache() if self._shared else None
+        result = shared.get_search_result(key) if shared is not None else None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        self._memory.put(key, result)
+        return result
+
+    def put(self, key: str, result: tuple[list[str], list[str], list[str]]):
+        self._memory.put(key, result)
+        shared = get_parse_cache() if self._shared else None
+        if shared is not None:
+            shared.put_search_result(key, result)
+
+    def stats(self) -> dict:
+        """Returns hits (from either tier), misses and the memory tier's counters."""
+        memory = self._memory.stats()
+        with self._lock:
+            return {
+                "hits": memory["hits"] + self.shared_hits,
+                "misses": self.misses,
+                "shared_hits": self.shared_hits,
+                "memory": memory,
+            }
+
+_search_cache = SearchResultCache(SEARCH_CACHE_ITEMS, shared=SEARCH_CACHE_SHARED)
+
+def get_search_cache() -> SearchResultCache:
+    """Returns the process-wide search result cache."""
+    return _search_cache
+
+register_stats('search_cache', lambda: _search_cache.stats())
+
+# Request fields that do not change the /search response
+_ETAG_IGNORED_FIELDS = ('documentId', 'documentContent')
+
+def search_etag(document_id: str, data: dict) -> str:
+    """
+    Returns the ETag of a /search response: a hash of the document's content hash, the
+    request's options and the settings results depend on. Computed before searching,
+    so a conditional request can be answered with 304 without doing the work.
+    """
+    options = {key: value for key, value in data.items() if key not in _ETAG_IGNORED_FIELDS}
+    digest = hashlib.sha256(json.dumps(
+        [_SETTINGS, PASSAGE_MAX_CHARS, PASSAGE_OVERLAP_SENTENCES, document_id, options],
+        sort_keys=True, ensure_ascii=False,
+    ).encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Tells whether an If-None-Match header value lists `etag` (weak comparison, as for GET)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/').strip('"') == etag:
+            return True
+    return False
@@ -1,76 +1,133 @@
 # backend/app/services/session_manager.py
-import firebase_admin
-from firebase_admin import credentials, firestore
+import hashlib
+import logging
 import os
+import threading
 import uuid
-import time
-import json
+import zlib
+
+from ..config import SESSION_CACHE_BYTES, SESSION_COMPRESSION_LEVEL, SESSION_SQLITE_PATH, SESSION_STORE_BACKEND
+from .lru_cache import BoundedLRUCache
+from .metrics import register_stats, stage
+from .session_store import SessionStore, create_session_store
+
+logger = logging.getLogger(__name__)
 
 # Corrected path to your Firebase service account key file
 # It should be in the 'app' directory, one level up from 'services'
 SERVICE_ACCOUNT_KEY_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'firebase_service_account.json')
-# Initialize Firebase Admin SDK (only once)
-if not firebase_admin._apps:
-    try:
-        cred = credentials.Certificate(SERVICE_ACCOUNT_KEY_PATH)
-        firebase_admin.initialize_app(cred)
-        print("Firebase Admin SDK initialized successfully.")
-    except FileNotFoundError:
-        print(f"ERROR: Firebase service account key not found at {SERVICE_ACCOUNT_KEY_PATH}")
-        print("Please ensure 'firebase_service_account.json' is in backend/app/.")
-        # In a production app, you might want to exit or log a critical error
-    except Exception as e:
-        print(f"ERROR initializing Firebase Admin SDK: {e}")
-        # In a production app, you might want to exit or log a critical error
 
-db = firestore.client()
+# Version of the session record layout. Records without it (saved before blobs were
+# introduced) hold a truncated 'document_content_snippet' and the HTML inline.
+SESSION_FORMAT = 2
 
-def save_session(search_term: str, document_content: str, highlighted_html: str) -> str:
+_store = None
+_store_lock = threading.Lock()
+
+def _sizeof_session(session: dict) -> int:
+    return sum(len(value) for value in session.values() if isinstance(value, (str, bytes))) + 256
+
+# Loaded sessions by ID. Sessions never change once saved, so entries stay valid.
+_session_cache = BoundedLRUCache(max_bytes=SESSION_CACHE_BYTES, sizeof=_sizeof_session)
+
+def get_session_store() -> SessionStore:
     """
-    Saves the current session state to Firestore and returns a unique ID.
+    Creates the configured session store on first use (see SESSION_STORE_BACKEND).
     """
-    if not firebase_admin._apps:
-        raise Exception("Firebase Admin SDK not initialized. Cannot save session.")
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = SESSION_STORE_BACKEND
+            if backend == 'auto':
+                backend = 'firestore' if os.path.exists(SERVICE_ACCOUNT_KEY_PATH) else 'sqlite'
+            if backend == 'firestore':
+                _store = create_session_store(backend, service_account_key_path=SERVICE_ACCOUNT_KEY_PATH)
+            else:
+                _store = create_session_store(backend, path=SESSION_SQLITE_PATH)
+            logger.info("Session store: %s", _store.kind)
+        return _store
 
-    session_id = str(uuid.uuid4())
+def set_session_store(store: SessionStore | None):
+    """Replaces the session store (e.g. with an in-memory SQLite store in tests) and clears the cache."""
+    global _store
+    with _store_lock:
+        _store = store
+    _session_cache.clear()
 
-    # Firestore documents have a 1MB limit. Storing full document_content might exceed this.
-    # For a real app, you'd store a reference to the document in cloud storage (e.g., Firebase Storage)
-    # and only store its reference in Firestore.
-    # For now, we'll store a truncated version of content to avoid immediate errors with large files.
+def _put_text(store: SessionStore, text: str) -> str:
+    """Stores `text` compressed under its SHA-256 and returns the digest."""
+    data = text.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+    store.put_blob(digest, zlib.compress(data, SESSION_COMPRESSION_LEVEL))
+    return digest
 
-    session_data = {
-        "search_term": search_term,
-        "document_content_snippet": document_content[:10000] + "..." if len(document_content) > 10000 else document_content, # Truncate content
-        "highlighted_html": highlighted_html, # Store the full highlighted HTML
-        "timestamp": firestore.SERVER_TIMESTAMP # Use server timestamp
-    }
+@stage('storage')
+def _get_text(store: SessionStore, digest: str) -> str:
+    data = store.get_blob(digest)
+    if data is None:
+        raise Exception(f"Session content {digest} is missing from the session store.")
+    return zlib.decompress(data).decode('utf-8')
+
+@stage('storage')
+def save_session(search_term: str, document_content: str, highlighted_html: str) -> str:
+    """
+    Saves the current session state and returns a unique ID. The full document
+    and highlighted HTML are stored compressed and content-addressed, so sharing
+    the same document again only writes the small session record.
+    """
+    store = get_session_store()
+    session_id = str(uuid.uuid4())
 
     try:
-        db.collection("sessions").document(session_id).set(session_data)
-        print(f"Session '{session_id}' saved to Firestore.")
+        session_data = {
+            "format": SESSION_FORMAT,
+            "search_term": search_term,
+            "document_content_blob": _put_text(store, document_content),
+            "highlighted_html_blob": _put_text(store, highlighted_html),
+        }
+        store.put_session(session_id, session_data)
+        logger.info("Session '%s' saved to %s.", session_id, store.kind)
         return session_id
     except Exception as e:
-        print(f"Error saving session to Firestore: {e}")
+        logger.error("Error saving session to %s: %s", store.kind, e)
         raise Exception(f"Failed to save session: {e}")
 
 def load_session(session_id: str) -> dict | None:
     """
-    Loads a session state from Firestore given its ID.
+    Loads a session state given its ID, from memory if it was loaded recently.
+
+    Returns:
+        dict | None: 'search_term', 'document_content', 'highlighted_html' and
+                     'timestamp', or None if there is no such session.
     """
-    if not firebase_admin._apps:
-        print("Firebase Admin SDK not initialized. Cannot load session.")
-        return None
+    session = _session_cache.get(session_id)
+    if session is not None:
+        return session
 
+    store = get_session_store()
     try:
-        doc_ref = db.collection("sessions").document(session_id)
-        doc = doc_ref.get()
-        if doc.exists:
-            print(f"Session '{session_id}' loaded from Firestore.")
-            return doc.to_dict()
-        else:
-            print(f"Session '{session_id}' not found in Firestore.")
+        with stage('storage'):
+            record = store.get_session(session_id)
+        if record is None:
+            logger.info("Session '%s' not found in %s.", session_id, store.kind)
             return None
+        if record.get("format") != SESSION_FORMAT:
+            session = record  # Saved in the old layout, returned as stored
+        else:
+            session = {
+                "search_term": record["search_term"],
+                "document_content": _get_text(store, record["document_content_blob"]),
+                "highlighted_html": _get_text(store, record["highlighted_html_blob"]),
+                "timestamp": record.get("timestamp"),
+            }
     except Exception as e:
-        print(f"Error loading session from Firestore: {e}")
-        raise Exception(f"Failed to load session: {e}")
\ No newline at end of file
+        logger.error("Error loading session from %s: %s", store.kind, e)
+        raise Exception(f"Failed to load session: {e}")
+    _session_cache.put(session_id, session)
+    return session
+
+def get_session_cache_stats() -> dict:
+    """Returns hit/miss counters of the loaded-session cache."""
+    return _session_cache.stats()
+
+register_stats('session_cache', get_session_cache_stats)
@@ -0,0 +1,170 @@
+# smartdoc-insight/backend/app/services/session_store.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# Firestore documents are limited to 1 MiB, so larger blobs are split into parts
+_FIRESTORE_PART_BYTES = 900 * 1024
+
+logger = logging.getLogger(__name__)
+
+class SessionStore:
+    """
+    Storage of shared sessions and of the compressed, content-addressed blobs they
+    reference. Subclasses implement the four methods below.
+    """
+    kind = None
+
+    def put_session(self, session_id: str, record: dict):
+        raise NotImplementedError
+
+    def get_session(self, session_id: str) -> dict | None:
+        """Returns the stored record, or None if there is no session with this ID."""
+        raise NotImplementedError
+
+    def put_blob(self, digest: str, data: bytes):
+        """Stores `data` under `digest`, doing nothing if that digest is already stored."""
+        raise NotImplementedError
+
+    def get_blob(self, digest: str) -> bytes | None:
+        raise NotImplementedError
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions and blobs in a local SQLite file. Needs no credentials, so it serves
+    single-host deployments, offline development and tests (pass ':memory:').
+    The database runs in WAL mode, so worker processes on the host can share it.
+    """
+    kind = 'sqlite'
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, record TEXT NOT NULL, created REAL NOT NULL)'
+        )
+        self._connection.execute('CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, data BLOB NOT NULL)')
+
+    def put_session(self, session_id: str, record: dict):
+        record = dict(record, timestamp=time.time())
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO sessions (id, record, created) VALUES (?, ?, ?)',
+                (session_id, json.dumps(record), record['timestamp'])
+            )
+
+    def get_session(self, session_id: str) -> dict | None:
+        with self._lock:
+            row = self._connection.execute('SELECT record FROM sessions WHERE id = ?', (session_id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put_blob(self, digest: str, data: bytes):
+        with self._lock:
+            self._connection.execute('INSERT OR IGNORE INTO blobs (digest, data) VALUES (?, ?)', (digest, data))
+
+    def get_blob(self, digest: str) -> bytes | None:
+        with self._lock:
+            row = self._connection.execute('SELECT data FROM blobs WHERE digest = ?', (digest,)).fetchone()
+        return None if row is None else bytes(row[0])
+
+class FirestoreSessionStore(SessionStore):
+    """
+    Sessions in the Firestore 'sessions' collection and blobs in 'session_blobs'. The
+    Firebase Admin SDK is initialized on first use.
+
+    Args:
+        service_account_key_path (str): Path of the Firebase service account key file.
+    """
+    kind = 'firestore'
+
+    def __init__(self, service_account_key_path: str):
+        self.service_account_key_path = service_account_key_path
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._known_blobs = set()  # Digests this process has written or seen stored
+
+    def _get_db(self):
+        """
+        Returns the Firestore client, initializing the Firebase Admin SDK once.
+
+        Raises:
+            Exception: If Firebase could not be initialized.
+        """
+        with self._db_lock:
+            if self._db is not None:
+                return self._db
+            import firebase_admin
+            from firebase_admin import credentials, firestore
+
+            # Initialize Firebase Admin SDK (only once)
+            if not firebase_admin._apps:
+                try:
+                    cred = credentials.Certificate(self.service_account_key_path)
+                    firebase_admin.initialize_app(cred)
+                    logger.info("Firebase Admin SDK initialized successfully.")
+                except FileNotFoundError:
+                    logger.error("Firebase service account key not found at %s. Please ensure "
+                                 "'firebase_service_account.json' is in backend/app/.", self.service_account_key_path)
+                    raise Exception("Firebase Admin SDK not initialized.")
+                except Exception as e:
+                    logger.error("Error initializing Firebase Admin SDK: %s", e)
+                    raise Exception("Firebase Admin SDK not initialized.")
+            self._db = firestore.client()
+            return self._db
+
+    def put_session(self, session_id: str, record: dict):
+        from firebase_admin import firestore
+        record = dict(record, timestamp=firestore.SERVER_TIMESTAMP)  # Use server timestamp
+        self._get_db().collection("sessions").document(session_id).set(record)
+
+    def get_session(self, session_id: str) -> dict | None:
+        doc = self._get_db().collection("sessions").document(session_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def put_blob(self, digest: str, data: bytes):
+        if digest in self._known_blobs:
+            return
+        blob_ref = self._get_db().collection("session_blobs").document(digest)
+        if not blob_ref.get().exists:
+            parts = [data[i:i + _FIRESTORE_PART_BYTES] for i in range(0, len(data), _FIRESTORE_PART_BYTES)] or [b'']
+            if len(parts) == 1:
+                blob_ref.set({"data": parts[0], "size": len(data)})
+            else:
+                for i, part in enumerate(parts):
+                    blob_ref.collection("parts").document(str(i)).set({"data": part})
+                # Written last, so a blob is only visible once all of its parts are
+                blob_ref.set({"parts": len(parts), "size": len(data)})
+        self._known_blobs.add(digest)
+
+    def get_blob(self, digest: str) -> bytes | None:
+        blob_ref = self._get_db().collection("session_blobs").document(digest)
+        doc = blob_ref.get()
+        if not doc.exists:
+            return None
+        blob = doc.to_dict()
+        if 'data' in blob:
+            return bytes(blob['data'])
+        parts = [blob_ref.collection("parts").document(str(i)).get() for i in range(blob['parts'])]
+        return b''.join(bytes(part.to_dict()['data']) for part in parts)
+
+_SESSION_BACKENDS = {SQLiteSessionStore.kind: SQLiteSessionStore, FirestoreSessionStore.kind: FirestoreSessionStore}
+
+def create_session_store(backend: str, **options) -> SessionStore:
+    """
+    Creates a session store of the given backend ('sqlite' or 'firestore').
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend not in _SESSION_BACKENDS:
+        raise ValueError(f"Unknown session store backend: '{backend}'. Use one of {sorted(_SESSION_BACKENDS)}.")
+    return _SESSION_BACKENDS[backend](**options)
@@ -0,0 +1,251 @@
+# smartdoc-insight/backend/app/services/vector_index.py
+import numpy as np
+
+from .embedding_matrix import EmbeddingMatrix
+
+def _top_k(scores: np.ndarray, ids: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the k highest scores (descending) and their ids."""
+    if k <= 0 or len(scores) == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        part = np.argpartition(-scores, k - 1)[:k]
+        scores, ids = scores[part], ids[part]
+    order = np.argsort(-scores, kind='stable')
+    return scores[order], ids[order]
+
+def _above(scores: np.ndarray, ids: np.ndarray, threshold: float) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the scores >= threshold and their ids, ordered by id."""
+    keep = np.flatnonzero(scores >= threshold)
+    order = keep[np.argsort(ids[keep], kind='stable')]
+    return scores[order], ids[order]
+
+class VectorIndex:
+    """
+    Inner-product index over L2-normalized vectors, identified by insertion position.
+    Subclasses implement add() and _scored_candidates().
+    """
+    kind = None
+
+    def __init__(self, dim: int, dtype: str = 'float32'):
+        self.dim = dim
+        self._matrix = EmbeddingMatrix(dim, dtype)
+
+    def __len__(self) -> int:
+        return len(self._matrix)
+
+    @property
+    def _size(self) -> int:
+        return len(self._matrix)
+
+    @property
+    def dtype(self) -> str:
+        return self._matrix.dtype
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The stored vectors, dequantized to float32, one row per id."""
+        return self._matrix.to_float32()
+
+    @property
+    def nbytes(self) -> int:
+        """Heap memory used by the stored vectors (zero for spilled, memory-mapped rows)."""
+        return self._matrix.nbytes
+
+    def _append(self, vectors: np.ndarray) -> np.ndarray:
+        """Appends rows with amortized growth and returns their ids."""
+        return self._matrix.append(vectors)
+
+    def spill(self, directory: str | None = None):
+        """Moves the stored vectors to a memory-mapped file (see EmbeddingMatrix.spill())."""
+        self._matrix.spill(directory)
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        """Adds normalized vectors (one per row) and returns their ids."""
+        raise NotImplementedError
+
+    def _scored_candidates(self, query: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the scores and ids of the vectors a query has to consider."""
+        raise NotImplementedError
+
+    def search(self, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the (scores, ids) of the k most similar vectors, best first."""
+        return _top_k(*self._scored_candidates(query), k)
+
+    def range_search(self, query: np.ndarray, threshold: float) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the (scores, ids) of all vectors scoring >= threshold, in id order."""
+        return _above(*self._scored_candidates(query), threshold)
+
+    def query(self, query: np.ndarray, k: int, threshold: float):
+        """
+        Runs search() and range_search() from a single scoring pass.
+
+        Returns:
+            tuple: ((top_scores, top_ids), (range_scores, range_ids)).
+        """
+        scores, ids = self._scored_candidates(query)
+        return _top_k(scores, ids, k), _above(scores, ids, threshold)
+
+    def query_many(self, queries: np.ndarray, k: int, threshold: float) -> list:
+        """
+        Runs query() for several queries (one per row).
+
+        Returns:
+            list: One ((top_scores, top_ids), (range_scores, range_ids)) pair per query.
+        """
+        return [self.query(query, k, threshold) for query in np.asarray(queries, dtype=np.float32)]
+
+    def _state(self) -> dict:
+        return {}
+
+    def save(self, path: str):
+        """Writes the index to `path` (a .npz file), keeping the compact storage type."""
+        stored = {"vectors": self._matrix.data, "dtype": self.dtype}
+        if self._matrix.scales is not None:
+            stored["scales"] = self._matrix.scales
+        np.savez(path, kind=self.kind, dim=self.dim, **stored, **self._state())
+
+class ExactIndex(VectorIndex):
+    """Brute-force index: every query is one matrix-vector product over all vectors."""
+    kind = 'exact'
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        return self._append(vectors)
+
+    def _scored_candidates(self, query: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return self._matrix.dot(query), np.arange(self._size)
+
+    def query_many(self, queries: np.ndarray, k: int, threshold: float) -> list:
+        # Every query scores every vector, so all of them share one matrix-matrix product
+        scores = self._matrix.dot_many(queries)
+        ids = np.arange(self._size)
+        return [(_top_k(column, ids, k), _above(column, ids, threshold)) for column in np.ascontiguousarray(scores.T)]
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file ANN index: a query scores only the vectors of its `nprobe` closest
+    centroids. It answers exactly until `train_size` vectors have been added.
+
+    Args:
+        dim (int): Vector dimensionality.
+        nlist (int | None): Number of lists; defaults to ~sqrt(n) at training time.
+        nprobe (int): Number of lists scanned per query.
+        train_size (int): Number of vectors that triggers training.
+        seed (int): Random seed for k-means initialisation.
+        dtype (str): Storage type of the vectors ('float32', 'float16' or 'int8').
+    """
+    kind = 'ivf'
+
+    def __init__(self, dim: int, nlist: int | None = None, nprobe: int = 8, train_size: int = 10000, seed: int = 0,
+                 dtype: str = 'float32'):
+        super().__init__(dim, dtype)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.seed = seed
+        self.centroids = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._lists = None  # list id -> array of vector ids, rebuilt after adds
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def nbytes(self) -> int:
+        centroid_bytes = 0 if self.centroids is None else self.centroids.nbytes
+        return self._matrix.nbytes + self._assignments.nbytes + centroid_bytes
+
+    def train(self, iterations: int = 10):
+        """Fits the centroids with spherical k-means on (a sample of) the stored vectors."""
+        size = self._size
+        nlist = self.nlist or max(1, int(np.sqrt(size)))
+        nlist = min(nlist, size)
+        rng = np.random.default_rng(self.seed)
+        sample = self._matrix.to_float32(rng.choice(size, size=min(size, nlist * 64), replace=False))
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=nlist) == 0
+            sums[empty] = centroids[empty]  # Keep empty clusters where they were
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+        self.nlist = nlist
+        self.centroids = centroids.astype(np.float32)
+        # Dequantize the stored vectors chunk by chunk rather than all at once
+        chunk_size = 65536
+        self._assignments = np.concatenate([
+            self._assign(self._matrix.to_float32(slice(i, i + chunk_size))) for i in range(0, size, chunk_size)
+        ])
+        self._lists = None
+
+    def _assign(self, vectors: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        labels = [np.argmax(vectors[i:i + chunk_size] @ self.centroids.T, axis=1)
+                  for i in range(0, len(vectors), chunk_size)]
+        return np.concatenate(labels).astype(np.int32) if labels else np.zeros(0, dtype=np.int32)
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        ids = self._append(vectors)
+        if self.is_trained:
+            if len(ids):
+                self._assignments = np.concatenate([self._assignments, self._assign(vectors)])
+                self._lists = None
+        elif self._size >= self.train_size:
+            self.train()
+        return ids
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        if self._lists is None:
+            order = np.argsort(self._assignments, kind='stable')
+            bounds = np.searchsorted(self._assignments[order], np.arange(self.nlist + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(self.nlist)]
+        nprobe = min(self.nprobe, self.nlist)
+        probed = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self._lists[i] for i in probed])
+
+    def _scored_candidates(self, query: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        query = np.asarray(query, dtype=np.float32)
+        if not self.is_trained:
+            return self._matrix.dot(query), np.arange(self._size)
+        ids = self._candidates(query)
+        return self._matrix.dot(query, ids), ids
+
+    def _state(self) -> dict:
+        state = {"nprobe": self.nprobe, "train_size": self.train_size, "seed": self.seed}
+        if self.is_trained:
+            state.update(nlist=self.nlist, centroids=self.centroids, assignments=self._assignments)
+        return state
+
+_INDEX_BACKENDS = {ExactIndex.kind: ExactIndex, IVFIndex.kind: IVFIndex}
+
+def create_index(backend: str, dim: int, **options) -> VectorIndex:
+    """
+    Creates an empty index of the given backend ('exact' or 'ivf').
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend not in _INDEX_BACKENDS:
+        raise ValueError(f"Unknown vector index backend: '{backend}'. Use one of {sorted(_INDEX_BACKENDS)}.")
+    return _INDEX_BACKENDS[backend](dim, **options)
+
+def load_index(path: str) -> VectorIndex:
+    """Loads an index written by VectorIndex.save()."""
+    with np.load(path, allow_pickle=False) as data:
+        kind = str(data['kind'])
+        dim = int(data['dim'])
+        dtype = str(data['dtype']) if 'dtype' in data else 'float32'
+        if kind == IVFIndex.kind:
+            index = IVFIndex(dim, nprobe=int(data['nprobe']), train_size=int(data['train_size']), seed=int(data['seed']),
+                             dtype=dtype)
+        else:
+            index = create_index(kind, dim, dtype=dtype)
+        index._matrix.load_rows(data['vectors'], data['scales'] if 'scales' in data else None)
+        if kind == IVFIndex.kind and 'centroids' in data:
+            index.nlist = int(data['nlist'])
+            index.centroids = data['centroids']
+            index._assignments = data['assignments']
+    return index
@@ -0,0 +1,47 @@
+# smartdoc-insight/backend/app/startup.py
+from contextlib import contextmanager
+import time
+
+# (phase, seconds) in the order the phases ran in this process
+_boot_phases = []
+
+@contextmanager
+def boot_phase(name: str):
+    """Times a startup phase and records it in the startup report."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _boot_phases.append((name, time.perf_counter() - start))
+
+def warm_up(load_model: bool = False):
+    """
+    Loads heavy dependencies ahead of the first request: checks the NLTK data,
+    loads WordNet and the stop word list, and optionally the Sentence-BERT model.
+
+    Args:
+        load_model (bool): Also load the Sentence-BERT model (imports torch).
+    """
+    from .services import nlp_service
+
+    with boot_phase('nltk data check'):
+        nlp_service.ensure_nltk_data()
+    with boot_phase('wordnet + stopwords'):
+        nlp_service.load_wordnet()
+    if load_model:
+        with boot_phase('sentence-bert model'):
+            nlp_service._load_sentence_bert_model()
+
+def get_startup_report() -> dict:
+    """Returns the recorded startup phases and their total duration in seconds."""
+    return {
+        "phases": [{"phase": name, "seconds": round(seconds, 3)} for name, seconds in _boot_phases],
+        "total_seconds": round(sum(seconds for _, seconds in _boot_phases), 3),
+    }
+
+def print_startup_report():
+    """Prints where boot time went, slowest phase first."""
+    report = get_startup_report()
+    print(f"Startup report ({report['total_seconds']:.2f}s):")
+    for name, seconds in sorted(_boot_phases, key=lambda phase: phase[1], reverse=True):
+        print(f"  {seconds:7.3f}s  {name}")
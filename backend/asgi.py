@@ -0,0 +1,14 @@
+# smartdoc-insight/backend/asgi.py
+from dotenv import load_dotenv
+
+# Load environment variables before app.config reads them
+load_dotenv()
+
+from app.asgi_app import create_asgi_app
+
+app = create_asgi_app()
+
+# This file is used by ASGI servers (e.g., uvicorn) to run the FastAPI variant of the app.
+# Handlers are non-blocking, so a single worker process serves many concurrent connections;
+# blocking work is bounded by ASGI_CPU_WORKERS and ASGI_IO_WORKERS (see app/config.py).
+# Example uvicorn command: uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 2
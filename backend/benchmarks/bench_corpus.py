@@ -0,0 +1,109 @@
+# smartdoc-insight/backend/benchmarks/bench_corpus.py
+"""
+Corpus index: indexing throughput, index size and query latency per search mode,
+on synthetic documents. Exits with status 1 if any mode's p95 exceeds --target-ms.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_corpus
+    python -m benchmarks.bench_corpus --documents 100000 --words-per-document 300
+"""
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic_documents import DOMAIN_WORDS
+
+def _make_vocabulary(rng: random.Random, size: int) -> tuple[list[str], list[float]]:
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    vocabulary = list(dict.fromkeys(''.join(rng.choice(letters) for _ in range(rng.randint(2, 10))) for _ in range(size)))
+    vocabulary[100:100] = DOMAIN_WORDS
+    # Zipf's law: the k-th most frequent word occurs with probability proportional to 1/k
+    return vocabulary, list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+def _make_document(rng: random.Random, vocabulary: list[str], cumulative: list[float], words: int) -> str:
+    return ' '.join(rng.choices(vocabulary, cum_weights=cumulative, k=words)).capitalize() + '.'
+
+def _queries(rng: random.Random, vocabulary: list[str], samples: list[str], count: int) -> list[str]:
+    """
+    Two-word queries: half pair a frequent or domain word with a medium or rare one,
+    half are consecutive words of indexed documents (so phrase queries find something).
+    """
+    head, middle, tail = vocabulary[:200], vocabulary[200:5000], vocabulary[5000:]
+    queries = []
+    for i in range(count):
+        if i % 2:
+            words = rng.choice(samples).lower().split()
+            start = rng.randrange(len(words) - 1)
+            queries.append(' '.join(words[start:start + 2]).rstrip('.'))
+        else:
+            queries.append(f"{rng.choice(rng.choice([head, DOMAIN_WORDS]))} {rng.choice(rng.choice([middle, tail]))}")
+    return queries
+
+def _directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=20000)
+    parser.add_argument('--words-per-document', type=int, default=300)
+    parser.add_argument('--vocabulary', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=200, help='Timed queries per mode')
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--target-ms', type=float, default=10.0, help='Required p95 latency per mode')
+    args = parser.parse_args()
+
+    from app.services.corpus_index import SEARCH_MODES, CorpusIndex
+
+    rng = random.Random(0)
+    vocabulary, cumulative = _make_vocabulary(rng, args.vocabulary)
+    with tempfile.TemporaryDirectory(prefix='smartdoc_corpus_') as directory:
+        index = CorpusIndex(directory, flush_interval=0)
+        start = time.perf_counter()
+        generation_seconds = 0.0
+        samples = []
+        for i in range(args.documents):
+            generated = time.perf_counter()
+            text = _make_document(rng, vocabulary, cumulative, args.words_per_document)
+            generation_seconds += time.perf_counter() - generated
+            if i % 100 == 0:
+                samples.append(text)
+            index.add(f"doc{i:07d}", text, f"doc{i}.txt")
+        index.flush()
+        while index.merge():
+            pass
+        seconds = time.perf_counter() - start - generation_seconds
+        stats = index.stats()
+        words = args.documents * args.words_per_document
+        print(f"indexed {args.documents:,} documents ({words:,} words) in {seconds:.1f}s: "
+              f"{args.documents / seconds:,.0f} documents/s, {words / seconds:,.0f} words/s")
+        print(f"{stats['segments']} segments, {stats['merges']} merges, "
+              f"{_directory_size(directory) / (1024 * 1024):.1f} MB on disk")
+
+        # A fresh instance opens the index from disk, as another worker process would
+        index = CorpusIndex(directory, flush_interval=0)
+        queries = _queries(rng, vocabulary, samples, args.queries)
+        worst = 0.0
+        print(f"{'mode':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'hits':>9}")
+        for mode in SEARCH_MODES:
+            index.search(queries[0], mode=mode, limit=args.limit)  # Page in the memory maps
+            timings, hits = [], 0
+            for query in queries:
+                started = time.perf_counter()
+                result = index.search(query, mode=mode, limit=args.limit)
+                timings.append((time.perf_counter() - started) * 1000)
+                hits += result['total']
+            p95 = float(np.percentile(timings, 95))
+            worst = max(worst, p95)
+            print(f"{mode:>8} {np.percentile(timings, 50):>8.2f} {p95:>8.2f} {max(timings):>8.2f} {hits / len(queries):>9,.0f}")
+
+    print(f"target p95 <= {args.target_ms} ms: {'met' if worst <= args.target_ms else 'NOT met'}")
+    if worst > args.target_ms:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
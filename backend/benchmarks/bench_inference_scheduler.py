@@ -0,0 +1,77 @@
+# smartdoc-insight/backend/benchmarks/bench_inference_scheduler.py
+"""
+Throughput of concurrent encode requests with and without the inference scheduler,
+against a stub model with a fixed cost per call.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_inference_scheduler
+    python -m benchmarks.bench_inference_scheduler --clients 8 32 128 --max-wait-ms 2 5 10
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from app.services.inference_scheduler import InferenceScheduler
+
+class _StubModel:
+    def __init__(self, call_overhead: float, per_text: float, dim: int = 384):
+        self.call_overhead = call_overhead
+        self.per_text = per_text
+        self.dim = dim
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        with self._lock:
+            self.calls += 1
+            time.sleep(self.call_overhead + self.per_text * len(texts))
+            return np.zeros((len(texts), self.dim), dtype=np.float32)
+
+def _run_clients(encode, clients: int, words: int, shared: int) -> tuple[float, list[float]]:
+    latencies = []
+
+    def client(i):
+        texts = [f"word{i}_{j}" for j in range(words)] + [f"shared{j}" for j in range(shared)]
+        start = time.perf_counter()
+        encode(texts)
+        latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--words', type=int, default=20, help='Un-cached words per request')
+    parser.add_argument('--shared', type=int, default=5, help='Words every request has in common')
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, nargs='+', default=[5])
+    parser.add_argument('--call-overhead-ms', type=float, default=10)
+    parser.add_argument('--per-text-ms', type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{'clients':>7} {'mode':>12} {'wall s':>7} {'calls':>6} {'p50 ms':>8} {'p95 ms':>8} {'fill':>5} {'dedup':>6}")
+    for clients in args.clients:
+        model = _StubModel(args.call_overhead_ms / 1000, args.per_text_ms / 1000)
+        wall, latencies = _run_clients(model.encode, clients, args.words, args.shared)
+        print(f"{clients:>7} {'direct':>12} {wall:>7.2f} {model.calls:>6} "
+              f"{np.percentile(latencies, 50) * 1000:>8.1f} {np.percentile(latencies, 95) * 1000:>8.1f} {'-':>5} {'-':>6}")
+        for max_wait_ms in args.max_wait_ms:
+            model = _StubModel(args.call_overhead_ms / 1000, args.per_text_ms / 1000)
+            scheduler = InferenceScheduler(model.encode, max_batch_size=args.max_batch_size,
+                                           max_wait_seconds=max_wait_ms / 1000)
+            wall, latencies = _run_clients(scheduler.encode, clients, args.words, args.shared)
+            stats = scheduler.stats()
+            print(f"{clients:>7} {'sched/' + f'{max_wait_ms:g}ms':>12} {wall:>7.2f} {model.calls:>6} "
+                  f"{np.percentile(latencies, 50) * 1000:>8.1f} {np.percentile(latencies, 95) * 1000:>8.1f} "
+                  f"{stats['batch_fill_ratio']:>5.2f} {stats['dedup_ratio']:>6.2f}")
+
+if __name__ == '__main__':
+    main()
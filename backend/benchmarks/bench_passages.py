@@ -0,0 +1,67 @@
+# smartdoc-insight/backend/benchmarks/bench_passages.py
+"""
+Passage search: one-off indexing cost per document and query latency. Uses the stub
+model unless --real-model is given.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_passages
+    python -m benchmarks.bench_passages --pages 500 --queries 500
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--count', type=int, default=5, help='Passages returned per query')
+    parser.add_argument('--real-model', action='store_true', help='Use Sentence-BERT instead of the stub model')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='smartdoc_bench_passages_')
+    if not args.real_model:
+        from benchmarks.stub_model import STUB_MODEL_NAME
+        os.environ['SENTENCE_BERT_MODEL'] = STUB_MODEL_NAME
+    os.environ['EMBEDDING_CACHE_DIR'] = ''
+    os.environ['PARSE_CACHE_PATH'] = os.path.join(work_dir, 'parse_cache.sqlite3')
+
+    from benchmarks.synthetic_documents import DOMAIN_WORDS, make_text
+    if not args.real_model:
+        from benchmarks.stub_model import install_stub_model
+        install_stub_model()
+    from app.services.document_store import register_document, ensure_passages, search_document_passages
+    from app.services.nlp_service import encode_texts
+
+    text = make_text(args.pages)
+    record = register_document(text)
+    started = time.perf_counter()
+    ensure_passages(record)
+    seconds = time.perf_counter() - started
+    print(f"{args.pages} pages ({len(text):,} characters): {len(record.passages):,} passages "
+          f"split, embedded and indexed in {seconds:.2f}s, {record.passage_index.nbytes / 1024:.0f} KiB of vectors")
+
+    # A second worker (or the same one after eviction) reads them from the parse cache
+    reloaded = register_document(text)
+    reloaded.passages = reloaded.passage_index = None
+    started = time.perf_counter()
+    ensure_passages(reloaded)
+    print(f"reloaded from the parse cache in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    rng = random.Random(0)
+    queries = [' '.join(rng.sample(DOMAIN_WORDS, rng.randint(1, 3))) for _ in range(args.queries)]
+    encode_texts(list(dict.fromkeys(queries)))  # Query embeddings are cached like any search term's
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        search_document_passages(record, [query], args.count)
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"query latency (cached query embedding): p50 {np.percentile(timings, 50):.2f} ms, "
+          f"p95 {np.percentile(timings, 95):.2f} ms, max {max(timings):.2f} ms")
+
+if __name__ == '__main__':
+    main()
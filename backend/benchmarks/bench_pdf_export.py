@@ -0,0 +1,93 @@
+# smartdoc-insight/backend/benchmarks/bench_pdf_export.py
+"""
+PDF export: xhtml2pdf from HTML against reportlab from text and spans, for documents
+of several sizes, each render in a fresh process.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_pdf_export
+    python -m benchmarks.bench_pdf_export --pages 10 100 --skip-html
+"""
+import argparse
+import html
+import multiprocessing
+import random
+import re
+import resource
+import time
+
+# Roughly one A4 page of 11pt text with the export's margins
+WORDS_PER_PAGE = 550
+
+def _make_document(pages: int) -> tuple[str, list[str], list[str]]:
+    rng = random.Random(pages)
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 10))) for _ in range(5000)]
+    paragraphs, words = [], 0
+    while words < pages * WORDS_PER_PAGE:
+        length = rng.randint(30, 120)
+        paragraphs.append(' '.join(rng.choice(vocabulary) for _ in range(length)).capitalize() + '.')
+        words += length
+    # Ten exact and ten semantic terms drawn from the vocabulary: ~0.4% of words each
+    return '\n\n'.join(paragraphs), vocabulary[:10], vocabulary[10:20]
+
+def _highlighted_html(text: str, spans) -> str:
+    classes = ('bg-yellow-300', 'bg-green-300')
+    parts, cursor = [], 0
+    for start, end, kind in spans.tolist():
+        parts.append(html.escape(text[cursor:start]))
+        parts.append(f'<span class="rounded-md px-1 {classes[kind]}">{html.escape(text[start:end])}</span>')
+        cursor = end
+    parts.append(html.escape(text[cursor:]))
+    return ''.join(parts)
+
+def _count_pages(pdf_bytes: bytes) -> int:
+    return len(re.findall(rb'/Type\s*/Page\b(?!s)', pdf_bytes))
+
+def _measure(mode: str, pages: int) -> dict:
+    """Runs in a child process: one export (two for 'cached'), timed, with peak RSS growth."""
+    from app.services import pdf_generator
+    from app.services.highlighter import HIGHLIGHT_KINDS, compute_highlights
+    import reportlab.pdfgen.canvas  # noqa: F401  (import cost excluded from the measurement)
+    import xhtml2pdf.pisa  # noqa: F401
+
+    text, exact_terms, semantic_terms = _make_document(pages)
+    spans = compute_highlights(text, exact_terms, semantic_terms)
+    payload = _highlighted_html(text, spans) if mode == 'html' else spans.tolist()
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if mode == 'html':
+        pdf_bytes = pdf_generator.generate_highlighted_pdf(payload)
+    else:
+        pdf_bytes = pdf_generator.get_highlighted_pdf('bench', text, payload, list(HIGHLIGHT_KINDS))
+    seconds = time.perf_counter() - start
+    peak_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_kb) / 1024
+
+    cached = None
+    if mode == 'text':
+        start = time.perf_counter()
+        pdf_generator.get_highlighted_pdf('bench', text, payload, list(HIGHLIGHT_KINDS))
+        cached = time.perf_counter() - start
+    return {
+        "seconds": seconds, "peak_mb": peak_mb, "cached": cached, "bytes": len(pdf_bytes),
+        "pdf_pages": _count_pages(pdf_bytes), "spans": len(spans), "request_kb": len(str(payload)) / 1024,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--skip-html', action='store_true', help='Only measure the text renderer (xhtml2pdf is slow on large documents)')
+    args = parser.parse_args()
+
+    modes = ['text'] if args.skip_html else ['html', 'text']
+    context = multiprocessing.get_context('spawn')
+    print(f"{'pages':>5} {'path':>5} {'render s':>9} {'cached s':>9} {'peak MB':>8} {'pdf pages':>9} {'pdf KB':>8} {'request KB':>10}")
+    for pages in args.pages:
+        for mode in modes:
+            with context.Pool(1) as pool:
+                result = pool.apply(_measure, (mode, pages))
+            cached = '-' if result['cached'] is None else f"{result['cached']:.4f}"
+            print(f"{pages:>5} {mode:>5} {result['seconds']:>9.2f} {cached:>9} {result['peak_mb']:>8.1f} "
+                  f"{result['pdf_pages']:>9} {result['bytes'] / 1024:>8.0f} {result['request_kb']:>10.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+# smartdoc-insight/backend/benchmarks/bench_pipeline.py
+"""
+Offline benchmark suite for the parse -> search -> export -> share pipeline.
+
+Times each stage (see STAGES) on synthetic documents of several sizes, in a fresh
+process each, and reports pages per second, p50/p95 latency and peak RSS. With
+--compare the exit status is 1 if a stage's p50 regressed beyond --threshold.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_pipeline --output baseline.json
+    python -m benchmarks.bench_pipeline --pages 1 10 --stages parse_pdf export_pdf_text
+    python -m benchmarks.bench_pipeline --compare baseline.json --output current.json
+"""
+import argparse
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+STAGES = [
+    'parse_docx', 'parse_pdf', 'preprocess_text', 'semantic_matches', 'suggested_words',
+    'export_pdf_html', 'export_pdf_text', 'session_save', 'session_load',
+]
+SEARCH_TERM = 'payment'
+RESULTS_VERSION = 1
+
+def _configure_environment(use_stub: bool, work_dir: str):
+    """Points the app's configuration at throwaway local state. Runs before the app is imported."""
+    if use_stub:
+        from benchmarks.stub_model import STUB_MODEL_NAME
+        os.environ['SENTENCE_BERT_MODEL'] = STUB_MODEL_NAME
+    os.environ['EMBEDDING_CACHE_DIR'] = ''  # Memory tier only: every process starts cold
+    os.environ['SESSION_STORE_BACKEND'] = 'sqlite'
+    os.environ['SESSION_SQLITE_PATH'] = os.path.join(work_dir, 'sessions.sqlite3')
+    os.environ['WARMUP_ON_START'] = '0'
+
+def _prepare(stage: str, pages: int):
+    """
+    Builds the input of a stage and returns a function running it once (given the
+    run number). Input generation and imports happen here, outside the timings.
+    """
+    from benchmarks import synthetic_documents
+
+    if stage in ('parse_docx', 'parse_pdf'):
+        from app.services.document_parser import parse_document
+        extension = stage.split('_')[1]
+        data = getattr(synthetic_documents, f'make_{extension}')(pages)
+        return lambda run: parse_document(io.BytesIO(data), f'bench.{extension}')
+
+    text = synthetic_documents.make_text(pages)
+    if stage == 'preprocess_text':
+        from app.services.nlp_service import preprocess_text
+        return lambda run: preprocess_text(text)
+    if stage == 'semantic_matches':
+        from app.services.nlp_service import get_semantic_matches
+        return lambda run: get_semantic_matches(text, SEARCH_TERM)
+    if stage == 'suggested_words':
+        from app.services.nlp_service import get_suggested_words
+        return lambda run: get_suggested_words(SEARCH_TERM, text)
+
+    if stage in ('export_pdf_html', 'export_pdf_text'):
+        import html
+        from app.services import pdf_generator
+        from app.services.highlighter import HIGHLIGHT_KINDS, compute_highlights
+
+        exact_terms = synthetic_documents.DOMAIN_WORDS[:5]
+        semantic_terms = synthetic_documents.DOMAIN_WORDS[5:10]
+        spans = compute_highlights(text, exact_terms, semantic_terms)
+        if stage == 'export_pdf_text':
+            import reportlab.pdfgen.canvas  # noqa: F401  (import cost excluded)
+            return lambda run: pdf_generator.render_highlighted_pdf(text, spans, list(HIGHLIGHT_KINDS))
+        import xhtml2pdf.pisa  # noqa: F401
+        classes = ('bg-yellow-300', 'bg-green-300')
+        parts, cursor = [], 0
+        for start, end, kind in spans.tolist():
+            parts.append(html.escape(text[cursor:start]))
+            parts.append(f'<span class="rounded-md px-1 {classes[kind]}">{html.escape(text[start:end])}</span>')
+            cursor = end
+        parts.append(html.escape(text[cursor:]))
+        highlighted_html = ''.join(parts)
+        return lambda run: pdf_generator.generate_highlighted_pdf(highlighted_html)
+
+    if stage in ('session_save', 'session_load'):
+        from app.services import session_manager
+        session_manager.get_session_store()  # Create the SQLite file outside the timings
+        highlighted_html = f'<p>{text}</p>'
+        if stage == 'session_save':
+            # A new document per run, as content-addressed storage skips repeated ones
+            return lambda run: session_manager.save_session(SEARCH_TERM, f'{text}\n{run}', highlighted_html)
+        session_id = session_manager.save_session(SEARCH_TERM, text, highlighted_html)
+
+        def load(run):
+            session_manager.set_session_store(session_manager.get_session_store())  # Clears the memory cache
+            return session_manager.load_session(session_id)
+        return load
+
+    raise ValueError(f"Unknown stage: '{stage}'. Use one of {STAGES}.")
+
+def _percentile(values: list[float], q: float) -> float:
+    import numpy as np
+    return float(np.percentile(values, q))
+
+def _measure(stage: str, pages: int, repeat: int, use_stub: bool) -> dict:
+    """Runs in a child process: prepares the stage, then times `repeat` runs of it."""
+    with tempfile.TemporaryDirectory(prefix='smartdoc_bench_') as work_dir:
+        _configure_environment(use_stub, work_dir)
+        import contextlib
+        if use_stub:
+            from benchmarks.stub_model import install_stub_model
+            install_stub_model()
+
+        result = {"stage": stage, "pages": pages, "repeat": repeat}
+        try:
+            # The app logs every session save and load; keep the report readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_once = _prepare(stage, pages)
+                baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                timings = []
+                for run in range(repeat):
+                    start = time.perf_counter()
+                    run_once(run)
+                    timings.append(time.perf_counter() - start)
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {' '.join(str(e).replace('*', '').split())[:160]}"
+            return result
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    warm = timings[1:] or timings
+    result.update({
+        "cold_ms": timings[0] * 1000,
+        "p50_ms": _percentile(warm, 50) * 1000,
+        "p95_ms": _percentile(warm, 95) * 1000,
+        "mean_ms": sum(warm) / len(warm) * 1000,
+        "pages_per_second": pages * len(timings) / sum(timings),
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        "peak_rss_mb": peak_kb / (1024 * 1024 if sys.platform == 'darwin' else 1024),
+        "peak_rss_growth_mb": (peak_kb - baseline_kb) / (1024 * 1024 if sys.platform == 'darwin' else 1024),
+    })
+    return result
+
+def _environment() -> dict:
+    import numpy as np
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+def _compare(results: list[dict], baseline_path: str, threshold: float) -> list[str]:
+    """Prints each stage's p50 against a baseline run and returns the regressed stages."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['stage'], r['pages']): r for r in json.load(f)['results'] if 'p50_ms' in r}
+    regressions = []
+    print(f"\nCompared with {baseline_path} (regression: p50 > x{threshold:.2f})")
+    for result in results:
+        before = baseline.get((result['stage'], result['pages']))
+        if before is None or 'p50_ms' not in result:
+            continue
+        ratio = result['p50_ms'] / before['p50_ms'] if before['p50_ms'] else float('inf')
+        regressed = ratio > threshold
+        if regressed:
+            regressions.append(f"{result['stage']}@{result['pages']}")
+        print(f"{result['stage']:>16} {result['pages']:>5}  {before['p50_ms']:>9.1f} -> {result['p50_ms']:>9.1f} ms"
+              f"  x{ratio:.2f}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 50], help='Document sizes in pages')
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per stage and size')
+    parser.add_argument('--real-model', action='store_true', help='Use Sentence-BERT instead of the stub model')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=1.2, help='p50 ratio counted as a regression')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    print(f"{'stage':>16} {'pages':>5} {'cold ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'pages/s':>9} {'peak MB':>8} {'+MB':>7}")
+    for pages in args.pages:
+        for stage in args.stages:
+            with context.Pool(1) as pool:
+                result = pool.apply(_measure, (stage, pages, args.repeat, not args.real_model))
+            results.append(result)
+            if 'error' in result:
+                print(f"{stage:>16} {pages:>5}  skipped: {result['error']}")
+                continue
+            print(f"{stage:>16} {pages:>5} {result['cold_ms']:>9.1f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+                  f"{result['pages_per_second']:>9.1f} {result['peak_rss_mb']:>8.1f} {result['peak_rss_growth_mb']:>7.1f}")
+
+    report = {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        "environment": _environment(),
+        "config": {"pages": args.pages, "repeat": args.repeat, "model": 'sentence-bert' if args.real_model else 'stub'},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare and _compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
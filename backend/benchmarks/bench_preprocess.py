@@ -0,0 +1,76 @@
+# smartdoc-insight/backend/benchmarks/bench_preprocess.py
+"""
+Preprocessing throughput in tokens per second, with and without the lemma memo and
+worker processes. Exits with status 1 below --target tokens per second.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_preprocess
+    python -m benchmarks.bench_preprocess --texts 2000 --words-per-text 500 --workers 0 4
+"""
+import argparse
+import random
+import time
+
+from app.services import nlp_service
+
+def _make_corpus(num_texts: int, words_per_text: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    lemmas = sorted({name.lower() for name in nlp_service._get_wordnet().all_lemma_names() if name.isalpha()})
+    rng.shuffle(lemmas)
+    vocabulary = lemmas[:20000] + ['the', 'of', 'and', 'to', 'in', 'is', 'was', 'for', 'with', 'as']
+    # Zipf's law: the k-th most frequent word occurs with probability proportional to 1/k
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    texts = []
+    for _ in range(num_texts):
+        words = rng.choices(vocabulary, weights=weights, k=words_per_text)
+        texts.append(' '.join(words).capitalize() + '.')
+    return texts
+
+def _legacy_preprocess(text: str) -> list[str]:
+    """The pre-memoization implementation: lemmatize() on every token."""
+    tokens = nlp_service.word_tokenize(text.lower())
+    stop_words = nlp_service._get_stop_words()
+    lemmatizer = nlp_service._get_lemmatizer()
+    return [lemmatizer.lemmatize(word) for word in tokens if word.isalnum() and word not in stop_words]
+
+def _timed(label: str, run, tokens: int) -> float:
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    print(f"{label:<28} {seconds:8.2f}s {tokens / seconds:12,.0f} tokens/s")
+    return tokens / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--texts', type=int, default=1000)
+    parser.add_argument('--words-per-text', type=int, default=500)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 4], help='Worker processes (0: calling thread)')
+    parser.add_argument('--target', type=float, default=100000, help='Required tokens per second (memoized, best run)')
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    texts = _make_corpus(args.texts, args.words_per_text)
+    nlp_service.preprocess_text('warm up the tokenizer, stop words and lemmatizer')
+    nlp_service._lemmas.clear()
+    tokens = sum(len(nlp_service.word_tokenize(text.lower())) for text in texts)
+    print(f"{len(texts)} texts, {tokens:,} tokens")
+
+    if not args.skip_legacy:
+        _timed('per-token lemmatize', lambda: [_legacy_preprocess(text) for text in texts], tokens)
+
+    best = 0.0
+    for workers in args.workers:
+        nlp_service._lemmas.clear()  # Every run starts with an empty memo
+        label = 'memoized' if workers == 0 else f'memoized, {workers} processes'
+        if workers:
+            # Start the pool (and let the workers import NLTK) outside the timing
+            list(nlp_service.preprocess_texts(texts[:workers], workers=workers, chunk_size=1))
+        best = max(best, _timed(label, lambda: list(nlp_service.preprocess_texts(texts, workers=workers)), tokens))
+    print(f"lemma memo: {len(nlp_service._lemmas):,} words")
+
+    print(f"target {args.target:,.0f} tokens/s: {'met' if best >= args.target else 'NOT met'}")
+    if best < args.target:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
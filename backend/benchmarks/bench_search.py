@@ -0,0 +1,78 @@
+# smartdoc-insight/backend/benchmarks/bench_search.py
+"""
+Before/after timing for the /search analysis step: the per-word loop against the
+batched analyze_search_term() pass.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_search --words 6000 --batch-size 256
+    python -m benchmarks.bench_search --file contract.txt --term payment
+"""
+import argparse
+import random
+import time
+
+from nltk.tokenize import word_tokenize
+
+from app.services import nlp_service
+from app.services.similarity_calculator import calculate_cosine_similarity
+
+def _synthetic_document(num_words: int, seed: int = 0) -> str:
+    """Builds a document with roughly `num_words` unique pseudo-words."""
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    vocabulary = {''.join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(num_words)}
+    vocabulary.update(['payment', 'agreement', 'invoice', 'fee', 'term', 'contract'])
+    words = list(vocabulary) * 2
+    rng.shuffle(words)
+    return ' '.join(words)
+
+def _legacy_search(document_text: str, search_term: str, num_suggestions: int = 5):
+    """The pre-batching implementation: two per-word encode loops."""
+    model = nlp_service._load_sentence_bert_model()
+
+    def scored_words():
+        words = list(set(w for w in word_tokenize(document_text.lower()) if w.isalnum() and len(w) > 1))
+        search_embedding = model.encode(search_term)
+        for word in words:
+            if word == search_term.lower():
+                continue
+            yield word, calculate_cosine_similarity(search_embedding, model.encode(word))
+
+    matches = [word for word, sim in scored_words() if sim >= 0.4]
+    suggestions = sorted(((w, s) for w, s in scored_words() if s >= 0.25), key=lambda x: x[1], reverse=True)
+    return matches, [w for w, _ in suggestions[:num_suggestions]]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file', help='Plain-text document to search (default: synthetic document)')
+    parser.add_argument('--words', type=int, default=6000, help='Unique words in the synthetic document')
+    parser.add_argument('--term', default='payment', help='Search term')
+    parser.add_argument('--batch-size', type=int, default=nlp_service.ENCODE_BATCH_SIZE)
+    parser.add_argument('--skip-legacy', action='store_true', help='Only time the batched path')
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            document_text = f.read()
+    else:
+        document_text = _synthetic_document(args.words)
+
+    vocabulary_size = len(nlp_service.extract_vocabulary(document_text))
+    nlp_service._load_sentence_bert_model()  # Exclude model loading from both timings
+    print(f"Document vocabulary: {vocabulary_size} unique words, search term '{args.term}'")
+
+    start = time.perf_counter()
+    matches, suggestions = nlp_service.analyze_search_term(document_text, args.term, batch_size=args.batch_size)
+    batched_seconds = time.perf_counter() - start
+    print(f"batched (batch_size={args.batch_size}): {batched_seconds:.3f}s")
+
+    if not args.skip_legacy:
+        start = time.perf_counter()
+        legacy_matches, legacy_suggestions = _legacy_search(document_text, args.term)
+        legacy_seconds = time.perf_counter() - start
+        print(f"legacy per-word loop: {legacy_seconds:.3f}s  (speedup x{legacy_seconds / batched_seconds:.1f})")
+        print(f"same semantic matches: {set(matches) == set(legacy_matches)}; "
+              f"same suggestions: {suggestions == legacy_suggestions}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# smartdoc-insight/backend/benchmarks/bench_vector_index.py
+"""
+Recall@k and latency of the IVF vector index against the exact index, on clustered
+synthetic vectors.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_vector_index
+    python -m benchmarks.bench_vector_index --sizes 10000 100000 1000000 --dim 384 --nprobe 8 16
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.vector_index import ExactIndex, IVFIndex
+
+def _synthetic_vectors(n: int, dim: int, rng: np.random.Generator, clusters: int = 1000) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100000):
+        stop = min(n, start + 100000)
+        labels = rng.integers(0, clusters, stop - start)
+        vectors[start:stop] = centers[labels] + 0.6 * rng.standard_normal((stop - start, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def _time_queries(index, queries: np.ndarray, k: int) -> tuple[list[np.ndarray], float, float]:
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query, k)
+        latencies.append(time.perf_counter() - start)
+        results.append(ids)
+    return results, float(np.percentile(latencies, 50) * 1000), float(np.percentile(latencies, 95) * 1000)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--dim', type=int, default=384, help='Vector dimension (all-MiniLM-L6-v2 uses 384)')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'vectors':>9} {'backend':>12} {'build s':>8} {'recall@' + str(args.k):>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for n in args.sizes:
+        vectors = _synthetic_vectors(n, args.dim, rng)
+        queries = vectors[rng.choice(n, args.queries, replace=False)] + 0.1 * rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        start = time.perf_counter()
+        exact = ExactIndex(args.dim)
+        exact.add(vectors)
+        build = time.perf_counter() - start
+        reference, p50, p95 = _time_queries(exact, queries, args.k)
+        print(f"{n:>9} {'exact':>12} {build:>8.2f} {1.0:>9.3f} {p50:>8.2f} {p95:>8.2f}")
+
+        start = time.perf_counter()
+        ivf = IVFIndex(args.dim, train_size=n)
+        ivf.add(vectors)
+        build = time.perf_counter() - start
+        for nprobe in args.nprobe:
+            ivf.nprobe = nprobe
+            approximate, p50, p95 = _time_queries(ivf, queries, args.k)
+            recall = np.mean([len(np.intersect1d(a, r)) / len(r) for a, r in zip(approximate, reference)])
+            print(f"{n:>9} {'ivf/' + str(nprobe):>12} {build:>8.2f} {recall:>9.3f} {p50:>8.2f} {p95:>8.2f}")
+        del vectors, exact, ivf
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# smartdoc-insight/backend/benchmarks/report_quantization.py
+"""
+Accuracy-vs-memory report for compact vocabulary embedding storage, comparing the
+matches and suggestions of each storage type with float32.
+
+Usage (from the backend directory):
+    python -m benchmarks.report_quantization
+    python -m benchmarks.report_quantization --words 50000 --queries 500 --tolerance 0.98
+    python -m benchmarks.report_quantization --document path/to/contract.pdf
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from app.services import nlp_service
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_matrix import STORAGE_DTYPES
+
+def _synthetic_vocabulary(words: int, queries: int, dim: int, rng: np.random.Generator):
+    # Tight clusters so a realistic share of words clears the 0.4 match threshold
+    centers = rng.standard_normal((max(words // 20, 1), dim), dtype=np.float32)
+    labels = rng.integers(0, len(centers), words + queries)
+    vectors = centers[labels] + 0.9 * rng.standard_normal((words + queries, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    vocabulary = [f"w{i}" for i in range(words)]
+    query_terms = [f"q{i}" for i in range(queries)]
+    cache = EmbeddingCache('synthetic', memory_bytes=2 * vectors.nbytes)
+    cache.put_many(vocabulary + query_terms, vectors)
+    nlp_service._embedding_cache = cache  # Serve the synthetic words without loading a model
+    return vocabulary, query_terms, vectors[:words]
+
+def _document_vocabulary(path: str, queries: int, rng: np.random.Generator):
+    if path.lower().endswith(('.pdf', '.docx')):
+        from app.services.document_parser import parse_document
+        with open(path, 'rb') as file_stream:
+            text = parse_document(file_stream, path)
+    else:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+    vocabulary = nlp_service.extract_vocabulary(text)
+    embeddings = nlp_service.encode_texts(vocabulary)
+    picked = rng.choice(len(vocabulary), size=min(queries, len(vocabulary)), replace=False)
+    return vocabulary, [vocabulary[i] for i in picked], embeddings
+
+def _jaccard(a: list[str], b: list[str]) -> float:
+    a, b = set(a), set(b)
+    return 1.0 if not a and not b else len(a & b) / len(a | b)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--document', help='Use the vocabulary of this .pdf/.docx/.txt file and the real model')
+    parser.add_argument('--words', type=int, default=20000, help='Synthetic vocabulary size')
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--backend', default='exact', choices=['exact', 'ivf'])
+    parser.add_argument('--tolerance', type=float, default=0.98)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.document:
+        vocabulary, query_terms, embeddings = _document_vocabulary(args.document, args.queries, rng)
+    else:
+        vocabulary, query_terms, embeddings = _synthetic_vocabulary(args.words, args.queries, args.dim, rng)
+
+    indexes = {dtype: nlp_service.build_vocabulary_index(embeddings, backend=args.backend, dtype=dtype, mmap_dir=None)
+               for dtype in STORAGE_DTYPES}
+    results = {
+        dtype: [nlp_service.score_vocabulary(vocabulary, index, term) for term in query_terms]
+        for dtype, index in indexes.items()
+    }
+    query_vectors = nlp_service.encode_texts(query_terms)
+    reference_scores = indexes['float32'].vectors @ query_vectors.T
+
+    print(f"{len(vocabulary)} words x {embeddings.shape[1]} dims, {len(query_terms)} queries, "
+          f"mean {np.mean([len(m) for m, _ in results['float32']]):.1f} matches/query")
+    print(f"{'dtype':>8} {'MB':>7} {'B/word':>7} {'match jaccard':>14} {'match exact':>12} "
+          f"{'sugg overlap':>13} {'sugg exact':>11} {'max |err|':>10}  result")
+    failed = False
+    for dtype, index in indexes.items():
+        pairs = list(zip(results['float32'], results[dtype]))
+        match_jaccard = np.mean([_jaccard(ref[0], got[0]) for ref, got in pairs])
+        match_exact = np.mean([ref[0] == got[0] for ref, got in pairs])
+        suggestion_overlap = np.mean([_jaccard(ref[1], got[1]) for ref, got in pairs])
+        suggestion_exact = np.mean([ref[1] == got[1] for ref, got in pairs])
+        max_error = np.abs(index.vectors @ query_vectors.T - reference_scores).max()
+        passed = match_jaccard >= args.tolerance and suggestion_overlap >= args.tolerance
+        failed |= not passed
+        print(f"{dtype:>8} {index.nbytes / 2**20:>7.2f} {index.nbytes / len(vocabulary):>7.0f} {match_jaccard:>14.4f} "
+              f"{match_exact:>12.3f} {suggestion_overlap:>13.4f} {suggestion_exact:>11.3f} {max_error:>10.5f}  "
+              f"{'PASS' if passed else 'FAIL'}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
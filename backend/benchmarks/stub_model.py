@@ -0,0 +1,48 @@
+# smartdoc-insight/backend/benchmarks/stub_model.py
+"""
+A deterministic stand-in for the Sentence-BERT model (hashed character trigrams), so
+benchmarks and tests run offline without downloading weights.
+"""
+import hashlib
+
+import numpy as np
+
+STUB_MODEL_NAME = 'stub-trigram-hash'
+
+class StubSentenceModel:
+    """Implements the parts of SentenceTransformer the backend calls."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        padded = f'  {text.lower()} '
+        for i in range(len(padded) - 2):
+            digest = hashlib.blake2b(padded[i:i + 3].encode('utf-8'), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        return vector
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self._embed(sentences)
+        if not sentences:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._embed(text) for text in sentences])
+
+def install_stub_model(dim: int = 384) -> StubSentenceModel:
+    """
+    Makes nlp_service use the stub instead of loading Sentence-BERT. Set
+    SENTENCE_BERT_MODEL to STUB_MODEL_NAME before importing the app as well, so the
+    embedding cache does not mix stub vectors with real ones.
+    """
+    from app.services import nlp_service
+
+    model = StubSentenceModel(dim)
+    nlp_service._sentence_bert_model = model
+    return model
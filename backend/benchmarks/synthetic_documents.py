@@ -0,0 +1,69 @@
+# smartdoc-insight/backend/benchmarks/synthetic_documents.py
+"""
+Reproducible synthetic documents for benchmarks: plain text, .docx and .pdf of a
+given number of pages, generated from a fixed seed.
+"""
+import io
+import random
+
+# Roughly one page of 11pt text
+WORDS_PER_PAGE = 500
+
+# Real words mixed into the pseudo-word vocabulary, so searches have something to find
+DOMAIN_WORDS = [
+    'payment', 'payments', 'payable', 'agreement', 'invoice', 'invoices', 'fee', 'fees',
+    'contract', 'contractor', 'termination', 'liability', 'warranty', 'delivery', 'schedule',
+]
+
+def make_text(pages: int, seed: int = 0) -> str:
+    """Returns prose-like text of about `pages` pages, in paragraphs separated by newlines."""
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    vocabulary = [''.join(rng.choice(letters) for _ in range(rng.randint(2, 10))) for _ in range(5000)]
+    vocabulary += DOMAIN_WORDS * 20
+    paragraphs, words = [], 0
+    while words < pages * WORDS_PER_PAGE:
+        length = rng.randint(30, 120)
+        paragraphs.append(' '.join(rng.choice(vocabulary) for _ in range(length)).capitalize() + '.')
+        words += length
+    return '\n'.join(paragraphs)
+
+def make_docx(pages: int, seed: int = 0) -> bytes:
+    """Returns a .docx file with one paragraph per paragraph of make_text()."""
+    from docx import Document
+
+    document = Document()
+    for paragraph in make_text(pages, seed).split('\n'):
+        document.add_paragraph(paragraph)
+    output = io.BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+def make_pdf(pages: int, seed: int = 0) -> bytes:
+    """Returns a .pdf file with make_text() laid out over about `pages` A4 pages."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    from reportlab.pdfgen import canvas
+
+    font, size, margin = 'Helvetica', 11, 56
+    page_width, page_height = A4
+    output = io.BytesIO()
+    pdf = canvas.Canvas(output, pagesize=A4)
+    pdf.setFont(font, size)
+    y = page_height - margin
+    for paragraph in make_text(pages, seed).split('\n'):
+        line = ''
+        for word in paragraph.split(' ') + [None]:
+            candidate = word if not line else f'{line} {word}'
+            if word is not None and stringWidth(candidate, font, size) <= page_width - 2 * margin:
+                line = candidate
+                continue
+            if y < margin:
+                pdf.showPage()
+                pdf.setFont(font, size)
+                y = page_height - margin
+            pdf.drawString(margin, y, line)
+            y -= 1.4 * size
+            line = word or ''
+    pdf.save()
+    return output.getvalue()
@@ -0,0 +1,20 @@
+# smartdoc-insight/backend/tests/conftest.py
+import os
+import tempfile
+
+# app.config reads the environment once, on first import: keep every on-disk cache
+# and store of the test run in a throwaway directory and skip boot-time work.
+_test_dir = tempfile.mkdtemp(prefix='smartdoc_tests_')
+os.environ.setdefault('PARSE_CACHE_PATH', os.path.join(_test_dir, 'parse_cache.sqlite3'))
+os.environ.setdefault('SESSION_STORE_BACKEND', 'sqlite')
+os.environ.setdefault('SESSION_SQLITE_PATH', os.path.join(_test_dir, 'sessions.sqlite3'))
+os.environ.setdefault('EMBEDDING_CACHE_DIR', '')
+os.environ.setdefault('WARMUP_ON_START', '0')
+os.environ.setdefault('NLTK_AUTO_DOWNLOAD', '0')
+os.environ.setdefault('PASSAGE_INDEX_ON_UPLOAD', '0')
+# Embed with the deterministic trigram-hash stub instead of downloading Sentence-BERT
+os.environ.setdefault('SENTENCE_BERT_MODEL', 'stub-trigram-hash')
+
+from benchmarks.stub_model import install_stub_model  # noqa: E402 (imports the app after the settings above)
+
+install_stub_model()
@@ -0,0 +1,77 @@
+# smartdoc-insight/backend/tests/test_asgi_app.py
+import threading
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import asgi_app, create_app
+from app.services import document_store
+
+@pytest.fixture
+def client():
+    # Not entered as a context manager: the lifespan would shut down the shared thread pools
+    return TestClient(asgi_app.create_asgi_app())
+
+@pytest.fixture
+def flask_client():
+    return create_app().test_client()
+
+@pytest.fixture
+def document():
+    return f"The late fee is five percent. Reference {uuid.uuid4().hex}."  # A fresh document ID per test
+
+@pytest.fixture
+def scored_terms(monkeypatch):
+    """Replaces the model-backed scoring with a stub that records the thread it runs on."""
+    threads = []
+
+    def score_search_terms(vocabulary, vocabulary_index, terms, phrase_indexes, **options):
+        threads.append(threading.current_thread().name)
+        return [([f"{term} match"], [f"{term} suggestion"], []) for term in terms]
+
+    monkeypatch.setattr(document_store, 'ensure_vocabulary', lambda record: record)
+    monkeypatch.setattr(document_store, 'ensure_phrase_indexes', lambda record, lengths: {})
+    monkeypatch.setattr(document_store, 'score_search_terms', score_search_terms)
+    return threads
+
+def test_responses_match_the_flask_routes(client, flask_client, document):
+    request = {"documentContent": document, "searchTerms": ["late fee", "percent"], "semanticMatches": ["five"]}
+    asgi_response = client.post('/highlight', json=request)
+    flask_response = flask_client.post('/highlight', json=request)
+    assert asgi_response.status_code == flask_response.status_code == 200
+    assert asgi_response.json() == flask_response.get_json()
+    assert client.post('/highlight', json={}).json() == flask_client.post('/highlight', json={}).get_json()
+    assert client.get('/status').json() == {"status": "Backend is running!"}
+
+def test_search_runs_on_the_cpu_pool_and_honours_etags(client, scored_terms, document):
+    document_id = client.post('/highlight', json={"documentContent": document, "searchTerm": "fee"}).json()['documentId']
+    request = {"documentId": document_id, "searchTerm": "fee"}
+    first = client.post('/search', json=request)
+    assert first.status_code == 200
+    assert first.json()["semanticMatches"] == ["fee match"]
+    assert len(scored_terms) == 1 and scored_terms[0].startswith('asgi-cpu')
+    not_modified = client.post('/search', json=request, headers={"If-None-Match": first.headers['ETag']})
+    assert not_modified.status_code == 304 and len(scored_terms) == 1
+
+def test_errors_use_the_flask_format(client):
+    assert client.post('/highlight', content=b'not json', headers={"Content-Type": "application/json"}).json() == {
+        "error": "Request body must be valid JSON",
+    }
+    missing = client.post('/highlight', json={"documentId": "expired", "searchTerm": "fee"})
+    assert missing.status_code == 404 and 'upload the document again' in missing.json()['error']
+    assert client.post('/search', json={"documentContent": "text"}).status_code == 400
+
+def test_sessions_round_trip(client, document):
+    saved = client.post('/session/save', json={
+        "documentContent": document, "searchTerm": "fee", "highlightedHtml": "<p>fee</p>",
+    })
+    assert saved.status_code == 200
+    loaded = client.get(f"/session/{saved.json()['sessionId']}").json()
+    assert (loaded["search_term"], loaded["document_content"]) == ("fee", document)
+    assert client.get('/session/unknown').status_code == 404
+
+def test_metrics_are_labelled_by_route_template(client):
+    client.get(f'/session/{uuid.uuid4()}')
+    text = client.get('/metrics').text
+    assert 'smartdoc_requests_total{endpoint="/session/{session_id}",status="404"}' in text
@@ -0,0 +1,92 @@
+# smartdoc-insight/backend/tests/test_corpus_index.py
+import pytest
+
+from app.services.corpus_index import CorpusIndex
+
+DOCUMENTS = {
+    "lease": "The tenant pays a late fee of five percent. The late fee is due monthly.",
+    "loan": "Interest accrues daily. A fee applies when a payment is late.",
+    "nda": "Confidential information stays confidential.",
+}
+
+@pytest.fixture
+def index(tmp_path):
+    index = CorpusIndex(str(tmp_path), flush_documents=100, flush_interval=0, merge_factor=2)
+    yield index
+    index.close()
+
+def _ids(response: dict) -> list[str]:
+    return [result["documentId"] for result in response["results"]]
+
+def _add_all(index: CorpusIndex):
+    for document_id, text in DOCUMENTS.items():
+        assert index.add(document_id, text, f"{document_id}.txt")
+
+def test_buffered_documents_are_searchable(index):
+    _add_all(index)
+    assert not index.add("lease", DOCUMENTS["lease"])  # Same ID, same content
+    assert index.contains("loan") and index.stats()["buffered"] == 3
+
+    response = index.search("late fee")
+    assert _ids(response) == ["lease", "loan"]
+    lease = response["results"][0]
+    assert lease["filename"] == "lease.txt" and lease["matchCount"] == 4
+    text = DOCUMENTS["lease"]
+    assert [text[start:end].lower() for start, end in lease["matches"]] == ["late", "fee", "late", "fee"]
+
+def test_search_modes(index):
+    _add_all(index)
+    index.flush()
+    assert _ids(index.search("late fee", mode="exact")) == ["lease", "loan"]
+    assert _ids(index.search("late fee", mode="phrase")) == ["lease"]
+    assert _ids(index.search("fee late", mode="phrase")) == []
+    assert _ids(index.search("confidential tenant", mode="bm25")) == ["nda", "lease"]
+    assert _ids(index.search("confidential tenant", mode="exact")) == []
+    phrase = index.search("late fee", mode="phrase")["results"][0]
+    assert phrase["matchCount"] == 2
+    with pytest.raises(ValueError):
+        index.search("fee", mode="fuzzy")
+
+def test_flush_writes_a_segment_that_another_instance_reads(index, tmp_path):
+    _add_all(index)
+    assert index.flush() and not index.flush()
+    stats = index.stats()
+    assert (stats["documents"], stats["buffered"], stats["segments"]) == (3, 0, 1)
+
+    other = CorpusIndex(str(tmp_path), flush_interval=0)
+    assert _ids(other.search("late fee", mode="phrase")) == ["lease"]
+    other.close()
+
+def test_delete_from_buffer_and_segment(index):
+    index.add("nda", DOCUMENTS["nda"])
+    index.flush()
+    index.add("lease", DOCUMENTS["lease"])
+    assert index.delete("lease") and index.delete("nda")
+    assert not index.delete("nda")
+    assert index.search("late confidential")["results"] == []
+    assert index.stats()["documents"] == 0
+    assert index.add("nda", DOCUMENTS["nda"])  # A deleted document can be indexed again
+
+def test_merge_keeps_results_and_drops_deleted_documents(index):
+    for document_id, text in DOCUMENTS.items():
+        index.add(document_id, text)
+        index.flush()
+    index.delete("loan")
+    before = index.search("late fee interest confidential")
+    while index.merge():
+        pass
+    stats = index.stats()
+    assert stats["segments"] < 3 and stats["merges"] >= 1 and stats["documents"] == 2
+    after = index.search("late fee interest confidential")
+    assert _ids(after) == _ids(before) == ["lease", "nda"]
+    assert [result["matches"] for result in after["results"]] == [result["matches"] for result in before["results"]]
+    assert _ids(index.search("late fee", mode="phrase")) == ["lease"]
+
+def test_enqueued_documents_are_flushed_on_close(tmp_path):
+    index = CorpusIndex(str(tmp_path), flush_documents=100, flush_interval=60)
+    for document_id, text in DOCUMENTS.items():
+        index.enqueue(document_id, text)
+    index.close()
+    reopened = CorpusIndex(str(tmp_path), flush_interval=0)
+    assert reopened.stats()["documents"] == 3
+    reopened.close()
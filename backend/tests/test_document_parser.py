@@ -0,0 +1,95 @@
+# smartdoc-insight/backend/tests/test_document_parser.py
+import io
+import zipfile
+
+import pytest
+
+from app.services import document_parser
+from app.services.document_parser import iter_docx_paragraphs, iter_document_chunks, parse_document
+
+_NAMESPACES = ('xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+               'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+               'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"')
+_RELATIONSHIP_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+
+def _paragraph(*runs: str) -> str:
+    return '<w:p>' + ''.join(f'<w:r>{run}</w:r>' for run in runs) + '</w:p>'
+
+def _text(text: str) -> str:
+    return f'<w:t xml:space="preserve">{text}</w:t>'
+
+def _part(root: str, body: str) -> str:
+    return f'<?xml version="1.0" encoding="UTF-8"?><w:{root} {_NAMESPACES}>{body}</w:{root}>'
+
+def _relationships(relationships: list[tuple[str, str, str]]) -> str:
+    return ('<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + ''.join(f'<Relationship Id="{rid}" Type="{_RELATIONSHIP_TYPE}{kind}" Target="{target}"/>'
+                      for rid, kind, target in relationships)
+            + '</Relationships>')
+
+def _docx(body: str, parts: dict | None = None, relationships: list | None = None) -> io.BytesIO:
+    """Builds a minimal .docx package around a document body and optional extra parts."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('_rels/.rels', _relationships([('rId1', 'officeDocument', 'word/document.xml')]))
+        archive.writestr('word/document.xml', _part('document', f'<w:body>{body}</w:body>'))
+        archive.writestr('word/_rels/document.xml.rels', _relationships(relationships or []))
+        for name, content in (parts or {}).items():
+            archive.writestr(f'word/{name}', content)
+    buffer.seek(0)
+    return buffer
+
+def test_body_paragraphs_and_run_content():
+    body = (_paragraph(_text('Payment '), _text('terms')) + '<w:p/>'
+            + _paragraph(_text('Due'), '<w:tab/>', _text('30 days'), '<w:br/>', _text('net'))
+            + _paragraph(_text('Kept'), '<w:delText>Deleted</w:delText>', '<w:instrText>PAGE</w:instrText>'))
+    assert list(iter_docx_paragraphs(_docx(body))) == ['Payment terms', '', 'Due\t30 days\nnet', 'Kept']
+
+def test_table_cells_are_read_row_by_row():
+    cell = lambda text: f'<w:tc>{_paragraph(_text(text))}</w:tc>'
+    table = f'<w:tbl><w:tr>{cell("Item")}{cell("Fee")}</w:tr><w:tr>{cell("Late payment")}{cell("5%")}</w:tr></w:tbl>'
+    body = _paragraph(_text('Before')) + table + _paragraph(_text('After'))
+    assert list(iter_docx_paragraphs(_docx(body))) == ['Before', 'Item', 'Fee', 'Late payment', '5%', 'After']
+
+def test_text_box_alternatives_are_read_once():
+    text_box = lambda text: f'<w:txbxContent>{_paragraph(_text(text))}</w:txbxContent>'
+    body = _paragraph(
+        _text('Outer'),
+        f'<mc:AlternateContent><mc:Choice>{text_box("Boxed")}</mc:Choice>'
+        f'<mc:Fallback>{text_box("Boxed")}</mc:Fallback></mc:AlternateContent>',
+    )
+    assert list(iter_docx_paragraphs(_docx(body))) == ['Boxed', 'Outer']
+
+def test_headers_footers_and_notes_follow_the_body():
+    section = ('<w:sectPr><w:footerReference w:type="default" r:id="rId3"/>'
+               '<w:headerReference w:type="default" r:id="rId2"/>'
+               '<w:headerReference w:type="first" r:id="rId2"/></w:sectPr>')
+    parts = {
+        'header1.xml': _part('hdr', _paragraph(_text('Confidential')) + '<w:p/>'),
+        'footer1.xml': _part('ftr', _paragraph(_text('Page footer'))),
+        'unused.xml': _part('hdr', _paragraph(_text('Never referenced'))),
+        'footnotes.xml': _part('footnotes', '<w:footnote w:id="1">' + _paragraph(_text('See clause 4.')) + '</w:footnote>'),
+        'endnotes.xml': _part('endnotes', '<w:endnote w:id="1">' + _paragraph(_text('End of terms.')) + '</w:endnote>'),
+    }
+    relationships = [
+        ('rId2', 'header', 'header1.xml'), ('rId3', 'footer', 'footer1.xml'), ('rId4', 'header', 'unused.xml'),
+        ('rId5', 'footnotes', 'footnotes.xml'), ('rId6', 'endnotes', 'endnotes.xml'),
+    ]
+    document = _docx(_paragraph(_text('Body')) + section, parts, relationships)
+    assert list(iter_docx_paragraphs(document)) == [
+        'Body', 'Confidential', 'Page footer', 'See clause 4.', 'End of terms.',
+    ]
+
+def test_chunks_join_to_the_parsed_text(monkeypatch):
+    monkeypatch.setattr(document_parser, 'DOCX_PARAGRAPHS_PER_CHUNK', 3)
+    body = ''.join(_paragraph(_text(f'Paragraph {i}')) if i % 4 else '<w:p/>' for i in range(10))
+    chunks = list(iter_document_chunks(_docx(body), 'contract.DOCX'))
+    assert len(chunks) == 4
+    assert ''.join(chunks) == parse_document(_docx(body), 'contract.docx')
+    assert parse_document(_docx(body), 'contract.docx').split('\n')[:2] == ['', 'Paragraph 1']
+
+def test_invalid_documents():
+    with pytest.raises(ValueError):
+        list(iter_docx_paragraphs(io.BytesIO(b'not a zip file')))
+    with pytest.raises(ValueError):
+        parse_document(io.BytesIO(b''), 'notes.txt')
@@ -0,0 +1,64 @@
+# smartdoc-insight/backend/tests/test_document_store.py
+import io
+import re
+import uuid
+
+import pytest
+
+from app import create_app
+from app.services import nlp_service
+from app.services.document_store import compute_document_id, ensure_vocabulary, get_document, register_document
+from benchmarks.synthetic_documents import make_docx
+
+@pytest.fixture
+def client():
+    return create_app().test_client()
+
+@pytest.fixture
+def document():
+    return f"The late fee is five percent. Reference {uuid.uuid4().hex}."  # A fresh document ID per test
+
+def test_identical_text_shares_one_record(document):
+    record = register_document(document, 'lease.pdf')
+    assert record.document_id == compute_document_id(document)
+    assert register_document(document) is record
+    assert get_document(record.document_id) is record
+    assert get_document('unknown') is None
+
+def test_vocabulary_is_built_once_and_accounted(monkeypatch, document):
+    monkeypatch.setattr(nlp_service, 'word_tokenize', lambda text: re.findall(r"\w+|[^\w\s]", text))
+    record = register_document(document)
+    size_before = record.size_bytes()
+    assert ensure_vocabulary(record) is record
+    assert record.vocabulary[:5] == ['the', 'late', 'fee', 'is', 'five']
+    index = record.vocabulary_index
+    assert ensure_vocabulary(record).vocabulary_index is index
+    assert record.size_bytes() >= size_before + index.nbytes
+
+def test_upload_returns_a_document_id(client):
+    data = make_docx(1, seed=7)
+    response = client.post('/upload', data={"file": (io.BytesIO(data), 'lease.docx')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    body = response.get_json()
+    record = get_document(body['documentId'])
+    assert record is not None and record.text == body['content'] and record.filename == 'lease.docx'
+
+def test_requests_resolve_the_document_by_id(client, document):
+    document_id = register_document(document).document_id
+    request = {"searchTerm": "late fee", "semanticMatches": []}
+    by_id = client.post('/highlight', json={**request, "documentId": document_id})
+    by_content = client.post('/highlight', json={**request, "documentContent": document})
+    assert by_id.status_code == by_content.status_code == 200
+    assert by_id.get_json() == by_content.get_json()
+    assert by_id.get_json()['spans'] == [[4, 12, 0]]
+
+def test_unknown_document_ids(client, document):
+    request = {"searchTerm": "fee", "semanticMatches": []}
+    missing = client.post('/highlight', json={**request, "documentId": "expired"})
+    assert missing.status_code == 404 and 'upload the document again' in missing.get_json()['error']
+    assert client.post('/highlight', json=request).status_code == 400
+    # Clients sending the text as well fall back to it
+    fallback = client.post('/highlight', json={**request, "documentId": "expired", "documentContent": document})
+    assert fallback.status_code == 200
+    assert fallback.get_json()['documentId'] == compute_document_id(document)
@@ -0,0 +1,51 @@
+# smartdoc-insight/backend/tests/test_embedding_cache.py
+import numpy as np
+
+from app.services.embedding_cache import EmbeddingCache
+
+def _vectors(count: int, dim: int = 8, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+
+def test_memory_tier_returns_stored_rows():
+    cache = EmbeddingCache('model-a', memory_bytes=1 << 20)
+    vectors = _vectors(2)
+    cache.put_many(['fee', 'tenant'], vectors)
+    found, missing = cache.get_many(['fee', 'lease', 'tenant'])
+    assert missing == ['lease']
+    np.testing.assert_array_equal(found['fee'], vectors[0])
+    np.testing.assert_array_equal(found['tenant'], vectors[1])
+    assert cache.stats()['disk'] == {"enabled": False, "hits": 0, "misses": 0}
+
+def test_disk_tier_is_shared_and_scoped_to_the_model(tmp_path):
+    vectors = _vectors(3)
+    writer = EmbeddingCache('model-a', memory_bytes=1 << 20, disk_dir=str(tmp_path))
+    writer.put_many(['fee', 'tenant', 'fee'], vectors)
+
+    # A second process: empty memory tier, same directory
+    reader = EmbeddingCache('model-a', memory_bytes=1 << 20, disk_dir=str(tmp_path))
+    found, missing = reader.get_many(['fee', 'tenant', 'lease'])
+    assert missing == ['lease']
+    np.testing.assert_array_equal(found['tenant'], vectors[1])
+    assert reader.stats()['disk']['hits'] == 2
+    reader.get_many(['fee'])
+    assert reader.stats()['disk']['hits'] == 2  # Promoted into the memory tier
+
+    other_model = EmbeddingCache('model-b', memory_bytes=1 << 20, disk_dir=str(tmp_path))
+    assert other_model.get_many(['fee']) == ({}, ['fee'])
+
+def test_disk_tier_rotates_but_keeps_words_in_use(tmp_path):
+    cache = EmbeddingCache('model-a', memory_bytes=1, disk_dir=str(tmp_path), disk_max_rows=8)
+    words = [f"word{i}" for i in range(8)]
+    vectors = _vectors(8)
+    cache.put_many(words[:4], vectors[:4])  # Generation 0 is full at half of max_rows
+    cache.put_many(words[4:6], vectors[4:6])  # Starts generation 1
+    found, _ = cache.get_many(['word0'])  # Still in use: copied forward into generation 1
+    np.testing.assert_array_equal(found['word0'], vectors[0])
+    cache.put_many(words[6:7], vectors[6:7])  # Fills generation 1
+    cache.put_many(words[7:8], vectors[7:8])  # Starts generation 2, dropping generation 0
+
+    found, missing = EmbeddingCache('model-a', memory_bytes=1, disk_dir=str(tmp_path)).get_many(words)
+    assert missing == ['word1', 'word2', 'word3']
+    np.testing.assert_array_equal(found['word7'], vectors[7])
+    assert cache.stats()['disk']['rotations'] == 2
+    assert len(list(tmp_path.glob('*/vectors*.f32'))) == 2
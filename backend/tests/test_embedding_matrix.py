@@ -0,0 +1,64 @@
+# smartdoc-insight/backend/tests/test_embedding_matrix.py
+import numpy as np
+import pytest
+
+from app.services.embedding_matrix import SCORE_CHUNK_ROWS, EmbeddingMatrix, quantize
+from app.services.nlp_service import build_vocabulary_index
+
+DIM = 64
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    rows = rng.standard_normal((2 * SCORE_CHUNK_ROWS + 17, DIM), dtype=np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+def test_int8_quantization_error_is_bounded_by_half_a_step(vectors):
+    data, scales = quantize(vectors, 'int8')
+    assert data.dtype == np.int8 and scales.shape == (len(vectors),)
+    assert np.abs(data).max() == 127
+    error = np.abs(data * scales[:, None] - vectors)
+    assert np.all(error <= scales[:, None] / 2 + 1e-7)
+
+def test_zero_rows_quantize_to_zero():
+    data, scales = quantize(np.zeros((2, DIM), dtype=np.float32), 'int8')
+    assert not data.any() and not scales.any()
+
+@pytest.mark.parametrize('dtype,tolerance', [('float32', 0), ('float16', 1e-3), ('int8', 2e-2)])
+def test_scores_match_float32(vectors, dtype, tolerance):
+    matrix = EmbeddingMatrix(DIM, dtype)
+    for start in range(0, len(vectors), 500):  # Several appends exercise the amortized growth
+        matrix.append(vectors[start:start + 500])
+    assert len(matrix) == len(vectors)
+
+    queries = vectors[:3]
+    expected = vectors @ queries.T
+    assert np.abs(matrix.to_float32() - vectors).max() <= tolerance + 1e-7
+    assert np.abs(matrix.dot(queries[0]) - expected[:, 0]).max() <= tolerance + 1e-6
+    assert np.abs(matrix.dot_many(queries) - expected).max() <= tolerance + 1e-6
+    ids = np.array([5, SCORE_CHUNK_ROWS + 3, len(vectors) - 1])
+    assert np.abs(matrix.dot(queries[0], ids) - expected[ids, 0]).max() <= tolerance + 1e-6
+
+@pytest.mark.parametrize('dtype', ['float16', 'int8'])
+def test_compact_storage_uses_less_memory(vectors, dtype):
+    full, compact = EmbeddingMatrix(DIM), EmbeddingMatrix(DIM, dtype)
+    full.append(vectors)
+    compact.append(vectors)
+    assert compact.nbytes <= full.nbytes / (2 if dtype == 'float16' else 3)
+
+def test_spilled_matrix_scores_the_same(vectors, tmp_path):
+    matrix = EmbeddingMatrix(DIM, 'int8')
+    matrix.append(vectors)
+    before = matrix.dot(vectors[0])
+    matrix.spill(str(tmp_path))
+    assert matrix.is_mmapped
+    np.testing.assert_array_equal(matrix.dot(vectors[0]), before)
+
+def test_vocabulary_indexes_are_exact_by_default(vectors):
+    index = build_vocabulary_index(vectors[:100])
+    assert index.dtype == 'float32'
+    np.testing.assert_allclose(index.search(vectors[0], 1)[0], [1.0], rtol=1e-6)
+
+def test_unsupported_dtype():
+    with pytest.raises(ValueError):
+        EmbeddingMatrix(DIM, 'bfloat16')
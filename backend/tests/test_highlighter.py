@@ -0,0 +1,59 @@
+# smartdoc-insight/backend/tests/test_highlighter.py
+import numpy as np
+
+from app.services.highlighter import PhraseMatcher, compute_highlights, from_utf16, to_utf16
+
+def test_phrase_matcher_finds_leftmost_longest_matches():
+    matcher = PhraseMatcher({"late fee": 0, "late": 1, "fee schedule": 1, "schedule": 0})
+    text = "A Late Fee schedule applies."
+    assert matcher.find(text) == [(2, 10, 0), (11, 19, 0)]
+
+def test_phrase_matcher_matches_whole_words_only():
+    matcher = PhraseMatcher({"cap": 0})
+    assert matcher.find("capital cap caps") == [(8, 11, 0)]
+
+def test_phrases_do_not_continue_across_punctuation():
+    matcher = PhraseMatcher({"liability cap": 0})
+    assert matcher.find("liability, cap") == []
+    assert matcher.find("liability \n cap") == [(0, 15, 0)]
+
+def test_equal_spans_prefer_the_lower_kind():
+    matcher = PhraseMatcher({"deposit": 1})
+    matcher_both = PhraseMatcher({"deposit": 0, "security deposit": 1})
+    assert matcher.find("the deposit") == [(4, 11, 1)]
+    assert matcher_both.find("a security deposit") == [(2, 18, 1)]
+    assert PhraseMatcher({}).find("anything") == []
+
+def test_overlapping_patterns_after_a_failed_phrase():
+    # "b c" must be found after the automaton fails out of "a b x"
+    matcher = PhraseMatcher({"a b x": 0, "b c": 1})
+    assert matcher.find("a b c") == [(2, 5, 1)]
+
+def test_utf16_offsets_around_astral_characters():
+    text = "\U0001F600 fee \U0001F4C4 fee"
+    offsets = np.array([0, 1, 2, 5, 6, 7, 11])
+    utf16 = to_utf16(text, offsets)
+    np.testing.assert_array_equal(utf16, [0, 2, 3, 6, 7, 9, 13])
+    assert len(text.encode('utf-16-le')) // 2 == to_utf16(text, np.array([len(text)]))[0]
+    np.testing.assert_array_equal(from_utf16(text, utf16), offsets)
+    # An offset inside a surrogate pair maps to the start of the character
+    np.testing.assert_array_equal(from_utf16(text, [1, 8]), [0, 6])
+
+def test_ascii_offsets_are_unchanged():
+    offsets = np.array([0, 3, 8])
+    np.testing.assert_array_equal(to_utf16("plain text", offsets), offsets)
+    np.testing.assert_array_equal(from_utf16("plain text", offsets), offsets)
+
+def test_highlight_spans_are_utf16():
+    text = "\U0001F600 Late fee, late fee"
+    spans = compute_highlights(text, ["late fee"], ["fee"])
+    utf16 = text.encode('utf-16-le')
+    assert [utf16[2 * start:2 * end].decode('utf-16-le') for start, end, _ in spans] == ["Late fee", "late fee"]
+    assert spans[:, 2].tolist() == [0, 0]
+
+def test_hyphenated_and_possessive_terms():
+    matcher = PhraseMatcher({"non-compete": 0, "lessee's deposit": 1, "lessee": 1})
+    text = "The non-compete and Lessee’s deposit; non compete, lessee's."
+    assert matcher.find(text) == [(4, 15, 0), (20, 36, 1), (51, 57, 1)]
+    spans = compute_highlights("A non-compete clause.", ["non-compete"], [])
+    assert spans.tolist() == [[2, 13, 0]]
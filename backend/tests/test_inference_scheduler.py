@@ -0,0 +1,64 @@
+# smartdoc-insight/backend/tests/test_inference_scheduler.py
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.services.inference_scheduler import InferenceScheduler
+
+def _embed(texts: list[str]) -> np.ndarray:
+    return np.array([[len(text), ord(text[0])] for text in texts], dtype=np.float32)
+
+class RecordingModel:
+    """encode_fn that records its batches."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts: list[str]) -> np.ndarray:
+        self.batches.append(list(texts))
+        return _embed(texts)
+
+def test_rows_come_back_in_request_order():
+    model = RecordingModel()
+    scheduler = InferenceScheduler(model, max_batch_size=4, max_wait_seconds=0)
+    texts = ['fee', 'tenant', 'fee', 'lease', 'deposit', 'rent']
+    np.testing.assert_array_equal(scheduler.encode(texts), _embed(texts))
+    assert all(len(set(batch)) == len(batch) <= 4 for batch in model.batches)
+    with pytest.raises(ValueError):
+        scheduler.encode([])
+
+def test_concurrent_requests_share_deduplicated_batches():
+    model = RecordingModel()
+    scheduler = InferenceScheduler(model, max_batch_size=64, max_wait_seconds=0.2)
+    requests = [[f'word{i}', 'shared'] for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(scheduler.encode, requests))
+    for texts, rows in zip(requests, results):
+        np.testing.assert_array_equal(rows, _embed(texts))
+    assert len(model.batches) < len(requests)
+    assert sum(batch.count('shared') for batch in model.batches) == len(model.batches)
+    stats = scheduler.stats()
+    assert stats['texts_requested'] == 16 and stats['texts_encoded'] == 8 + len(model.batches)
+    assert stats['dedup_ratio'] > 0 and stats['queued_jobs'] == 0
+
+def test_full_batch_does_not_wait_for_the_deadline():
+    model = RecordingModel()
+    scheduler = InferenceScheduler(model, max_batch_size=2, max_wait_seconds=30)
+    rows = scheduler.encode(['fee', 'rent'])  # Would block for 30 seconds if the batch waited
+    np.testing.assert_array_equal(rows, _embed(['fee', 'rent']))
+    assert scheduler.stats()['queue_delay_ms']['max'] < 30_000
+
+def test_model_errors_reach_every_caller_in_the_batch():
+    def failing(texts):
+        raise RuntimeError("model crashed")
+
+    scheduler = InferenceScheduler(failing, max_batch_size=8, max_wait_seconds=0.05)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(scheduler.encode, [text]) for text in ('fee', 'rent')]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="model crashed"):
+                future.result()
+    # The worker keeps serving later requests
+    scheduler.encode_fn = _embed
+    np.testing.assert_array_equal(scheduler.encode(['lease']), _embed(['lease']))
@@ -0,0 +1,59 @@
+# smartdoc-insight/backend/tests/test_lru_cache.py
+import numpy as np
+
+from app.services import lru_cache
+from app.services.lru_cache import BoundedLRUCache, estimate_size
+
+def test_evicts_least_recently_used_items():
+    cache = BoundedLRUCache(max_items=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'b' is now the least recently used
+    cache.put('c', 3)
+    assert 'b' not in cache and cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.get('b', 'missing') == 'missing'
+    assert cache.stats() == {"hits": 3, "misses": 1, "evictions": 1, "items": 2, "bytes": cache.total_bytes}
+
+def test_evicts_by_total_bytes():
+    cache = BoundedLRUCache(max_bytes=10, sizeof=len)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'yyyy')
+    cache.put('a', 'xxxxxx')  # Re-accounted, not added twice
+    assert cache.total_bytes == 10 and len(cache) == 2
+    cache.put('c', 'z')
+    assert 'b' not in cache and cache.total_bytes == 7
+
+def test_oversized_value_replaces_the_cached_one():
+    cache = BoundedLRUCache(max_bytes=10, sizeof=len)
+    cache.put('a', 'small')
+    cache.put('a', 'much too large')
+    assert cache.get('a') is None  # Not the stale 'small'
+    assert cache.total_bytes == 0 and len(cache) == 0
+
+def test_idle_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(lru_cache.time, 'monotonic', lambda: now[0])
+    cache = BoundedLRUCache(ttl_seconds=10)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    now[0] += 8
+    assert cache.get('a') == 1  # Reading refreshes the entry
+    now[0] += 8
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    cache.put('c', 3)
+    assert len(cache) == 2
+
+def test_pop_and_clear():
+    cache = BoundedLRUCache(sizeof=len)
+    cache.put('a', 'abc')
+    cache.put('b', 'de')
+    assert cache.pop('a') == 'abc' and cache.pop('a', 'gone') == 'gone'
+    assert cache.total_bytes == 2
+    cache.clear()
+    assert len(cache) == 0 and cache.total_bytes == 0
+
+def test_estimate_size():
+    assert estimate_size(np.zeros(10, dtype=np.float32)) == 40
+    assert estimate_size('abcd') == 4
+    assert estimate_size([b'ab', np.zeros(2, dtype=np.int8)]) == 4
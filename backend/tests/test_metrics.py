@@ -0,0 +1,70 @@
+# smartdoc-insight/backend/tests/test_metrics.py
+import threading
+import time
+
+from app import create_app
+from app.services import metrics
+
+def _sample(text: str, name: str) -> float | None:
+    for line in text.splitlines():
+        if line.startswith(name + ' ') or line.startswith(name + '{'):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+def test_nested_stages_are_timed_exclusively():
+    timings = metrics.begin_request('/test')
+    with metrics.stage('outer'):
+        time.sleep(0.02)
+        with metrics.stage('inner'):
+            time.sleep(0.03)
+    metrics.end_request(timings, 200)
+    assert timings.stages['inner'] >= 0.03
+    assert 0.02 <= timings.stages['outer'] < 0.03 + 0.02
+    assert timings.server_timing().startswith('inner;dur=')  # Stages are recorded as they finish
+    assert metrics.current_request() is None
+
+def test_track_thread_marks_pool_threads_for_the_profiler():
+    timings = metrics.begin_request('/test')
+    seen = []
+
+    def work():
+        with metrics.track_thread():
+            seen.append(threading.get_ident() in timings.threads)
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    thread.join()
+    metrics.end_request(timings, 200)
+    assert seen == [False]  # A plain thread does not inherit the request context
+    assert timings.threads == {threading.get_ident()}
+
+def test_counters_and_histograms_are_rendered():
+    metrics.increment('smartdoc_test_events_total', 2, kind='a"b')
+    with metrics.stage('test_stage'):
+        pass
+    text = metrics.render_prometheus()
+    assert '# TYPE smartdoc_test_events_total counter' in text
+    assert 'smartdoc_test_events_total{kind="a\\"b"} 2' in text
+    assert 'smartdoc_stage_seconds_bucket{stage="test_stage",le="+Inf"} 1' in text
+
+def test_component_stats_export_counters_and_gauges(monkeypatch):
+    stats = {"hits": 3, "misses": 1, "items": 7, "disk": {"enabled": True, "hits": 2, "misses": 0}}
+    monkeypatch.setitem(metrics._stats_sources, 'test_cache', lambda: stats)
+    monkeypatch.setitem(metrics._stats_sources, 'test_broken', lambda: 1 / 0)
+    text = metrics.render_prometheus()
+    assert '# TYPE smartdoc_test_cache_hits_total counter' in text
+    assert _sample(text, 'smartdoc_test_cache_hits_total') == 3
+    assert _sample(text, 'smartdoc_test_cache_misses_total') == 1
+    assert '# TYPE smartdoc_test_cache_items gauge' in text
+    assert _sample(text, 'smartdoc_test_cache_hit_ratio') == 0.75
+    assert _sample(text, 'smartdoc_test_cache_disk_hits_total') == 2
+    assert _sample(text, 'smartdoc_test_cache_disk_enabled') == 1
+    assert _sample(text, 'smartdoc_test_cache_hits') is None
+    assert 'smartdoc_test_broken' not in text
+
+def test_metrics_endpoint_counts_requests():
+    client = create_app().test_client()
+    client.get('/metrics')
+    text = client.get('/metrics').get_data(as_text=True)
+    assert _sample(text, 'smartdoc_requests_total{endpoint="/metrics",status="200"}') >= 1
+    assert '# TYPE smartdoc_highlight_cache_hits_total counter' in text
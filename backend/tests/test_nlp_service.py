@@ -0,0 +1,186 @@
+# smartdoc-insight/backend/tests/test_nlp_service.py
+import re
+import uuid
+
+import numpy as np
+import pytest
+
+from app import create_app
+from app.services import document_store, nlp_service
+from app.services.nlp_service import (
+    analyze_search_term, build_vocabulary_index, encode_texts, extract_vocabulary, get_definitions,
+    get_definitions_batch, get_semantic_matches, get_suggested_words, preprocess_text, preprocess_texts,
+    score_search_terms,
+)
+
+VOCABULARY = ['tenant', 'fee', 'fees', 'late', 'lately', 'payment', 'termination']
+PHRASES = ['late fee', 'late fees', 'cjs liability', 'payment terms']
+
+def _score(terms, **options):
+    vocabulary_index = build_vocabulary_index(encode_texts(VOCABULARY), backend='exact')
+    phrase_indexes = {2: (PHRASES, build_vocabulary_index(encode_texts(PHRASES), backend='exact'))}
+    return score_search_terms(VOCABULARY, vocabulary_index, terms, phrase_indexes, **options)
+
+def test_phrase_matches_are_kept_apart_from_word_matches():
+    (word_matches, suggestions, phrase_matches), = _score(['late fee'], similarity_threshold=0.3)
+    assert phrase_matches == ['late fees']  # The term itself is left out
+    assert all(' ' not in match for match in word_matches + suggestions)
+    assert 'late' in word_matches or 'fee' in word_matches
+
+def test_single_words_have_no_phrase_matches():
+    (word_matches, suggestions, phrase_matches), = _score(['fee'], similarity_threshold=0.5)
+    assert word_matches == ['fees'] and phrase_matches == []
+    assert suggestions[0] == 'fees' and 'fee' not in suggestions and len(suggestions) <= 5
+
+@pytest.fixture
+def model_calls(monkeypatch):
+    """Tokenizes without NLTK data and records the texts of every model call."""
+    calls = []
+    model = nlp_service._load_sentence_bert_model()
+    encode = model.encode
+
+    def counting_encode(sentences, **options):
+        calls.append(list(sentences))
+        return encode(sentences, **options)
+
+    monkeypatch.setattr(nlp_service, 'word_tokenize', lambda text: re.findall(r"\w+|[^\w\s]", text))
+    monkeypatch.setattr(model, 'encode', counting_encode)
+    return calls
+
+def _document(size: int = 300) -> tuple[str, list[str]]:
+    # Fresh words per test, so none of them is in the embedding cache yet
+    words = [f"w{uuid.uuid4().hex[:10]}" for _ in range(size)]
+    return "The tenant pays; " + " ".join(words) + " and payments.", words
+
+def test_vocabulary_is_unique_words_in_document_order(model_calls):
+    assert extract_vocabulary("The fee, the FEE and a late fee.") == ['the', 'fee', 'and', 'late']
+    assert extract_vocabulary("") == []
+
+def test_vocabulary_is_encoded_in_one_model_call(model_calls):
+    text, words = _document(200)
+    analyze_search_term(text, "payment")
+    vocabulary_calls = [call for call in model_calls if words[0] in call]
+    assert len(vocabulary_calls) == 1  # Not one call per word
+    assert [word for word in vocabulary_calls[0] if word.startswith('w') and len(word) == 11] == words
+    model_calls.clear()
+    analyze_search_term(text, "payment")
+    assert model_calls == []  # Served from the embedding cache now
+
+def test_batched_scores_match_a_per_word_loop(model_calls):
+    text, _ = _document(50)
+    model = nlp_service._load_sentence_bert_model()
+    term_vector = model.encode(["payment"])[0]
+    expected = []
+    for word in extract_vocabulary(text):
+        vector = model.encode([word])[0]
+        score = vector @ term_vector / (np.linalg.norm(vector) * np.linalg.norm(term_vector))
+        if score >= 0.4 and word != "payment":
+            expected.append(word)
+
+    matches, suggestions = analyze_search_term(text, "payment", similarity_threshold=0.4)
+    assert matches == expected and 'payments' in matches
+    assert get_semantic_matches(text, "payment") == matches
+    assert get_suggested_words("payment", text) == suggestions
+    assert suggestions[0] == 'payments' and len(suggestions) <= 5
+    assert analyze_search_term("", "payment") == ([], [])
+
+class _Synset:
+    def __init__(self, definition: str):
+        self._definition = definition
+
+    def definition(self) -> str:
+        return self._definition
+
+@pytest.fixture
+def wordnet_lookups(monkeypatch):
+    """Replaces WordNet with a two-word dictionary and records the words looked up."""
+    lookups = []
+    definitions = {"fee": "a fixed charge", "tenant": "someone who pays rent"}
+
+    class WordNet:
+        @staticmethod
+        def synsets(word):
+            lookups.append(word)
+            return [_Synset(definitions[word])] if word in definitions else []
+
+    monkeypatch.setattr(nlp_service, '_get_wordnet', WordNet)
+    monkeypatch.setattr(nlp_service, '_definition_cache', nlp_service.BoundedLRUCache(max_items=100))
+    return lookups
+
+def test_definitions_are_memoized_including_misses(wordnet_lookups):
+    assert get_definitions("Fee") == "a fixed charge"
+    assert get_definitions("fee") == "a fixed charge"
+    assert get_definitions("zzz") == "Definition for 'zzz' not found via WordNet."
+    assert get_definitions("zzz").startswith("Definition for")
+    assert wordnet_lookups == ["fee", "zzz"]
+
+def test_batch_definitions_resolve_each_word_once(wordnet_lookups):
+    definitions = get_definitions_batch(["fee", "tenant", "fee", "zzz"])
+    assert list(definitions) == ["fee", "tenant", "zzz"]
+    assert definitions["tenant"] == "someone who pays rent"
+    assert wordnet_lookups == ["fee", "tenant", "zzz"]
+
+def test_definitions_batch_route(wordnet_lookups):
+    client = create_app().test_client()
+    response = client.post('/definitions/batch', json={"words": ["fee", "Fee", "zzz"]})
+    assert response.status_code == 200
+    assert response.get_json()["definitions"] == {
+        "fee": "a fixed charge", "Fee": "a fixed charge", "zzz": "Definition for 'zzz' not found via WordNet.",
+    }
+    assert wordnet_lookups == ["fee", "zzz"]
+    for words in ([], "fee", ["fee", ""], ["fee", 3], ["w"] * 10_000):
+        assert client.post('/definitions/batch', json={"words": words}).status_code == 400
+
+def test_search_prefetches_definitions(wordnet_lookups, monkeypatch):
+    monkeypatch.setattr(document_store, 'ensure_vocabulary', lambda record: record)
+    monkeypatch.setattr(document_store, 'ensure_phrase_indexes', lambda record, lengths: {})
+    monkeypatch.setattr(document_store, 'score_search_terms',
+                        lambda vocabulary, index, terms, phrases, **options: [(["tenant"], [], []) for _ in terms])
+    response = create_app().test_client().post('/search', json={
+        "documentContent": f"The tenant pays the fee. {uuid.uuid4().hex}", "searchTerm": "fee",
+        "includeDefinitions": True,
+    })
+    assert response.get_json()["definitions"] == {"fee": "a fixed charge", "tenant": "someone who pays rent"}
+
+@pytest.fixture
+def lemmatizer(monkeypatch):
+    """Stands in for NLTK's tokenizer, stop words and lemmatizer; records lemmatized words."""
+    calls = []
+
+    class Lemmatizer:
+        @staticmethod
+        def lemmatize(word):
+            calls.append(word)
+            return word[:-1] if word.endswith('s') else word
+
+    monkeypatch.setattr(nlp_service, 'word_tokenize', lambda text: re.findall(r"\w+|[^\w\s]", text))
+    monkeypatch.setattr(nlp_service, '_get_stop_words', lambda: {'the', 'are', 'and'})
+    monkeypatch.setattr(nlp_service, '_get_lemmatizer', Lemmatizer)
+    monkeypatch.setattr(nlp_service, '_lemmas', {})
+    return calls
+
+def test_preprocessing_memoizes_lemmas(lemmatizer):
+    assert preprocess_text("The fees and the Fees, fees!") == ['fee', 'fee', 'fee']
+    assert preprocess_text("Fees are due") == ['fee', 'due']
+    assert lemmatizer == ['fees', 'due']
+    assert preprocess_text("") == []
+
+def test_lemma_memo_is_cleared_when_full(lemmatizer, monkeypatch):
+    monkeypatch.setattr(nlp_service, 'LEMMA_CACHE_SIZE', 2)
+    preprocess_text("fees rents deposits fees")
+    assert len(nlp_service._lemmas) <= 2
+    assert lemmatizer == ['fees', 'rents', 'deposits', 'fees']
+
+def test_batch_preprocessing_keeps_input_order(lemmatizer):
+    texts = ["Fees are due", "", "The rents and deposits"]
+    assert list(preprocess_texts(iter(texts), workers=0)) == [['fee', 'due'], [], ['rent', 'deposit']]
+    client = create_app().test_client()
+    response = client.post('/preprocess', json={"texts": texts})
+    assert response.get_json() == {"processed_texts": [['fee', 'due'], [], ['rent', 'deposit']]}
+    assert client.post('/preprocess', json={"texts": ["ok", 3]}).status_code == 400
+    assert client.post('/preprocess', json={"texts": ["x"] * 10_000}).status_code == 400
+
+@pytest.mark.skipif(bool(nlp_service.ensure_nltk_data(download=False)), reason="NLTK data is not installed")
+def test_worker_processes_match_the_calling_thread():
+    texts = [f"The tenants paid {i} late fees and deposits." for i in range(40)]
+    assert list(preprocess_texts(texts, workers=2, chunk_size=4)) == [preprocess_text(text) for text in texts]
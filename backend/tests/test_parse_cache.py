@@ -0,0 +1,69 @@
+# smartdoc-insight/backend/tests/test_parse_cache.py
+import io
+import zlib
+
+import numpy as np
+import pytest
+
+from app import create_app, main_routes
+from app.services.parse_cache import ParseCache
+from benchmarks.synthetic_documents import make_docx
+
+@pytest.fixture
+def cache(tmp_path):
+    return ParseCache(str(tmp_path / 'cache.sqlite3'), max_bytes=1 << 20)
+
+def _stored_size(cache: ParseCache) -> int:
+    return cache._connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+def test_text_is_cached_by_hash_and_extension(cache, tmp_path):
+    cache.put_text('abc', 'pdf', 'Late fee: 5%.')
+    assert cache.get_text('abc', 'pdf') == 'Late fee: 5%.'
+    assert cache.get_text('abc', 'docx') is None
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+    # Another worker process opens the same file
+    assert ParseCache(cache.path, max_bytes=1 << 20).get_text('abc', 'pdf') == 'Late fee: 5%.'
+
+def test_vocabulary_and_passages_round_trip(cache):
+    cache.put_vocabulary('doc1', ['late', 'fee'])
+    cache.put_vocabulary('doc2', [])
+    assert cache.get_vocabulary('doc1') == ['late', 'fee']
+    assert cache.get_vocabulary('doc2') == []
+    assert cache.get_vocabulary('doc3') is None
+
+    offsets = np.array([[0, 10], [5, 20]], dtype=np.int64)
+    embeddings = np.random.default_rng(0).standard_normal((2, 8)).astype(np.float32)
+    cache.put_passages('doc1', offsets, embeddings)
+    stored_offsets, stored_embeddings = cache.get_passages('doc1')
+    np.testing.assert_array_equal(stored_offsets, offsets)
+    assert stored_embeddings.dtype == np.float32
+    np.testing.assert_allclose(stored_embeddings, embeddings, atol=1e-2)
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    rng = np.random.default_rng(0)
+    values = {key: rng.bytes(400).hex() for key in 'abcde'}
+    entry_size = max(len(zlib.compress(value.encode('utf-8'), 6)) for value in values.values())
+    max_bytes = int(4.5 * entry_size)  # Room for four entries
+    cache = ParseCache(str(tmp_path / 'cache.sqlite3'), max_bytes=max_bytes)
+    for key in 'abcd':
+        cache.put_text(key, 'pdf', values[key])
+    assert cache.get_text('a', 'pdf') is not None  # 'b' is now the least recently used
+    cache.put_text('e', 'pdf', values['e'])
+    assert cache.get_text('b', 'pdf') is None
+    assert cache.get_text('a', 'pdf') == values['a'] and cache.get_text('e', 'pdf') == values['e']
+    stats = cache.stats()
+    assert stats['evictions'] >= 1 and stats['bytes'] == _stored_size(cache) <= max_bytes
+    cache.put_text('huge', 'pdf', rng.bytes(10 * max_bytes).hex())  # Larger than the whole cache: not stored
+    assert cache.get_text('huge', 'pdf') is None
+
+def test_reuploading_a_file_skips_parsing(monkeypatch):
+    client = create_app().test_client()
+    data = make_docx(1, seed=11)
+    first = client.post('/upload', data={"file": (io.BytesIO(data), 'lease.docx')}, content_type='multipart/form-data')
+    assert first.status_code == 200
+
+    monkeypatch.setattr(main_routes, 'PARSE_POOL_WORKERS', 0)
+    monkeypatch.setattr(main_routes, 'parse_document', lambda *args: pytest.fail("parsed again"))
+    again = client.post('/upload', data={"file": (io.BytesIO(data), 'copy.docx')}, content_type='multipart/form-data')
+    assert again.status_code == 200
+    assert again.get_json()['content'] == first.get_json()['content']
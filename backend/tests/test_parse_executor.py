@@ -0,0 +1,100 @@
+# smartdoc-insight/backend/tests/test_parse_executor.py
+import io
+import json
+import multiprocessing
+import time
+
+import pytest
+
+from app import create_app, main_routes
+from app.services import parse_executor
+from app.services.document_parser import iter_document_chunks, parse_document
+from app.services.parse_executor import ParseExecutor, ParseTimeoutError
+from benchmarks.synthetic_documents import make_docx, make_pdf
+
+def _parse_slowly(path: str, filename: str) -> str:
+    time.sleep(60)
+    return ''
+
+def _chunks_slowly(path: str, filename: str) -> list[str]:
+    time.sleep(60)
+    return []
+
+@pytest.fixture(scope='module')
+def executor():
+    return ParseExecutor(max_workers=2, timeout_seconds=60, pages_per_task=2)
+
+@pytest.fixture(scope='module')
+def documents(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('documents')
+    paths = {}
+    for filename, data in (('contract.pdf', make_pdf(5)), ('contract.docx', make_docx(3))):
+        paths[filename] = directory / filename
+        paths[filename].write_bytes(data)
+    return paths
+
+@pytest.mark.parametrize('filename', ['contract.pdf', 'contract.docx'])
+def test_pool_output_matches_the_parser(executor, documents, filename):
+    path = documents[filename]
+    expected_chunks = list(iter_document_chunks(io.BytesIO(path.read_bytes()), filename))
+    assert executor.parse_file(str(path), filename) == parse_document(io.BytesIO(path.read_bytes()), filename)
+    assert list(executor.iter_chunks(str(path), filename)) == expected_chunks
+    if filename.endswith('.pdf'):
+        assert len(expected_chunks) > 2  # One chunk per page, over several tasks
+
+def test_unsupported_files_are_rejected_before_parsing(executor, documents):
+    with pytest.raises(ValueError):
+        executor.iter_chunks(str(documents['contract.pdf']), 'contract.txt')
+    with pytest.raises(ValueError):
+        executor.parse_file(str(documents['contract.pdf']), 'contract.txt')
+
+def test_stopping_early_cancels_the_remaining_tasks(executor, documents):
+    chunks = executor.iter_chunks(str(documents['contract.pdf']), 'contract.pdf')
+    next(chunks)
+    chunks.close()
+    stats = executor.stats()
+    assert stats["active_jobs"] == 0
+
+def test_timeout_replaces_the_pool_and_kills_the_stuck_worker(monkeypatch, documents):
+    monkeypatch.setattr(parse_executor, '_parse_whole', _parse_slowly)
+    executor = ParseExecutor(max_workers=1, timeout_seconds=3)
+    before = set(multiprocessing.active_children())
+    old_pool = executor._get_executor()
+    start = time.monotonic()
+    with pytest.raises(ParseTimeoutError):
+        executor.parse_file(str(documents['contract.docx']), 'contract.docx')
+    assert time.monotonic() - start < 10
+    assert executor.stats()["timed_out_jobs"] == 1
+    stuck = set(multiprocessing.active_children()) - before
+    assert len(stuck) == 1
+
+    # With no other work in the old pool, the reaper terminates the stuck worker right away
+    deadline = time.monotonic() + 10
+    while any(process.is_alive() for process in stuck) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert not any(process.is_alive() for process in stuck)
+
+    monkeypatch.undo()
+    path = documents['contract.docx']
+    assert executor.parse_file(str(path), 'contract.docx') == parse_document(io.BytesIO(path.read_bytes()), 'contract.docx')
+    assert executor._get_executor() is not old_pool
+
+def test_streamed_upload_is_parsed_in_the_pool_with_its_timeout(monkeypatch, documents):
+    monkeypatch.setattr(main_routes, 'PARSE_POOL_WORKERS', 1)
+    monkeypatch.setattr(main_routes, 'get_cached_upload_text', lambda filename, content_hash: None)
+    executor = ParseExecutor(max_workers=1, timeout_seconds=3)
+    monkeypatch.setattr(main_routes, 'get_parse_executor', lambda: executor)
+    client = create_app().test_client()
+
+    def upload(filename):
+        data = {"file": (io.BytesIO(documents[filename].read_bytes()), filename)}
+        response = client.post('/upload/stream', data=data, content_type='multipart/form-data')
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    lines = upload('contract.pdf')
+    assert [line["type"] for line in lines] == ['page'] * (len(lines) - 1) + ['done']
+    assert executor.stats()["completed_jobs"] == 1
+
+    monkeypatch.setattr(parse_executor, '_parse_chunks', _chunks_slowly)
+    lines = upload('contract.docx')
+    assert lines == [{"type": "error", "error": "Parsing did not finish within 3 seconds."}]
@@ -0,0 +1,85 @@
+# smartdoc-insight/backend/tests/test_pdf_generator.py
+import uuid
+
+import numpy as np
+import pytest
+from reportlab import rl_config
+
+from app import create_app
+from app.services import pdf_generator
+from app.services.pdf_generator import (
+    PDF_FONT, _layout_lines, get_highlighted_pdf, iter_pdf_chunks, normalize_spans, pdf_font,
+)
+
+KINDS = ['exact', 'semantic']
+
+@pytest.fixture
+def client():
+    return create_app().test_client()
+
+def test_normalize_spans_converts_clips_and_drops_overlaps():
+    text = "\U0001F600 late fee"  # The emoji is two UTF-16 code units
+    spans = normalize_spans(text, [[7, 10, 1], [3, 7, 0], [4, 6, 1], [7, 99, 0]], KINDS)
+    assert spans.tolist() == [[2, 6, 0], [6, 10, 0]]
+    assert normalize_spans(text, [], KINDS).shape == (0, 3)
+
+@pytest.mark.parametrize('spans, kinds', [
+    ([[0, 1, 2]], KINDS),
+    ([[3, 1, 0]], KINDS),
+    ([[-1, 1, 0]], KINDS),
+    ([["a", 1, 0]], KINDS),
+    ([[0, 1, 0]], ['bold']),
+])
+def test_normalize_spans_rejects_malformed_input(spans, kinds):
+    with pytest.raises(ValueError):
+        normalize_spans("late fee", spans, kinds)
+
+def test_layout_lines_wraps_at_whitespace_and_breaks_long_words():
+    text = "aaa bbb ccc\nddddddddd"
+    lines = _layout_lines(text, 7, len)
+    assert [text[start:end] for start, end in lines] == ["aaa bbb ", "ccc", "ddddddd", "dd"]
+
+def test_pdf_font_falls_back_to_helvetica(monkeypatch):
+    monkeypatch.setattr(pdf_generator, '_unicode_font', lambda: None)
+    assert pdf_font("late fee") == PDF_FONT
+    assert pdf_font("café") == PDF_FONT  # Latin-1 is covered by Helvetica
+    assert pdf_font("Арендатор") == PDF_FONT
+    monkeypatch.setattr(pdf_generator, '_unicode_font', lambda: 'Unicode')
+    assert pdf_font("Арендатор") == 'Unicode'
+
+def test_highlighted_pdf_is_rendered_once_per_view(monkeypatch):
+    rendered = []
+    render = pdf_generator.render_highlighted_pdf
+    monkeypatch.setattr(pdf_generator, 'render_highlighted_pdf',
+                        lambda *args: rendered.append(args) or render(*args))
+    document_id, text = uuid.uuid4().hex, "The late fee is due.\n" * 200
+    a85 = rl_config.useA85
+
+    first = get_highlighted_pdf(document_id, text, [[4, 12, 0]], KINDS)
+    assert first.startswith(b'%PDF-')
+    assert get_highlighted_pdf(document_id, text, [[4, 12, 0]], KINDS) is first
+    get_highlighted_pdf(document_id, text, [[4, 12, 1]], KINDS)
+    assert len(rendered) == 2
+    assert rl_config.useA85 == a85  # The process-wide reportlab settings are left alone
+    assert b''.join(iter_pdf_chunks(first)) == first
+
+def test_download_pdf_streams_the_rendered_document(client):
+    response = client.post('/download_pdf', json={
+        "documentContent": f"The late fee is due. {uuid.uuid4().hex}",
+        "highlights": {"kinds": KINDS, "spans": [[4, 12, 0]]},
+        "filename": "Mietvertrag über\n.pdf",
+    })
+    assert response.status_code == 200
+    assert response.mimetype == 'application/pdf'
+    assert response.data.startswith(b'%PDF-')
+    assert response.headers['Content-Length'] == str(len(response.data))
+    disposition = response.headers['Content-Disposition']
+    assert disposition.startswith('attachment; filename="Mietvertrag uber.pdf"')
+    assert "filename*=UTF-8''Mietvertrag%20%C3%BCber.pdf" in disposition
+
+def test_download_pdf_rejects_bad_highlights(client):
+    response = client.post('/download_pdf', json={
+        "documentContent": "The late fee is due.", "highlights": {"kinds": KINDS, "spans": [[0, 3, 5]]},
+    })
+    assert response.status_code == 400
+    assert client.post('/download_pdf', json={"highlights": []}).status_code == 400
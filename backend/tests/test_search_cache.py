@@ -0,0 +1,84 @@
+# smartdoc-insight/backend/tests/test_search_cache.py
+import uuid
+
+import pytest
+
+from app import create_app
+from app.services import document_store
+from app.services.search_cache import SearchResultCache, etag_matches, search_etag
+
+@pytest.fixture
+def scored_terms(monkeypatch):
+    """Replaces the model-backed scoring with a stub that records the terms it scores."""
+    calls = []
+
+    def score_search_terms(vocabulary, vocabulary_index, terms, phrase_indexes, **options):
+        calls.append(list(terms))
+        return [([f"{term} match"], [f"{term} suggestion"], []) for term in terms]
+
+    monkeypatch.setattr(document_store, 'ensure_vocabulary', lambda record: record)
+    monkeypatch.setattr(document_store, 'ensure_phrase_indexes', lambda record, lengths: {})
+    monkeypatch.setattr(document_store, 'score_search_terms', score_search_terms)
+    return calls
+
+@pytest.fixture
+def client():
+    return create_app().test_client()
+
+@pytest.fixture
+def document():
+    return f"The late fee is five percent. Reference {uuid.uuid4().hex}."  # A fresh document ID per test
+
+def test_search_result_cache_hits_and_misses():
+    cache = SearchResultCache(max_items=10, shared=False)
+    key = cache.key('doc', '  Late  Fee ', 0.4, 5, 0.25)
+    assert key == cache.key('doc', 'late fee', 0.4, 5, 0.25)  # Terms are normalized
+    assert key != cache.key('doc', 'late fee', 0.5, 5, 0.25)
+    assert key != cache.key('other', 'late fee', 0.4, 5, 0.25)
+
+    assert cache.get(key) is None
+    cache.put(key, (['charge'], ['payment'], []))
+    assert cache.get(key) == (['charge'], ['payment'], [])
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["shared_hits"]) == (1, 1, 0)
+
+def test_etag_matching():
+    etag = search_etag('doc', {"searchTerm": "fee"})
+    assert etag == search_etag('doc', {"searchTerm": "fee", "documentContent": "ignored"})
+    assert etag != search_etag('doc', {"searchTerm": "fee", "includeHighlights": True})
+    assert etag != search_etag('other', {"searchTerm": "fee"})
+    assert etag_matches(f'"x", W/"{etag}"', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"x"', etag)
+
+def test_repeated_search_is_answered_from_the_cache(client, scored_terms, document):
+    request = {"documentContent": document, "searchTerms": ["late fee", "percent"]}
+    first = client.post('/search', json=request)
+    assert first.status_code == 200
+    assert first.get_json()["results"][0]["semanticMatches"] == ["late fee match"]
+    assert first.get_json()["results"][0]["phraseMatches"] == []
+    assert scored_terms == [["late fee", "percent"]]
+
+    second = client.post('/search', json={**request, "searchTerms": ["percent", "Late  Fee", "deposit"]})
+    assert second.status_code == 200
+    assert scored_terms[1:] == [["deposit"]]  # Only the term not scored before
+    assert [entry["semanticMatches"] for entry in second.get_json()["results"]] == [
+        ["percent match"], ["late fee match"], ["deposit match"],
+    ]
+
+def test_conditional_search_returns_304(client, scored_terms, document):
+    request = {"documentContent": document, "searchTerm": "late fee"}
+    first = client.post('/search', json=request)
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and etag
+
+    not_modified = client.post('/search', json=request, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers['ETag'] == etag and not_modified.data == b''
+    assert len(scored_terms) == 1
+
+    # Different options are a different response
+    changed = client.post('/search', json={**request, "includeHighlights": True}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert "highlights" in changed.get_json()
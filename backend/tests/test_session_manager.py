@@ -0,0 +1,121 @@
+# smartdoc-insight/backend/tests/test_session_manager.py
+import hashlib
+import zlib
+
+import pytest
+
+from app.services import session_manager, session_store
+from app.services.session_store import FirestoreSessionStore, SQLiteSessionStore
+
+class _FakeSnapshot:
+    def __init__(self, data):
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+class _FakeDocument:
+    def __init__(self, client, path):
+        self._client = client
+        self._path = path
+
+    def get(self):
+        return _FakeSnapshot(self._client.documents.get(self._path))
+
+    def set(self, data):
+        self._client.writes.append(self._path)
+        self._client.documents[self._path] = dict(data)
+
+    def collection(self, name):
+        return _FakeCollection(self._client, f"{self._path}/{name}")
+
+class _FakeCollection:
+    def __init__(self, client, path):
+        self._client = client
+        self._path = path
+
+    def document(self, document_id):
+        return _FakeDocument(self._client, f"{self._path}/{document_id}")
+
+class _FakeFirestore:
+    """The subset of the Firestore client the session store uses, backed by a dict of paths."""
+
+    def __init__(self):
+        self.documents = {}
+        self.writes = []
+
+    def collection(self, name):
+        return _FakeCollection(self, name)
+
+@pytest.fixture
+def sqlite_store():
+    store = SQLiteSessionStore(':memory:')
+    session_manager.set_session_store(store)
+    yield store
+    session_manager.set_session_store(None)
+
+@pytest.fixture
+def firestore():
+    store = FirestoreSessionStore('unused.json')
+    store._db = _FakeFirestore()  # _get_db() returns it without initializing Firebase
+    return store
+
+def test_sqlite_store_round_trip():
+    store = SQLiteSessionStore(':memory:')
+    store.put_session('abc', {"search_term": "fee", "format": 2})
+    record = store.get_session('abc')
+    assert record["search_term"] == "fee" and record["format"] == 2 and "timestamp" in record
+    assert store.get_session('missing') is None
+
+    store.put_blob('digest', b'\x00data')
+    store.put_blob('digest', b'other')  # Blobs are immutable: the first write wins
+    assert store.get_blob('digest') == b'\x00data'
+    assert store.get_blob('missing') is None
+
+def test_save_and_load_session(sqlite_store):
+    session_id = session_manager.save_session('late fee', 'The late fee is 5%.', '<mark>late fee</mark>')
+    session_manager.set_session_store(sqlite_store)  # Clears the loaded-session cache
+    session = session_manager.load_session(session_id)
+    assert session["search_term"] == 'late fee'
+    assert session["document_content"] == 'The late fee is 5%.'
+    assert session["highlighted_html"] == '<mark>late fee</mark>'
+    assert session_manager.load_session('no-such-session') is None
+
+def test_sessions_share_blobs_by_sha256(sqlite_store):
+    document = 'A long contract. ' * 1000
+    first = session_manager.save_session('contract', document, '<p>one</p>')
+    second = session_manager.save_session('term', document, '<p>two</p>')
+    assert first != second
+
+    records = [sqlite_store.get_session(session_id) for session_id in (first, second)]
+    digest = hashlib.sha256(document.encode('utf-8')).hexdigest()
+    assert records[0]["document_content_blob"] == records[1]["document_content_blob"] == digest
+    assert sqlite_store._connection.execute('SELECT COUNT(*) FROM blobs').fetchone()[0] == 3
+    assert zlib.decompress(sqlite_store.get_blob(digest)).decode('utf-8') == document
+
+def test_firestore_blob_fits_in_one_document(firestore):
+    firestore.put_blob('small', b'compressed bytes')
+    assert firestore._db.documents['session_blobs/small'] == {"data": b'compressed bytes', "size": 16}
+    assert firestore.get_blob('small') == b'compressed bytes'
+    assert firestore.get_blob('missing') is None
+
+def test_firestore_large_blob_is_split_into_parts(firestore, monkeypatch):
+    monkeypatch.setattr(session_store, '_FIRESTORE_PART_BYTES', 10)
+    data = bytes(range(25))
+    firestore.put_blob('large', data)
+
+    documents = firestore._db.documents
+    assert documents['session_blobs/large'] == {"parts": 3, "size": 25}
+    assert [documents[f'session_blobs/large/parts/{i}']["data"] for i in range(3)] == [data[:10], data[10:20], data[20:]]
+    # The parent document is written last, so readers never see a partial blob
+    assert firestore._db.writes[-1] == 'session_blobs/large'
+    assert firestore.get_blob('large') == data
+
+def test_firestore_blob_is_written_once(firestore):
+    firestore.put_blob('digest', b'data')
+    other_process = FirestoreSessionStore('unused.json')
+    other_process._db = firestore._db
+    other_process.put_blob('digest', b'data')
+    firestore.put_blob('digest', b'data')
+    assert firestore._db.writes == ['session_blobs/digest']
@@ -0,0 +1,60 @@
+# smartdoc-insight/backend/tests/test_startup.py
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app import startup
+from app.services import nlp_service
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def phases(monkeypatch):
+    monkeypatch.setattr(startup, '_boot_phases', [])
+    return startup._boot_phases
+
+def test_boot_phases_are_reported(phases):
+    with startup.boot_phase('first'):
+        pass
+    with pytest.raises(RuntimeError):
+        with startup.boot_phase('failing'):
+            raise RuntimeError
+    report = startup.get_startup_report()
+    assert [phase["phase"] for phase in report["phases"]] == ['first', 'failing']
+    assert report["total_seconds"] == round(sum(seconds for _, seconds in phases), 3)
+
+def test_warm_up_loads_the_model_only_on_request(phases, monkeypatch):
+    calls = []
+    monkeypatch.setattr(nlp_service, 'ensure_nltk_data', lambda: calls.append('nltk') or [])
+    monkeypatch.setattr(nlp_service, 'load_wordnet', lambda: calls.append('wordnet') or True)
+    monkeypatch.setattr(nlp_service, '_load_sentence_bert_model', lambda: calls.append('model'))
+    startup.warm_up()
+    assert calls == ['nltk', 'wordnet']
+    startup.warm_up(load_model=True)
+    assert calls[2:] == ['nltk', 'wordnet', 'model']
+    assert [name for name, _ in phases][-1] == 'sentence-bert model'
+
+def test_missing_nltk_data_is_not_downloaded_by_default(monkeypatch):
+    import nltk
+
+    def find(resource):
+        raise LookupError(resource)
+
+    monkeypatch.setattr(nltk.data, 'find', find)
+    monkeypatch.setattr(nltk, 'download', lambda *args, **kwargs: pytest.fail("downloaded"))
+    assert nlp_service.ensure_nltk_data(download=False) == nlp_service.NLTK_DATA_PACKAGES
+
+def test_creating_the_app_defers_heavy_imports():
+    code = (
+        "import sys\n"
+        "from app import create_app\n"
+        "create_app()\n"
+        "print(sorted({'nltk', 'torch', 'sentence_transformers', 'xhtml2pdf', 'reportlab'} & set(sys.modules)))\n"
+    )
+    env = {**os.environ, "WARMUP_ON_START": "0"}
+    result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == '[]'
@@ -0,0 +1,72 @@
+# smartdoc-insight/backend/tests/test_vector_index.py
+import numpy as np
+import pytest
+
+from app.services.vector_index import ExactIndex, IVFIndex, create_index, load_index
+
+DIM = 32
+
+def _clustered_vectors(n: int, seed: int = 0, clusters: int = 50) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, DIM), dtype=np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, DIM), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def _recall(index, exact, queries: np.ndarray, k: int) -> float:
+    found = 0
+    for query in queries:
+        found += len(np.intersect1d(index.search(query, k)[1], exact.search(query, k)[1]))
+    return found / (k * len(queries))
+
+def test_ivf_recall_against_exact_index():
+    vectors = _clustered_vectors(5000)
+    queries = _clustered_vectors(50, seed=1)
+    exact = ExactIndex(DIM)
+    exact.add(vectors)
+    ivf = IVFIndex(DIM, nlist=64, nprobe=8, train_size=4000)
+    ivf.add(vectors[:4000])
+    ivf.add(vectors[4000:])  # Assigned incrementally after training
+
+    assert ivf.is_trained and len(ivf) == len(exact)
+    assert _recall(ivf, exact, queries, 10) >= 0.9
+
+def test_untrained_ivf_index_is_exact():
+    vectors = _clustered_vectors(500)
+    exact, ivf = ExactIndex(DIM), IVFIndex(DIM, train_size=1000)
+    exact.add(vectors)
+    ivf.add(vectors)
+    assert not ivf.is_trained
+    assert _recall(ivf, exact, vectors[:20], 10) == 1.0
+
+@pytest.mark.parametrize('dtype', ['float32', 'float16', 'int8'])
+@pytest.mark.parametrize('backend,options', [
+    ('exact', {}),
+    ('ivf', {"nlist": 16, "nprobe": 4, "train_size": 300}),
+    ('ivf', {"train_size": 10000}),
+])
+def test_save_and_load_round_trip(tmp_path, backend, options, dtype):
+    vectors = _clustered_vectors(400)
+    index = create_index(backend, DIM, dtype=dtype, **options)
+    index.add(vectors)
+    path = str(tmp_path / 'index.npz')
+    index.save(path)
+
+    loaded = load_index(path)
+    assert type(loaded) is type(index)
+    assert loaded.dtype == dtype and len(loaded) == len(index)
+    if backend == 'ivf':
+        assert loaded.is_trained == index.is_trained
+        assert (loaded.nprobe, loaded.train_size) == (index.nprobe, index.train_size)
+    for query in vectors[:10]:
+        scores, ids = index.search(query, 5)
+        loaded_scores, loaded_ids = loaded.search(query, 5)
+        np.testing.assert_array_equal(loaded_ids, ids)
+        np.testing.assert_allclose(loaded_scores, scores, rtol=1e-6)
+
+    # A loaded index keeps accepting vectors
+    loaded.add(vectors[:1])
+    assert len(loaded) == len(index) + 1
+
+def test_create_index_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        create_index('hnsw', DIM)
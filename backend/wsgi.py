@@ -1,6 +1,7 @@
 # smartdoc-insight/backend/wsgi.py
 from app import create_app
 from dotenv import load_dotenv
+import gc
 import os
 
 # Load environment variables for production environment
@@ -8,5 +9,14 @@ load_dotenv()
 
 app = create_app()
 
+# With `gunicorn --preload` this module (and the warm-up in create_app) runs once in
+# the master process. Setting PRELOAD_MODEL=1 then loads the Sentence-BERT model there,
+# and every forked worker shares it copy-on-write instead of loading its own copy.
+# gc.freeze() moves the preloaded objects out of the garbage collector's reach, so
+# collections in the workers don't write to (and thereby copy) those shared pages.
+if app.config['PRELOAD_MODEL']:
+    gc.freeze()
+
 # This file is used by WSGI servers (e.g., Gunicorn) to run the Flask app.
-# Example Gunicorn command: gunicorn wsgi:app -w 4 -b 0.0.0.0:5000
\ No newline at end of file
+# Example Gunicorn command: gunicorn wsgi:app -w 4 -b 0.0.0.0:5000
+# With a shared preloaded model: PRELOAD_MODEL=1 gunicorn wsgi:app --preload -w 4 -b 0.0.0.0:5000
\ No newline at end of file
@@ -8,12 +8,26 @@ import './App.css'; // Import the new App.css file
 // Base URL for your backend API
 const API_BASE_URL = 'http://127.0.0.1:5000';
 
+// Definitions already fetched (or prefetched with a search), keyed by lowercased word
+const definitionCache = new Map();
+
+const fetchDefinition = async (word) => {
+  const key = word.toLowerCase();
+  if (!definitionCache.has(key)) {
+    const response = await axios.post(`${API_BASE_URL}/definitions`, { word });
+    definitionCache.set(key, response.data.definition);
+  }
+  return definitionCache.get(key);
+};
+
 // Main App component
 const App = () => {
   const [documentContent, setDocumentContent] = useState('');
+  const [documentId, setDocumentId] = useState(null); // Server-side reference to the uploaded document
   const [searchTerm, setSearchTerm] = useState('');
   const [showModal, setShowModal] = useState(false); 
   const [highlightedContent, setHighlightedContent] = useState(null);
+  const [highlights, setHighlights] = useState(null); // Highlight spans of the last search, reused for PDF export
   const [suggestedWords, setSuggestedWords] = useState([]);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState('');
@@ -31,6 +45,7 @@ const App = () => {
   const [isModalDefinitionLoading, setIsModalDefinitionLoading] = useState(false); 
 
   const documentRef = useRef(null);
+  const uploadInProgressRef = useRef(false); // True while pages are still streaming in
 
   // --- Effects ---
   useEffect(() => {
@@ -38,6 +53,7 @@ const App = () => {
       handleSearch(searchTerm, documentContent);
     } else {
       setHighlightedContent(documentContent);
+      setHighlights(null);
     }
   }, [searchTerm, documentContent]);
 
@@ -51,8 +67,8 @@ const App = () => {
     setIsModalDefinitionLoading(true); 
     const handler = setTimeout(async () => {
       try {
-        const response = await axios.post(`${API_BASE_URL}/definitions`, { word: modalInputValue.trim() });
-        setModalInputDefinition(response.data.definition || 'No definition found.');
+        const definition = await fetchDefinition(modalInputValue.trim());
+        setModalInputDefinition(definition || 'No definition found.');
       } catch (err) {
         console.error(`Error fetching definition for '${modalInputValue}' in modal:`, err);
         setModalInputDefinition('Could not fetch definition.');
@@ -131,6 +147,22 @@ const App = () => {
 
   // --- API Calls ---
 
+  // Posts a request that refers to the uploaded document by ID. Falls back to sending
+  // the full text if the server no longer has the document (restart or expiry).
+  const postWithDocument = async (path, payload, config) => {
+    if (documentId) {
+      try {
+        return await axios.post(`${API_BASE_URL}${path}`, { ...payload, documentId }, config);
+      } catch (err) {
+        if (!err.response || err.response.status !== 404) throw err;
+      }
+    }
+    const response = await axios.post(`${API_BASE_URL}${path}`, { ...payload, documentContent }, config);
+    // Adopt the re-registered ID, unless the text is a partial upload still streaming in
+    if (response.data.documentId && !uploadInProgressRef.current) setDocumentId(response.data.documentId);
+    return response;
+  };
+
   const handleFileUpload = async (event) => {
     const file = event.target.files[0];
     if (!file) { return; }
@@ -138,24 +170,56 @@ const App = () => {
     setIsLoading(true);
     setError('');
     setDocumentContent('');
+    setDocumentId(null);
     setHighlightedContent(null);
+    setHighlights(null);
     setSearchTerm('');
     setSuggestedWords([]);
 
     const formData = new FormData();
     formData.append('file', file);
 
+    uploadInProgressRef.current = true;
     try {
-      const response = await axios.post(`${API_BASE_URL}/upload`, formData, {
-        headers: { 'Content-Type': 'multipart/form-data' },
-      });
-      setDocumentContent(response.data.content);
+      // The server streams NDJSON: one line per parsed page, then a final 'done' line
+      const response = await fetch(`${API_BASE_URL}/upload/stream`, { method: 'POST', body: formData });
+      if (!response.ok) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.error || `Upload failed with status ${response.status}`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = '';
+      let text = '';
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const message = JSON.parse(line);
+          if (message.type === 'page') {
+            // Show (and allow searching) early pages while later ones are still parsing
+            text += message.text;
+            setDocumentContent(text);
+            setIsLoading(false);
+          } else if (message.type === 'done') {
+            setDocumentId(message.documentId);
+          } else if (message.type === 'error') {
+            throw new Error(message.error);
+          }
+        }
+      }
       alert('File uploaded and parsed successfully! Now enter a word to search.');
     } catch (err) {
       console.error('File upload error:', err);
       setError('Failed to upload and parse file. Please try again.');
       alert('Failed to upload and parse file. Check console for details.');
     } finally {
+      uploadInProgressRef.current = false;
       setIsLoading(false);
     }
   };
@@ -166,12 +230,12 @@ const App = () => {
     setSuggestedWords([]);
 
     try {
-      const response = await axios.post(`${API_BASE_URL}/search`, {
-        searchTerm: term,
-        documentContent: content,
+      const response = await postWithDocument('/search', { searchTerm: term, includeDefinitions: true, includeHighlights: true });
+      Object.entries(response.data.definitions || {}).forEach(([word, definition]) => {
+        definitionCache.set(word.toLowerCase(), definition);
       });
       setSuggestedWords(response.data.suggestedWords);
-      highlightText(term, response.data.semanticMatches);
+      renderHighlights(response.data.highlights);
     } catch (err) {
       console.error('Search error:', err);
       setError('Failed to perform search. Please try again.');
@@ -203,96 +267,67 @@ const App = () => {
     setShowModal(false); // Close modal after submission
   };
 
-  // Core highlighting logic
-  const highlightText = (wordToHighlight, semanticMatches = []) => {
-    if (!documentContent || !wordToHighlight) {
+  // Core highlighting logic: renders the document around the highlight spans computed
+  // by the backend, creating one element per match rather than one per word
+  const renderHighlights = (highlights) => {
+    setHighlights(highlights || null);
+    if (!documentContent || !highlights || highlights.spans.length === 0) {
       setHighlightedContent(documentContent);
       return;
     }
 
-    const words = documentContent.split(/(\b\w+\b|[.,!?;:()"\s]+)/g);
-    const lowerCaseSearchTerm = wordToHighlight.toLowerCase();
-    const lowerCaseSemanticMatches = semanticMatches.map(w => w.toLowerCase());
-
-    const exactMatchColor = 'bg-yellow-300'; 
-    const semanticMatchColor = 'bg-green-300'; 
-
-    const highlighted = words.map((part, index) => {
-      const trimmedPart = part.trim();
-      const lowerCasePart = trimmedPart.toLowerCase();
-
-      // Check for exact match
-      if (lowerCasePart === lowerCaseSearchTerm) {
-        return (
-          <Tippy
-            key={index}
-            content={<DefinitionTooltip word={trimmedPart} />}
-            placement="top"
-            trigger="mouseenter focus"
-            animation="fade"
-            duration={100}
-            delay={[100, 0]}
-          >
-            <span className={`rounded-md px-1 cursor-pointer ${exactMatchColor}`}>
-              {part}
-            </span>
-          </Tippy>
-        );
-      }
-      // Check for semantic match (synonym)
-      else if (lowerCaseSemanticMatches.includes(lowerCasePart)) {
-        return (
-          <Tippy
-            key={index}
-            content={<DefinitionTooltip word={trimmedPart} />}
-            placement="top"
-            trigger="mouseenter focus"
-            animation="fade"
-            duration={100}
-            delay={[100, 0]}
-          >
-            <span className={`rounded-md px-1 cursor-pointer ${semanticMatchColor}`}>
-              {part}
-            </span>
-          </Tippy>
-        );
-      }
-      // Default: no highlight, but still make words hoverable if a definition exists
-      else if (/\b\w+\b/.test(trimmedPart)) { // If it's a word (alphanumeric)
-        return (
-          <Tippy
-            key={index}
-            content={<DefinitionTooltip word={trimmedPart} />}
-            placement="top"
-            trigger="mouseenter focus"
-            animation="fade"
-            duration={100}
-            delay={[100, 0]}
-          >
-            <span className="cursor-pointer">
-              {part}
-            </span>
-          </Tippy>
-        );
+    const kindColors = {
+      exact: 'bg-yellow-300',
+      semantic: 'bg-green-300',
+    };
+
+    const parts = [];
+    let cursor = 0;
+    highlights.spans.forEach(([start, end, kind], index) => {
+      if (start > cursor) {
+        parts.push(documentContent.slice(cursor, start));
       }
-      return part; // Return as is for non-words (spaces, punctuation)
+      const matchedText = documentContent.slice(start, end);
+      parts.push(
+        <Tippy
+          key={index}
+          content={<DefinitionTooltip word={matchedText} />}
+          placement="top"
+          trigger="mouseenter focus"
+          animation="fade"
+          duration={100}
+          delay={[100, 0]}
+        >
+          <span className={`rounded-md px-1 cursor-pointer ${kindColors[highlights.kinds[kind]]}`}>
+            {matchedText}
+          </span>
+        </Tippy>
+      );
+      cursor = end;
     });
-    setHighlightedContent(highlighted);
+    parts.push(documentContent.slice(cursor));
+    setHighlightedContent(parts);
   };
 
   // Component for the definition tooltip content
   const DefinitionTooltip = ({ word }) => {
-    const [definition, setDefinition] = useState('Loading definition...');
-    const [defLoading, setDefLoading] = useState(true);
+    const cached = definitionCache.get(word.toLowerCase());
+    const [definition, setDefinition] = useState(cached || 'Loading definition...');
+    const [defLoading, setDefLoading] = useState(cached === undefined);
     const [defError, setDefError] = useState(false);
 
     useEffect(() => {
-      const fetchDefinition = async () => {
+      if (definitionCache.has(word.toLowerCase())) {
+        setDefinition(definitionCache.get(word.toLowerCase()) || 'No definition found.');
+        setDefLoading(false);
+        return;
+      }
+      const loadDefinition = async () => {
         setDefLoading(true);
         setDefError(false);
         try {
-          const response = await axios.post(`${API_BASE_URL}/definitions`, { word: word });
-          setDefinition(response.data.definition || 'No definition found.');
+          const fetched = await fetchDefinition(word);
+          setDefinition(fetched || 'No definition found.');
         } catch (err) {
           console.error(`Error fetching definition for '${word}' from backend:`, err);
           setDefinition('Failed to load definition.');
@@ -301,8 +336,8 @@ const App = () => {
           setDefLoading(false);
         }
       };
-      fetchDefinition();
-    }, [word]); // Re-fetch if the word changes
+      loadDefinition();
+    }, [word]); // Re-fetch if the word changes (served from definitionCache when possible)
 
     return (
       <div className="max-w-xs text-sm p-2 rounded-lg shadow-md bg-gray-800 text-white">
@@ -320,6 +355,7 @@ const App = () => {
   const resetSearch = () => {
     setSearchTerm('');
     setHighlightedContent(documentContent); // Show original content
+    setHighlights(null);
     setSuggestedWords([]);
     setError('');
     setIsLoading(false);
@@ -335,13 +371,10 @@ const App = () => {
       setIsLoading(true);
       setError('');
 
-      const documentHtml = documentRef.current ? documentRef.current.innerHTML : '';
-      const cleanHtml = documentHtml.replace(/data-tippy-.*?=".*?"/g, '')
-                                    .replace(/<div class="tippy-box".*?<\/div>/g, '');
-
       try {
-          const response = await axios.post(`${API_BASE_URL}/download_pdf`, {
-              highlightedHtml: cleanHtml,
+          // The server renders the PDF from its copy of the document and the highlight spans
+          const response = await postWithDocument('/download_pdf', {
+              highlights: highlights ? { kinds: highlights.kinds, spans: highlights.spans } : null,
               filename: 'smartdoc_insight_highlights.pdf'
           }, {
               responseType: 'blob' // Important: Expect a binary response (PDF)
@@ -393,9 +426,8 @@ const App = () => {
                                     .replace(/<div class="tippy-box".*?<\/div>/g, '');
 
       try {
-          const response = await axios.post(`${API_BASE_URL}/session/save`, {
-              searchTerm: searchTerm,
-              documentContent: documentContent, // Send full content for session reconstruction
+          const response = await postWithDocument('/session/save', {
+              searchTerm: searchTerm, // The server resolves the full document content from its ID
               highlightedHtml: cleanHtml // Send the highlighted HTML for display
           });
 